@@ -1,11 +1,17 @@
-import numpy as np
 import logging
 from lib.che_log import CHELog
+from components.ec.durations import DurationSampler, _get_np_random
 import simpy
 
 
-def _get_uniform_duration(low: int, high: int):
-    return np.random.uniform(low, high)
+def _get_uniform_duration(low: int, high: int, sampler: DurationSampler = None, stage: str = None, wi: object = None):
+    if sampler is not None:
+        return sampler.uniform(stage, wi, low, high)
+    return _get_np_random().uniform(low, high)
+
+
+def _clip_duration(duration: float, min_duration: float, max_duration: float):
+    return min(max(duration, min_duration), max_duration)
 
 
 class QC():
@@ -18,6 +24,7 @@ class QC():
     max_duration = 60*5  # 5 minutes
     yard_zone = None
     equipment_pool_id = None
+    duration_sampler = None  # draws the ready / release delays (see DurationSampler.uniform)
 
     def __init__(self, env, id: str, carrier_id: str, che_logger: CHELog):
         self.env = env
@@ -25,6 +32,7 @@ class QC():
         self.carrier_id = carrier_id
         self.che_logger = che_logger
         self.status = "IDLE"  # IDLE, BUSY, MOVING, WAITING, ERROR
+        self.che_logger._register_che(self)
         self.che_logger._add_single_che_event(
             self.env, None, self.id, "IDLE", "INITIALIZE")
         """ status: IDLE, BUSY, MOVING, WAITING, ERROR 
@@ -35,7 +43,7 @@ class QC():
 
     def fetch(self, env, WI: object, fetch_duration: float):
         self.env = env
-        fetch_duration = np.clip(
+        fetch_duration = _clip_duration(
             fetch_duration, QC.min_duration, QC.max_duration)
         cont = WI.container_obj
         yield self.env.timeout(1)
@@ -54,7 +62,7 @@ class QC():
 
     def put(self, env, WI: object, put_duration: float):
         self.env = env
-        put_duration = np.clip(put_duration, QC.min_duration, QC.max_duration)
+        put_duration = _clip_duration(put_duration, QC.min_duration, QC.max_duration)
         cont = WI.container_obj
         self.che_logger._add_single_che_event(
             self.env, WI, self.id, "BUSY", "PUT_START")
@@ -67,7 +75,7 @@ class QC():
 
     def shift_on_bord(self, env, WI: object, sob_time: float):
         self.env = env
-        sob_time = np.clip(sob_time, QC.min_duration, QC.max_duration)
+        sob_time = _clip_duration(sob_time, QC.min_duration, QC.max_duration)
         cont = WI.container_obj
         self.fetch_dispatch_time = self.env.now
         self.put_dispatch_time = self.env.now
@@ -87,7 +95,8 @@ class QC():
             self.env, WI, self.id, "BUSY", "PUT_DISPATCH")
         self.put_dispatch_time = self.env.now
         cont = WI.container_obj
-        ready_to_fetch_duration = _get_uniform_duration(1, 10)
+        ready_to_fetch_duration = _get_uniform_duration(
+            1, 10, self.duration_sampler, "QC_PUT_WAIT", WI)
         self.che_logger._add_single_che_event(
             self.env, WI, self.id, "WAITING", "PUT_WAIT")
         yield self.env.timeout(ready_to_fetch_duration)
@@ -103,7 +112,8 @@ class QC():
         self.env = env
         cont = WI.container_obj
         # FETCH_WAIT PUT_DISPATCH
-        ready_to_put_duration = _get_uniform_duration(1, 10)
+        ready_to_put_duration = _get_uniform_duration(
+            1, 10, self.duration_sampler, "QC_FETCH_WAIT", WI)
         self.che_logger._add_single_che_event(
             self.env, WI, self.id, "WAITING", "FETCH_WAIT")
         yield self.env.timeout(ready_to_put_duration)
@@ -130,6 +140,7 @@ class ITV():
     max_duration = 30*60  # 30 minutes
     yard_zone = []
     equipment_pool_id = None
+    duration_sampler = None  # draws the ready / release delays (see DurationSampler.uniform)
 
     def __init__(self, env, che_logger: CHELog, id: str = None):
         self.env = env
@@ -139,6 +150,8 @@ class ITV():
             self.id = id
         ITV.next_id += 1
         self.che_logger = che_logger
+        self.last_position = None  # position of the last release (see ITVDispatcher)
+        self.che_logger._register_che(self)
         self.che_logger._add_single_che_event(
             self.env, None, self.id, "IDLE", "INITIALIZE")
         """ status: IDLE, BUSY, MOVING, WAITING, ERROR 
@@ -151,7 +164,8 @@ class ITV():
         self.carry_dispatch_time = self.env.now
         self.che_logger._add_single_che_event(
             self.env, WI, self.id, "BUSY", "CARRY_DISPATCH")
-        ready_to_fetch_duration = _get_uniform_duration(1, 10)
+        ready_to_fetch_duration = _get_uniform_duration(
+            1, 10, self.duration_sampler, "ITV_FETCH_READY", WI)
         yield self.env.timeout(ready_to_fetch_duration)
         self.che_logger._add_single_che_event(
             self.env, WI, self.id, "WAITING", "CARRY_FETCH_READY")
@@ -168,7 +182,8 @@ class ITV():
     def get_ready_to_put(self, env, WI: object, target_res: object = None):
         self.env = env
         cont = WI.container_obj
-        ready_to_put_duration = _get_uniform_duration(1, 10)
+        ready_to_put_duration = _get_uniform_duration(
+            1, 10, self.duration_sampler, "ITV_PUT_READY", WI)
         yield self.env.timeout(ready_to_put_duration)
         self.carry_put_ready_time = self.env.now
         self.che_logger._add_single_che_event(
@@ -182,7 +197,7 @@ class ITV():
 
     def carry(self, env, WI: object, carry_duration: float, fetch_res: object = None, put_res: object = None):
         self.env = env
-        carry_duration = np.clip(
+        carry_duration = _clip_duration(
             carry_duration, ITV.min_duration, ITV.max_duration)
         cont = WI.container_obj
         self.che_logger._add_single_che_event(
@@ -199,7 +214,8 @@ class ITV():
     def get_release_fm_yc(self, env, WI: object, target_res: object = None):
         self.env = env
         cont = WI.container_obj
-        rand_duration = _get_uniform_duration(1, 2)
+        rand_duration = _get_uniform_duration(
+            1, 2, self.duration_sampler, "ITV_RELEASE", WI)
         yield self.env.timeout(rand_duration)
         if target_res is not None:
             target_res_id = target_res.id
@@ -214,7 +230,8 @@ class ITV():
     def get_release_fm_qc(self, env, WI: object, target_res: object = None):
         self.env = env
         cont = WI.container_obj
-        rand_duration = _get_uniform_duration(1, 15)
+        rand_duration = _get_uniform_duration(
+            1, 15, self.duration_sampler, "ITV_RELEASE", WI)
         yield self.env.timeout(rand_duration)
         if target_res is not None:
             target_res_id = target_res.id
@@ -254,6 +271,7 @@ class YC():
     type = "RTG"
     yard_zone = []
     equipment_pool_id = None
+    duration_sampler = None  # draws the ready / release delays (see DurationSampler.uniform)
     min_duration = 60  # 60 seconds
     max_duration = 60*10  # 10 minutes
 
@@ -265,12 +283,13 @@ class YC():
             self.id = id
         YC.next_id += 1
         self.che_logger = che_logger
+        self.che_logger._register_che(self)
         self.che_logger._add_single_che_event(
             self.env, None, self.id, "IDLE", "INITIALIZE")
 
     def fetch(self, env, WI: object, fetch_duration: float):
         self.env = env
-        fetch_duration = np.clip(
+        fetch_duration = _clip_duration(
             fetch_duration, YC.min_duration, YC.max_duration)
         cont = WI.container_obj
         self.fetch_dispatch_time = self.env.now
@@ -288,7 +307,7 @@ class YC():
 
     def put(self, env, WI: object, put_duration: float):
         self.env = env
-        put_duration = np.clip(put_duration, YC.min_duration, YC.max_duration)
+        put_duration = _clip_duration(put_duration, YC.min_duration, YC.max_duration)
         cont = WI.container_obj
         self.put_dispatch_time = self.env.now
         yield self.env.timeout(put_duration)
@@ -303,7 +322,8 @@ class YC():
         cont = WI.container_obj
         self.che_logger._add_single_che_event(
             self.env, WI, self.id, "BUSY", "PUT_DISPATCH")
-        ready_to_fetch_duration = _get_uniform_duration(10, 30)
+        ready_to_fetch_duration = _get_uniform_duration(
+            10, 30, self.duration_sampler, "YC_PUT_READY", WI)
         yield self.env.timeout(ready_to_fetch_duration)
         self.che_logger._add_single_che_event(
             self.env, WI, self.id, "BUSY", "PUT_START")
@@ -317,7 +337,8 @@ class YC():
     def get_ready_to_put_to_itv(self, env, WI: object, carry_res: object = None):
         self.env = env
         cont = WI.container_obj
-        ready_to_put_duration = _get_uniform_duration(2, 10)
+        ready_to_put_duration = _get_uniform_duration(
+            2, 10, self.duration_sampler, "YC_FETCH_WAIT", WI)
         yield self.env.timeout(ready_to_put_duration)
         if carry_res is not None:
             carry_res_id = carry_res.id
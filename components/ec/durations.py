@@ -0,0 +1,77 @@
+import hashlib
+import math
+from statistics import NormalDist
+
+# lognormal duration parameters (s, log-scale) of the main pipeline stages
+DURATION_PARAMS = {
+    "DSCH_FETCH": {"s": 0.55, "mu": 4.5},
+    "DSCH_CARRY": {"s": 0.45, "mu": 6.7},
+    "DSCH_PUT": {"s": 0.35, "mu": 5.5},
+    "LOAD_FETCH": {"s": 0.35, "mu": 5.5},
+    "LOAD_CARRY": {"s": 0.45, "mu": 6.7},
+    "LOAD_PUT": {"s": 0.55, "mu": 4.5},
+}
+_STANDARD_NORMAL = NormalDist()
+_np_random = None
+
+
+def _get_np_random():
+    """numpy.random, imported on the first independent draw and then cached (numpy is not imported with the module)"""
+    global _np_random
+    if _np_random is None:
+        import numpy as np
+        _np_random = np.random
+    return _np_random
+
+
+class DurationSampler():
+    """
+    Sample the stage durations of the WIs
+
+    mode:
+        independent: draws from the global numpy random stream (depends on the event order),
+                     same values as scipy.stats.lognorm.rvs without importing scipy
+        crn: common random numbers, the uniform behind a draw is a hash of (seed, stage, WI gkey),
+             so the same WI gets the same fetch/carry/put durations (and the same short ready / release
+             delays, see uniform) across scenarios whatever the event order
+    antithetic: (crn mode only) use 1 - u instead of u, the antithetic twin of the run with the same seed
+    """
+
+    def __init__(self, mode: str = "independent", seed: int = 0, antithetic: bool = False, params: dict = None):
+        if mode not in ("independent", "crn"):
+            raise ValueError(f"Unknown duration sampling mode: {mode}")
+        if antithetic and mode != "crn":
+            raise ValueError("Antithetic variates need the crn sampling mode")
+        self.mode = mode
+        self.seed = seed
+        self.antithetic = antithetic
+        self.params = params if params is not None else DURATION_PARAMS
+
+    def _get_uniform(self, stage: str, wi: object) -> float:
+        wi_key = getattr(wi, "gkey", wi.id)
+        digest = hashlib.blake2b(
+            f"{self.seed}:{stage}:{wi_key}".encode(), digest_size=8).digest()
+        # map the 64 bits to the open interval (0, 1)
+        u = (int.from_bytes(digest, "big") + 0.5) / 2**64
+        if self.antithetic:
+            u = 1.0 - u
+        return u
+
+    def sample(self, stage: str, wi: object) -> float:
+        """Sample the duration of a stage (ex: DSCH_FETCH) for the WI."""
+        params = self.params[stage]
+        if self.mode == "independent":
+            return math.exp(params["mu"]) * math.exp(params["s"] * float(_get_np_random().standard_normal()))
+        z = _STANDARD_NORMAL.inv_cdf(self._get_uniform(stage, wi))
+        return math.exp(params["mu"] + params["s"] * z)
+
+    def uniform(self, stage: str, wi: object, low: float, high: float, rng=None) -> float:
+        """
+        Sample a duration uniformly in [low, high] for a short stage of the WI (ex: ITV_FETCH_READY).
+        In independent mode, the draw comes from rng (ex: the random module) or the global numpy random stream.
+        """
+        if self.mode == "independent":
+            if rng is not None:
+                return rng.uniform(low, high)
+            return _get_np_random().uniform(low, high)
+        return low + (high - low) * self._get_uniform(stage, wi)
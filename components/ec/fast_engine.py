@@ -0,0 +1,580 @@
+import heapq
+import logging
+import random
+import time
+from collections import deque
+from components.ec.che import QC, ITV, YC, _clip_duration
+from components.ec.durations import DurationSampler
+from lib.move_trucker import MovementTracker
+from lib.che_log import CHELog
+from lib.sinks import Sink
+from components.ec.wi_queue import WIQueue
+from components.quay.berth import BerthAllocator
+from components.ec.itv_dispatch import FastITVDispatcher, DispatchRule
+from components.yard.inventory import YardInventory
+from components.quay.schedule import VesselCall
+from lib.rollups import RollupLog
+from lib.tracing import TracingPolicy
+from lib.event_bus import EventBus
+from components.terminal import configure_runtime
+
+
+class FastEnvironment():
+    """
+    Minimal discrete-event kernel: a heap of (time, sequence, callback, record) entries and direct callbacks
+    Exposes `now` like simpy.Environment so the CHE objects and the loggers can be reused as is.
+    """
+
+    def __init__(self, initial_time: float = 0):
+        self.now = initial_time
+        self._queue = []
+        self._sequence = 0
+
+    def schedule(self, delay: float, callback, record=None):
+        """Call callback(record) after delay (events at the same time run in scheduling order)."""
+        self._sequence += 1
+        heapq.heappush(self._queue, (self.now + delay,
+                       self._sequence, callback, record))
+
+    def run(self, until: float = None):
+        queue = self._queue
+        heappop = heapq.heappop
+        while queue:
+            if until is not None and queue[0][0] > until:
+                break
+            self.now, _, callback, record = heappop(queue)
+            callback(record)
+        if until is not None and self.now < until:
+            self.now = until
+
+
+class PacedFastEnvironment(FastEnvironment):
+    """
+    FastEnvironment paced on the wall clock like simpy.rt.RealtimeEnvironment (not strict): an event at
+    simulation time t runs at the earliest (t - start) / speed wall seconds after the start of the first run
+
+    Args:
+        speed (float, optional): simulated seconds per wall-clock second. Defaults to 1 (real time).
+    """
+
+    def __init__(self, speed: float = 1, initial_time: float = 0):
+        super().__init__(initial_time)
+        self.speed = speed
+        self._wall_start = None
+
+    def _wait_until(self, sim_time: float):
+        delay = self._wall_start + \
+            (sim_time - self._sim_start) / self.speed - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def run(self, until: float = None):
+        if self._wall_start is None:
+            self._wall_start = time.monotonic()
+            self._sim_start = self.now
+        queue = self._queue
+        while queue:
+            if until is not None and queue[0][0] > until:
+                break
+            self._wait_until(queue[0][0])
+            self.now, _, callback, record = heapq.heappop(queue)
+            callback(record)
+        if until is not None and self.now < until:
+            self._wait_until(until)
+            self.now = until
+
+
+class _FIFOPool():
+    """Pool of CHEs served to the requests in arrival order (simpy.Store semantics)."""
+
+    def __init__(self, env: FastEnvironment):
+        self.env = env
+        self.items = deque()
+        self.requests = deque()
+
+    def get(self, callback, record):
+        if self.items:
+            record["granted"] = self.items.popleft()
+            callback(record)
+        else:
+            self.requests.append((callback, record))
+
+    def put(self, item):
+        if self.requests:
+            callback, record = self.requests.popleft()
+            record["granted"] = item
+            # like simpy, the waiting process resumes through the event queue
+            self.env.schedule(0, callback, record)
+        else:
+            self.items.append(item)
+
+
+class FastTerminal():
+    """
+    Alternative execution engine of the Terminal, specialised to the QC -> ITV -> YC (DSCH) and
+    YC -> ITV -> QC (LOAD) pipeline of components/ec/processes.py
+
+    Same configuration, same duration draws and same move / CHE records as the SimPy Terminal, but each stage
+    is a callback scheduled on a FastEnvironment instead of a simpy Process with its Timeout/Condition events.
+    Every WI in progress carries a single dict record through its stages.
+    """
+    facility_id = "DMSLOG"
+
+    def __init__(self, env: FastEnvironment, n_itv: int, yc_block_dict: dict, pow_dict: dict,
+                 output_to_csv_file: bool = False, duration_sampler: DurationSampler = None,
+                 db_name: str = 'terminal_simulator', conn_str_name: str = 'MONGO_DEV_CONN', tracing: TracingPolicy = None,
+                 journal_dir: str = None, move_sink: Sink = None, che_event_sink: Sink = None,
+                 che_config_sink: Sink = None, timeline_sink: Sink = None, rollup_sinks: dict = None,
+                 wi_chunk_size: int = 100, interleave_move_kinds: bool = True, sequence_key=None,
+                 berth_allocator: BerthAllocator = None, dispatch_rule: DispatchRule = None,
+                 yard_inventory: YardInventory = None, event_bus: EventBus = None):
+        configure_runtime()
+        self.env = env
+        self.n_qc = len(pow_dict.keys())
+        self.n_itv = n_itv
+        self.yc_block_dict = yc_block_dict
+        self.n_yc = len(yc_block_dict.keys())
+        self.pow_dict = pow_dict
+        self.db_name = db_name
+        self.conn_str_name = conn_str_name
+        self.output_to_csv_file = output_to_csv_file
+        self.wi_chunk_size = wi_chunk_size
+        # DSCH and LOAD WIs of a POW interleaved by sequence, or DSCH first (see WIQueue)
+        self.interleave_move_kinds = interleave_move_kinds
+        self.sequence_key = sequence_key  # sequence number of the WIs in the work queues (None: WI id, see WIQueue)
+        # work queue of each POW in progress by (carrier id, POW), WIs can be added / reprioritised during the run
+        self.pow_queues = {}
+        self.duration_sampler = duration_sampler if duration_sampler is not None else DurationSampler()
+        # moves and CHE events published to the subscribers as they are logged (see lib.event_bus)
+        self.event_bus = event_bus if event_bus is not None else EventBus()
+        self.move_logger = MovementTracker(
+            conn_str_name=self.conn_str_name, db_name=self.db_name, collection_name='sim_move_events',
+            output_to_csv_file=self.output_to_csv_file, tracing=tracing, journal_dir=journal_dir,
+            sink=move_sink, event_bus=self.event_bus)
+        self.che_logger = CHELog(
+            db_name=self.db_name, string_conncetion=self.conn_str_name,
+            output_to_csv_file=self.output_to_csv_file, tracing=tracing, journal_dir=journal_dir,
+            sim_id=self.move_logger.sim_id, event_bus=self.event_bus, event_sink=che_event_sink,
+            config_sink=che_config_sink, timeline_sink=timeline_sink)
+        self.rollup_logger = RollupLog(
+            db_name=self.db_name, string_conncetion=self.conn_str_name,
+            output_to_csv_file=self.output_to_csv_file, sinks=rollup_sinks)
+        # - - - - - - - - - - - - - - - - -
+        # a crane serves one POW at a time, the POWs of the next vessels wait for it (qc_pool of the Terminal)
+        self.qc_dict = {}
+        self.qc_pools = {}
+        for k, v in self.pow_dict.items():
+            qc_res = QC(self.env, k, v, self.che_logger)
+            self.qc_dict[k] = qc_res
+            self.qc_pools[k] = _FIFOPool(env)
+            self.qc_pools[k].put(qc_res)
+            self.che_logger._add_che_config(qc_res)
+        self.itv_pool = FastITVDispatcher(
+            env, dispatch_rule, self.che_logger._get_che_event_last_position)
+        for i in range(self.n_itv):
+            itv_res = ITV(self.env, self.che_logger,
+                          id=f"{ITV.type}{i + 1:03d}")
+            self.itv_pool.put(itv_res)
+            self.che_logger._add_che_config(itv_res)
+        self.yc_pools = {}
+        self.block_yc_dict = {}
+        for yc_id, block_list in self.yc_block_dict.items():
+            yc_res = YC(self.env, self.che_logger, id=yc_id)
+            yc_res.yard_zone = block_list
+            self.yc_pools[yc_id] = _FIFOPool(env)
+            self.yc_pools[yc_id].put(yc_res)
+            self.che_logger._add_che_config(yc_res)
+            for block in block_list:
+                self.block_yc_dict.setdefault(block, yc_id)
+        # berths and cranes assigned to the vessels as they arrive (see Terminal)
+        self.berth_allocator = berth_allocator
+        if self.berth_allocator is not None:
+            self.berth_pools = {}
+            for berth_id in self.berth_allocator.berths.keys():
+                self.berth_pools[berth_id] = _FIFOPool(env)
+                self.berth_pools[berth_id].put(berth_id)
+            self.berth_waits = {}  # carrier id -> record of the vessels waiting for their planned berth time
+        # containers of the yard, updated by the YC puts and fetches (see Terminal)
+        self.yard_inventory = yard_inventory
+        self.flag_save_to_mongo = False
+        self.vessel_log = {}
+        logging.info(
+            f"Fast terminal initialized: QC {self.n_qc}, ITV {self.n_itv}, YC {self.n_yc}")
+
+    # - - - - - - - - - - - - - - - - - activity
+    def schedule_activity(self, vessel_cls, activity_dict: dict, mean_interarrival: float = 5*60*60):
+        """Schedule the vessel arrivals of the activity like run_terminal_activity."""
+        delay = 0.0
+        for carrier_id, pow in activity_dict.items():
+            self.env.schedule(delay, self._initialize_vessel, {
+                              "vessel_cls": vessel_cls, "carrier_id": carrier_id, "pow": pow})
+            delay += random.expovariate(1.0/mean_interarrival)
+
+    def schedule_calls(self, vessel_cls, schedule):
+        """Schedule the vessel calls (VesselCall, in ETA order), the next call is only read at the arrival of the previous one."""
+        self._schedule_next_call({"vessel_cls": vessel_cls, "calls": iter(schedule)})
+
+    def _schedule_next_call(self, schedule_record: dict):
+        call = next(schedule_record["calls"], None)
+        if call is None:
+            return
+        record = {"vessel_cls": schedule_record["vessel_cls"], "carrier_id": call.carrier_id, "pow": call.pow,
+                  "call": call, "schedule_record": schedule_record}
+        self.env.schedule(max(0, call.eta - self.env.now),
+                          self._initialize_vessel, record)
+
+    def _initialize_vessel(self, record: dict):
+        record["arrival_time"] = self.env.now
+        if "schedule_record" in record:
+            self._schedule_next_call(record.pop("schedule_record"))
+        if self.berth_allocator is None:
+            self._berth_vessel(record)
+            return
+        call = record.get("call") or VesselCall(
+            record["carrier_id"], self.env.now, record["pow"])
+        record["assignment"] = self.berth_allocator.allocate(
+            call, self.env.now)
+        record["plan_version"] = 0
+        self.berth_waits[record["carrier_id"]] = record
+        self._wait_berth(record)
+
+    def _wait_berth(self, record: dict):
+        self.env.schedule(max(0, record["assignment"].start - self.env.now),
+                          self._get_berth, (record, record["plan_version"]))
+
+    def _get_berth(self, args: tuple):
+        record, plan_version = args
+        if plan_version != record["plan_version"]:
+            # planned again meanwhile
+            return
+        del self.berth_waits[record["carrier_id"]]
+        assignment = record["assignment"]
+        record["qc_left"] = list(assignment.pow_qc.values())
+        record["qc_dict"] = {}
+        # the berth and the cranes are really free once the previous vessels are done (overruns)
+        self.berth_pools[assignment.berth_id].get(self._get_next_qc, record)
+
+    def _get_next_qc(self, record: dict):
+        if "granted" in record:
+            granted = record.pop("granted")
+            if record.get("berth_id") is None:
+                record["berth_id"] = granted
+            else:
+                granted.carrier_id = record["carrier_id"]
+                record["qc_dict"][granted.id] = granted
+        if record["qc_left"]:
+            self.qc_pools[record["qc_left"].pop(0)].get(
+                self._get_next_qc, record)
+        else:
+            self._berth_vessel(record)
+
+    def _berth_vessel(self, record: dict):
+        vessel = record["vessel_cls"](
+            env=self.env, carrier_id=record["carrier_id"], pow=record["pow"], berth_id=record.get("berth_id"))
+        self.vessel_log[vessel.id] = {
+            "arrival_time": record["arrival_time"], "berth_id": record.get("berth_id"),
+            "berth_time": self.env.now, "start_time": None, "end_time": None}
+        record["vessel"] = vessel
+        self.env.schedule(random.uniform(5, 10), self._start_vessel, record)
+
+    def _start_vessel(self, record: dict):
+        vessel = record["vessel"]
+        self.vessel_log[vessel.id]["start_time"] = self.env.now
+        record["pow_left"] = len(record["pow"])
+        # set by the first POW done, like the unload_done_event of Terminal.execute_pow
+        record["unload_done"] = False
+        for pow_name, pow_wi_list in record["pow"].items():
+            wi_queue = WIQueue(pow_wi_list, self.wi_chunk_size, sequence_key=self.sequence_key,
+                               interleave_move_kinds=self.interleave_move_kinds)
+            self.pow_queues[(vessel.id, pow_name)] = wi_queue
+            pow_record = {"vessel_record": record, "vessel": vessel, "pow_name": pow_name,
+                          "wi_queue": wi_queue, "qc_res": None}
+            if "assignment" in record:
+                # crane seized with the berth
+                pow_record["granted"] = record["qc_dict"][record["assignment"].pow_qc[pow_name]]
+                self._start_pow(pow_record)
+            else:
+                self.qc_pools[pow_name].get(self._start_pow, pow_record)
+        if record["pow_left"] == 0:
+            self._end_vessel(record)
+
+    def _start_pow(self, pow_record: dict):
+        pow_record["qc_res"] = pow_record.pop("granted")
+        self.env.schedule(random.uniform(0, 1),
+                          self._check_pow_start, pow_record)
+
+    def _check_pow_start(self, pow_record: dict):
+        if pow_record["vessel_record"]["unload_done"]:
+            # another POW of the vessel is done before this one got its crane: the POW is cancelled
+            logging.info(
+                f'{self.env.now:.2f}: Vessel:{pow_record["vessel"].id} crane request canceled')
+            self._end_pow(pow_record)
+        else:
+            self._next_wi(pow_record)
+
+    def _end_pow(self, pow_record: dict):
+        queue_key = (pow_record["vessel"].id, pow_record["pow_name"])
+        if self.pow_queues.get(queue_key) is pow_record["wi_queue"]:
+            del self.pow_queues[queue_key]
+        vessel_record = pow_record["vessel_record"]
+        vessel_record["unload_done"] = True
+        self.qc_pools[pow_record["qc_res"].id].put(pow_record["qc_res"])
+        vessel_record["pow_left"] -= 1
+        if vessel_record["pow_left"] == 0:
+            self._end_vessel(vessel_record)
+
+    def _next_wi(self, pow_record: dict):
+        if not pow_record["wi_queue"]:
+            self._end_pow(pow_record)
+            return
+        wi = pow_record["wi_queue"].pop()
+        record = {"pow_record": pow_record, "wi": wi, "vessel": pow_record["vessel"],
+                  "qc_res": pow_record["qc_res"], "itv_res": None, "yc_res": None}
+        if wi.move_kind == "DSCH":
+            self.env.schedule(1, self._dsch_fetch_dispatch, record)
+        elif wi.move_kind == "LOAD":
+            self._get_yc(wi.fm_block, self._load_fetch_dispatch, record)
+        else:
+            logging.info(f'{self.env.now:.2f}: {wi.id} has an unknown move type')
+            self._next_wi(pow_record)
+
+    def _end_vessel(self, record: dict):
+        vessel = record["vessel"]
+        self.vessel_log[vessel.id]["end_time"] = self.env.now
+        if self.berth_allocator is not None:
+            self.berth_pools[record["berth_id"]].put(record["berth_id"])
+            self.berth_allocator.release(vessel.id, self.env.now)
+            # plan the waiting vessels again, in arrival order
+            for waiting_record in list(self.berth_waits.values()):
+                waiting_record["assignment"] = self.berth_allocator.replan(
+                    waiting_record["carrier_id"], self.env.now)
+                waiting_record["plan_version"] += 1
+                self._wait_berth(waiting_record)
+        logging.info(
+            f'{self.env.now:.2f}: Vessel:{vessel.id} has been processed')
+        self.flush_logs()
+
+    def flush_logs(self, segment_end: float = None):
+        """Push the records logged since the last push and close the journals (see Terminal.flush_logs)."""
+        self.move_logger.push_to_mongo()
+        self.che_logger._push_che_config(sim_id=self.move_logger.sim_id)
+        self.che_logger._push_che_event(sim_id=self.move_logger.sim_id)
+        self.rollup_logger.push_rollups(self.move_logger.sim_id, self.che_logger.status_timeline,
+                                        self.move_logger.move_ends,
+                                        self.env.now if segment_end is None else segment_end)
+        self.move_logger.close_journal()
+        self.che_logger.close_journal()
+        self.flag_save_to_mongo = True
+
+    def _get_yc(self, block: str, callback, record: dict):
+        yc_id = self.block_yc_dict.get(block)
+        if yc_id is None:
+            # like the FilterStore request of the SimPy engine, a WI without yard crane waits forever
+            logging.info(
+                f'{self.env.now:.2f}: no yard crane for block {block}, WI {record["wi"].id} is stalled')
+            return
+        self.yc_pools[yc_id].get(callback, record)
+
+    def _log_che(self, record: dict, che_id: str, status: str, event_description: str):
+        self.che_logger._add_single_che_event(
+            self.env, record["wi"], che_id, status, event_description)
+
+    def _log_move(self, record: dict, move_stage: str):
+        wi = record["wi"]
+        self.move_logger.log_move(vessel=record["vessel"], pow_name=wi.pow, wi=wi, move_stage=move_stage,
+                                  qc_res=record["qc_res"], itv_res=record["itv_res"], yc_res=record["yc_res"])
+
+    # - - - - - - - - - - - - - - - - - DSCH: QC fetch -> ITV carry -> YC put
+    def _dsch_fetch_dispatch(self, record: dict):
+        qc_res = record["qc_res"]
+        record["fetch_duration"] = _clip_duration(self.duration_sampler.sample(
+            "DSCH_FETCH", record["wi"]), QC.min_duration, QC.max_duration)
+        qc_res.fetch_dispatch_time = self.env.now
+        self._log_che(record, qc_res.id, "BUSY", "FETCH_DISPATCH")
+        self.env.schedule(1, self._dsch_fetch_start, record)
+
+    def _dsch_fetch_start(self, record: dict):
+        self._log_che(record, record["qc_res"].id, "BUSY", "FETCH_START")
+        self.env.schedule(record["fetch_duration"],
+                          self._dsch_fetch_end, record)
+
+    def _dsch_fetch_end(self, record: dict):
+        qc_res = record["qc_res"]
+        qc_res.fetch_time = self.env.now
+        self._log_che(record, qc_res.id, "WAITING", "FETCH_END")
+        self.itv_pool.get(self._dsch_itv_granted, record)
+
+    def _dsch_itv_granted(self, record: dict):
+        record["itv_res"] = record.pop("granted")
+        self._log_move(record, "FETCH")
+        self.env.schedule(self.duration_sampler.uniform("ITV_SEIZE", record["wi"], 1, 3, rng=random),
+                          self._dsch_qc_ready_to_put, record)
+
+    def _dsch_qc_ready_to_put(self, record: dict):
+        qc_res = record["qc_res"]
+        duration = self.duration_sampler.uniform("QC_FETCH_WAIT", record["wi"], 1, 10)
+        self._log_che(record, qc_res.id, "WAITING", "FETCH_WAIT")
+        self.env.schedule(duration, self._dsch_itv_dispatch, record)
+
+    def _dsch_itv_dispatch(self, record: dict):
+        record["qc_res"].put_wait_time = self.env.now
+        itv_res = record["itv_res"]
+        itv_res.carry_dispatch_time = self.env.now
+        self._log_che(record, itv_res.id, "BUSY", "CARRY_DISPATCH")
+        self.env.schedule(self.duration_sampler.uniform("ITV_FETCH_READY", record["wi"], 1, 10),
+                          self._dsch_itv_fetch_ready, record)
+
+    def _dsch_itv_fetch_ready(self, record: dict):
+        itv_res = record["itv_res"]
+        self._log_che(record, itv_res.id, "WAITING", "CARRY_FETCH_READY")
+        itv_res.carry_fetch_ready_time = self.env.now
+        self._log_che(record, record["qc_res"].id, "IDLE", "FETCH_COMPLETE")
+        # the QC is free for the next WI of the POW
+        self.env.schedule(0, self._next_wi, record["pow_record"])
+        carry_duration = _clip_duration(self.duration_sampler.sample(
+            "DSCH_CARRY", record["wi"]), ITV.min_duration, ITV.max_duration)
+        self._log_che(record, itv_res.id, "MOVING", "CARRY_START")
+        self.env.schedule(carry_duration, self._dsch_carry_end, record)
+
+    def _dsch_carry_end(self, record: dict):
+        itv_res = record["itv_res"]
+        itv_res.carry_time = self.env.now
+        self._log_che(record, itv_res.id, "WAITING", "CARRY_END")
+        self._get_yc(record["wi"].to_block, self._dsch_yc_granted, record)
+
+    def _dsch_yc_granted(self, record: dict):
+        record["yc_res"] = record.pop("granted")
+        self.env.schedule(self.duration_sampler.uniform("ITV_PUT_READY", record["wi"], 1, 10),
+                          self._dsch_itv_put_ready, record)
+
+    def _dsch_itv_put_ready(self, record: dict):
+        itv_res = record["itv_res"]
+        itv_res.carry_put_ready_time = self.env.now
+        self._log_che(record, itv_res.id, "WAITING", "CARRY_PUT_READY")
+        self._log_che(record, record["yc_res"].id, "BUSY", "PUT_DISPATCH")
+        self.env.schedule(self.duration_sampler.uniform("YC_PUT_READY", record["wi"], 10, 30),
+                          self._dsch_yc_put_start, record)
+
+    def _dsch_yc_put_start(self, record: dict):
+        self._log_che(record, record["yc_res"].id, "BUSY", "PUT_START")
+        self.env.schedule(self.duration_sampler.uniform("ITV_RELEASE", record["wi"], 1, 2),
+                          self._dsch_itv_release, record)
+
+    def _dsch_itv_release(self, record: dict):
+        itv_res = record["itv_res"]
+        itv_res.carry_complete_time = self.env.now
+        self._log_che(record, itv_res.id, "IDLE", "CARRY_COMPLETE")
+        self._log_move(record, "CARRY")
+        self.itv_pool.put(itv_res, record["wi"])
+        yc_res = record["yc_res"]
+        put_duration = _clip_duration(self.duration_sampler.sample(
+            "DSCH_PUT", record["wi"]), YC.min_duration, YC.max_duration)
+        yc_res.put_dispatch_time = self.env.now
+        self.env.schedule(put_duration, self._dsch_put_end, record)
+
+    def _dsch_put_end(self, record: dict):
+        yc_res = record["yc_res"]
+        yc_res.put_time = self.env.now
+        self._log_che(record, yc_res.id, "BUSY", "PUT_END")
+        if self.yard_inventory is not None:
+            wi = record["wi"]
+            self.yard_inventory.put_container(
+                wi.container_obj, wi.to_block, wi.to_bay, wi.to_row, wi.to_tier)
+        self._log_move(record, "PUT")
+        self._log_che(record, yc_res.id, "IDLE", "PUT_COMPLETE")
+        self.yc_pools[yc_res.id].put(yc_res)
+
+    # - - - - - - - - - - - - - - - - - LOAD: YC fetch -> ITV carry -> QC put
+    def _load_fetch_dispatch(self, record: dict):
+        yc_res = record["yc_res"] = record.pop("granted")
+        record["fetch_duration"] = _clip_duration(self.duration_sampler.sample(
+            "LOAD_FETCH", record["wi"]), YC.min_duration, YC.max_duration)
+        yc_res.fetch_dispatch_time = self.env.now
+        self._log_che(record, yc_res.id, "BUSY", "FETCH_DISPATCH")
+        self.env.schedule(1, self._load_fetch_start, record)
+
+    def _load_fetch_start(self, record: dict):
+        self._log_che(record, record["yc_res"].id, "BUSY", "FETCH_START")
+        self.env.schedule(record["fetch_duration"],
+                          self._load_fetch_end, record)
+
+    def _load_fetch_end(self, record: dict):
+        yc_res = record["yc_res"]
+        yc_res.fetch_time = self.env.now
+        self._log_che(record, yc_res.id, "BUSY", "FETCH_END")
+        if self.yard_inventory is not None:
+            wi = record["wi"]
+            self.yard_inventory.fetch_container(
+                wi.container_obj, wi.fm_block, wi.fm_bay, wi.fm_row, wi.fm_tier)
+        self.itv_pool.get(self._load_itv_granted, record)
+
+    def _load_itv_granted(self, record: dict):
+        record["itv_res"] = record.pop("granted")
+        self._log_move(record, "FETCH")
+        wi = record["wi"]
+        self.env.schedule(self.duration_sampler.uniform("ITV_SEIZE", wi, 1, 3, rng=random) +
+                          self.duration_sampler.uniform("YC_FETCH_WAIT", wi, 2, 10),
+                          self._load_itv_dispatch, record)
+
+    def _load_itv_dispatch(self, record: dict):
+        itv_res = record["itv_res"]
+        itv_res.carry_dispatch_time = self.env.now
+        self._log_che(record, itv_res.id, "BUSY", "CARRY_DISPATCH")
+        self.env.schedule(self.duration_sampler.uniform("ITV_FETCH_READY", record["wi"], 1, 10),
+                          self._load_itv_fetch_ready, record)
+
+    def _load_itv_fetch_ready(self, record: dict):
+        itv_res = record["itv_res"]
+        yc_res = record["yc_res"]
+        self._log_che(record, itv_res.id, "WAITING", "CARRY_FETCH_READY")
+        itv_res.carry_fetch_ready_time = self.env.now
+        self._log_che(record, yc_res.id, "IDLE", "FETCH_COMPLETE")
+        # the QC is free for the next WI of the POW, the YC goes back to its pool
+        self.env.schedule(0, self._next_wi, record["pow_record"])
+        self.yc_pools[yc_res.id].put(yc_res)
+        carry_duration = _clip_duration(self.duration_sampler.sample(
+            "LOAD_CARRY", record["wi"]), ITV.min_duration, ITV.max_duration)
+        self._log_che(record, itv_res.id, "MOVING", "CARRY_START")
+        self.env.schedule(carry_duration, self._load_carry_end, record)
+
+    def _load_carry_end(self, record: dict):
+        itv_res = record["itv_res"]
+        itv_res.carry_time = self.env.now
+        self._log_che(record, itv_res.id, "WAITING", "CARRY_END")
+        self.env.schedule(self.duration_sampler.uniform("ITV_PUT_READY", record["wi"], 1, 10),
+                          self._load_itv_put_ready, record)
+
+    def _load_itv_put_ready(self, record: dict):
+        itv_res = record["itv_res"]
+        qc_res = record["qc_res"]
+        itv_res.carry_put_ready_time = self.env.now
+        self._log_che(record, itv_res.id, "WAITING", "CARRY_PUT_READY")
+        self._log_che(record, qc_res.id, "BUSY", "PUT_DISPATCH")
+        qc_res.put_dispatch_time = self.env.now
+        duration = self.duration_sampler.uniform("QC_PUT_WAIT", record["wi"], 1, 10)
+        self._log_che(record, qc_res.id, "WAITING", "PUT_WAIT")
+        self.env.schedule(duration, self._load_qc_fetch_wait, record)
+
+    def _load_qc_fetch_wait(self, record: dict):
+        record["qc_res"].fetch_wait_time = self.env.now
+        self.env.schedule(self.duration_sampler.uniform("ITV_RELEASE", record["wi"], 1, 15),
+                          self._load_itv_release, record)
+
+    def _load_itv_release(self, record: dict):
+        itv_res = record["itv_res"]
+        qc_res = record["qc_res"]
+        itv_res.carry_complete_time = self.env.now
+        self._log_che(record, itv_res.id, "IDLE", "CARRY_COMPLETE")
+        self._log_move(record, "CARRY")
+        self.itv_pool.put(itv_res, record["wi"])
+        put_duration = _clip_duration(self.duration_sampler.sample(
+            "LOAD_PUT", record["wi"]), QC.min_duration, QC.max_duration)
+        self._log_che(record, qc_res.id, "BUSY", "PUT_START")
+        self.env.schedule(put_duration, self._load_put_end, record)
+
+    def _load_put_end(self, record: dict):
+        qc_res = record["qc_res"]
+        qc_res.put_time = self.env.now
+        self._log_che(record, qc_res.id, "WAITING", "PUT_END")
+        self._log_move(record, "PUT")
+        self._log_che(record, qc_res.id, "IDLE", "PUT_COMPLETE")
@@ -0,0 +1,229 @@
+from collections import deque
+import simpy
+from simpy.core import BoundClass
+from simpy.resources.store import StoreGet, StorePut
+
+
+class DispatchRule():
+    """
+    Dispatch rule of the ITVs: which idle truck answers a truck request
+
+    A rule splits the fleet in gangs (gang_of an ITV, request_gang of a WI; None is the pooled fleet) and gives the
+    index keys of a position, from the most specific to the least specific: a request is served by the longest
+    idle truck of its gang filed under the first key of its position that has one.
+    The default rule (first idle) is the plain simpy.Store: one gang, one key, longest idle first.
+    """
+    uses_positions = False
+
+    def gang_of(self, itv):
+        return None
+
+    def request_gang(self, wi):
+        return None
+
+    def position_keys(self, position: str) -> tuple:
+        return (None,)
+
+
+class FirstIdle(DispatchRule):
+    """Pooled fleet, the longest idle truck whatever its position."""
+    pass
+
+
+class NearestIdle(DispatchRule):
+    """
+    Pooled fleet, the idle truck the closest to the request: the proximity of two positions is the length of the
+    common prefix of their last_position strings (see CHELog: block ref, carrier visit, block, bay, row, tier),
+    a truck released on the vessel of the request or in its block comes before a truck of another block.
+    Ties go to the longest idle truck.
+
+    Args:
+        min_prefix (int, optional): shortest prefix of a position used as a key. Defaults to 2 (block ref, ex: 'Y-').
+    """
+    uses_positions = True
+
+    def __init__(self, min_prefix: int = 2):
+        self.min_prefix = min_prefix
+
+    def position_keys(self, position: str) -> tuple:
+        if position is None:
+            return (None,)
+        return tuple(position[:n] for n in range(len(position), self.min_prefix - 1, -1)) + (None,)
+
+
+class DedicatedGangs(DispatchRule):
+    """
+    Trucks dedicated to POWs: the requests of a POW with a gang are only served by the trucks of its gang, the
+    other POWs share the trucks of no gang. Inside a gang, the trucks are chosen by rule.
+
+    Args:
+        gangs (dict): ITV ids of each POW, dict like {'pow_id': ['TT001', 'TT002']}
+        rule (DispatchRule, optional): choice of the truck inside a gang. Defaults to FirstIdle().
+    """
+
+    def __init__(self, gangs: dict, rule: DispatchRule = None):
+        self.rule = rule if rule is not None else FirstIdle()
+        self.uses_positions = self.rule.uses_positions
+        self.pow_gang = {pow_name: pow_name for pow_name in gangs.keys()}
+        self.itv_gang = {itv_id: pow_name for pow_name,
+                         itv_ids in gangs.items() for itv_id in itv_ids}
+
+    def gang_of(self, itv):
+        return self.itv_gang.get(itv.id)
+
+    def request_gang(self, wi):
+        if wi is None:
+            return None
+        return self.pow_gang.get(wi.pow)
+
+    def position_keys(self, position: str) -> tuple:
+        return self.rule.position_keys(position)
+
+
+class IdleITVIndex():
+    """
+    Idle trucks indexed by (gang, position key): a deque of entries per key, in idle order.
+    A truck is filed under all the keys of its last position; when it is taken, its entry is emptied in place
+    and the copies left in the other deques are skipped (and compacted when they pile up). Adding and taking a
+    truck cost O(number of keys of a position), independent of the fleet size.
+
+    Args:
+        rule (DispatchRule, optional): dispatch rule. Defaults to FirstIdle().
+        locate (callable, optional): position of a WI at a move stage, like CHELog._get_che_event_last_position.
+            Only needed by the rules using the positions.
+    """
+
+    def __init__(self, rule: DispatchRule = None, locate=None):
+        self.rule = rule if rule is not None else FirstIdle()
+        self.locate = locate
+        self._idle = {}  # (gang, position key) -> deque of entries [itv]
+        self._n_idle = 0
+        self._n_stale = 0  # emptied entries still in the deques
+
+    def __len__(self):
+        return self._n_idle
+
+    def _position(self, wi, event_description: str):
+        if wi is None or not self.rule.uses_positions:
+            return None
+        return self.locate(wi, event_description)
+
+    def add(self, itv, wi=None):
+        """File a truck released after the WI (None: never used, no position)."""
+        position = self._position(wi, "CARRY_COMPLETE")
+        itv.last_position = position
+        gang = self.rule.gang_of(itv)
+        entry = [itv]
+        for key in self.rule.position_keys(position):
+            self._idle.setdefault((gang, key), deque()).append(entry)
+        self._n_idle += 1
+
+    def take(self, wi=None):
+        """Truck of the WI request by the rule (None when its gang has no idle truck)."""
+        gang = self.rule.request_gang(wi)
+        position = self._position(wi, "CARRY_FETCH_READY")
+        for key in self.rule.position_keys(position):
+            entries = self._idle.get((gang, key))
+            if not entries:
+                continue
+            while entries and entries[0][0] is None:
+                entries.popleft()
+                self._n_stale -= 1
+            if entries:
+                entry = entries.popleft()
+                itv = entry[0]
+                entry[0] = None
+                self._n_idle -= 1
+                self._n_stale += len(self.rule.position_keys(itv.last_position)) - 1
+                if self._n_stale > 64 + 4 * self._n_idle:
+                    self._compact()
+                return itv
+        return None
+
+    def _compact(self):
+        for key in list(self._idle.keys()):
+            entries = deque(entry for entry in self._idle[key] if entry[0] is not None)
+            if entries:
+                self._idle[key] = entries
+            else:
+                del self._idle[key]
+        self._n_stale = 0
+
+
+class ITVGet(StoreGet):
+    """Request of a truck for a WI."""
+
+    def __init__(self, resource, wi=None):
+        self.wi = wi
+        super().__init__(resource)
+
+
+class ITVPut(StorePut):
+    """Release of a truck after a WI."""
+
+    def __init__(self, resource, item, wi=None):
+        self.wi = wi
+        super().__init__(resource, item)
+
+
+class ITVDispatcher(simpy.Store):
+    """
+    Store of the ITVs of the Terminal choosing the truck of each request by a dispatch rule:
+    itv_pool.get(wi) / itv_pool.put(itv_res, wi). The waiting requests are served in arrival order,
+    a request that the released truck cannot serve (other gang) is passed over.
+
+    Args:
+        env (simpy.Environment): simulation environment
+        rule (DispatchRule, optional): dispatch rule. Defaults to FirstIdle() (simpy.Store behaviour).
+        locate (callable, optional): position of a WI at a move stage (see IdleITVIndex).
+    """
+
+    put = BoundClass(ITVPut)
+    get = BoundClass(ITVGet)
+
+    def __init__(self, env, rule: DispatchRule = None, locate=None):
+        super().__init__(env)
+        self.index = IdleITVIndex(rule, locate)
+
+    def _do_put(self, event):
+        self.index.add(event.item, event.wi)
+        event.succeed()
+
+    def _do_get(self, event):
+        itv_res = self.index.take(event.wi)
+        if itv_res is not None:
+            event.succeed(itv_res)
+        # other waiting requests may be served while trucks are idle
+        return len(self.index) > 0
+
+
+class FastITVDispatcher():
+    """
+    Dispatcher of the ITVs of the FastTerminal, same interface as _FIFOPool: get(callback, record) with the WI
+    of record["wi"], put(item, wi)
+    """
+
+    def __init__(self, env, rule: DispatchRule = None, locate=None):
+        self.env = env
+        self.index = IdleITVIndex(rule, locate)
+        self.requests = {}  # gang -> deque of the waiting (callback, record)
+
+    def get(self, callback, record):
+        itv_res = self.index.take(record["wi"])
+        if itv_res is not None:
+            record["granted"] = itv_res
+            callback(record)
+        else:
+            gang = self.index.rule.request_gang(record["wi"])
+            self.requests.setdefault(gang, deque()).append((callback, record))
+
+    def put(self, item, wi=None):
+        requests = self.requests.get(self.index.rule.gang_of(item))
+        if requests:
+            callback, record = requests.popleft()
+            item.last_position = self.index._position(wi, "CARRY_COMPLETE")
+            record["granted"] = item
+            # like simpy, the waiting process resumes through the event queue
+            self.env.schedule(0, callback, record)
+        else:
+            self.index.add(item, wi)
@@ -1,7 +1,5 @@
 import logging
 import simpy
-from scipy.stats import lognorm
-import math
 import random
 
 
@@ -19,14 +17,14 @@ class DSCH():
         cont = wi.container_obj
         logging.info(
             f"DEBUG: {self.env.now}: Starting process DSCH-FETCH for {wi.pow}-{cont.id}")
-        fetch_duration = float(lognorm.rvs(s=0.55, scale=math.exp(4.5)))
+        fetch_duration = self.duration_sampler.sample("DSCH_FETCH", wi)
         yield self.env.process(qc_res.fetch(self.env, wi, fetch_duration))
         # get and send truck
         # not using a with block becaue
         # another process will release the truck
         logging.info(
             f'{self.env.now:.2f}: {cont.id} from carrier {vessel.id} is waiting for a truck')
-        itv_res = yield self.itv_pool.get()
+        itv_res = yield self.itv_pool.get(wi)
         self.move_logger.log_move(vessel=vessel, pow_name=wi.pow, wi=wi, move_stage="FETCH",
                                   qc_res=qc_res, itv_res=itv_res, yc_res=None)
         carry_request_dict = {"wi": wi, "itv_res": itv_res,
@@ -49,15 +47,14 @@ class DSCH():
         vessel = carry_request["vessel"]
         logging.info(
             f"DEBUG: {self.env.now}: Starting process DSCH-CARRY for {wi.pow}-{cont.id}")
-        yield self.env.timeout(random.uniform(1, 3))
+        yield self.env.timeout(self.duration_sampler.uniform("ITV_SEIZE", wi, 1, 3, rng=random))
         # carry ready and carry ongoing ...
         logging.info(
             f'{self.env.now:.2f}: {cont.id} from carrier {vessel.id} has seized truck {itv_res.id}')
         yield self.env.process(qc_res.get_ready_to_put_to_itv(self.env, wi, itv_res))
         yield self.env.process(itv_res.get_ready_to_fetch(self.env, wi, qc_res))
         fetch_completed_event.succeed()
-        carry_duration = float(
-            lognorm.rvs(s=0.45, scale=math.exp(6.7)))
+        carry_duration = self.duration_sampler.sample("DSCH_CARRY", wi)
         yield self.env.process(itv_res.carry(self.env, wi, carry_duration, qc_res))
         # request a yard crane and put the container in the yard
         # yard crane for the block that the container is going to
@@ -72,7 +69,7 @@ class DSCH():
         self.move_logger.log_move(vessel=vessel, pow_name=wi.pow, wi=wi, move_stage="CARRY",
                                   qc_res=qc_res, itv_res=itv_res, yc_res=yc_res)
 
-        self.itv_pool.put(itv_res)
+        self.itv_pool.put(itv_res, wi)
         put_request_dict = {"wi": wi, "vessel": vessel,
                             "qc_res": qc_res, "itv_res": itv_res, "yc_res": yc_res}
         put_request_result.succeed(put_request_dict)
@@ -88,8 +85,11 @@ class DSCH():
         yc_res = put_request["yc_res"]
         logging.info(
             f"DEBUG: {self.env.now}: Starting process DSCH-PUT for {wi.pow}-{cont.id}")
-        put_time = float(lognorm.rvs(s=0.35, scale=math.exp(5.5)))
+        put_time = self.duration_sampler.sample("DSCH_PUT", wi)
         yield self.env.process(yc_res.put(self.env, wi, put_time))
+        if self.yard_inventory is not None:
+            self.yard_inventory.put_container(
+                cont, wi.to_block, wi.to_bay, wi.to_row, wi.to_tier)
 
         self.move_logger.log_move(vessel=vessel, pow_name=wi.pow, wi=wi, move_stage="PUT",
                                   qc_res=qc_res, itv_res=itv_res, yc_res=yc_res)
@@ -114,12 +114,15 @@ class LOAD():
         qc_res = fetch_request["qc_res"]
         # get container from block
         cont = wi.container_obj
-        fetch_duration = float(lognorm.rvs(s=0.35, scale=math.exp(5.5)))
+        fetch_duration = self.duration_sampler.sample("LOAD_FETCH", wi)
         yield self.env.process(yc_res.fetch(self.env, wi, fetch_duration))
+        if self.yard_inventory is not None:
+            self.yard_inventory.fetch_container(
+                cont, wi.fm_block, wi.fm_bay, wi.fm_row, wi.fm_tier)
         # get and send truck
         logging.info(
             f'{self.env.now:.2f}: {cont.id} fetched by {yc_res.id} for carrier {vessel.id} is waiting for a truck')
-        itv_res = yield self.itv_pool.get()
+        itv_res = yield self.itv_pool.get(wi)
         self.move_logger.log_move(vessel=vessel, pow_name=wi.pow, wi=wi, move_stage="FETCH",
                                   qc_res=qc_res, itv_res=itv_res, yc_res=yc_res)
         carry_request_dict = {"wi": wi, "yc_res": yc_res, "itv_res": itv_res,
@@ -143,7 +146,7 @@ class LOAD():
         vessel = carry_request["vessel"]
         logging.info(
             f"DEBUG: {self.env.now}: Starting process LOAD-CARRY for {wi.pow}-{cont.id}")
-        yield self.env.timeout(random.uniform(1, 3))
+        yield self.env.timeout(self.duration_sampler.uniform("ITV_SEIZE", wi, 1, 3, rng=random))
         # carry ready and carry ongoing ...
         logging.info(
             f'{self.env.now:.2f}: {cont.id} fetched by {yc_res.id} for carrier {vessel.id} has seized truck {itv_res.id}')
@@ -152,8 +155,7 @@ class LOAD():
         yield self.env.process(itv_res.get_ready_to_fetch(self.env, wi, yc_res))
         fetch_completed_event.succeed()
         self.yc_pool.put(yc_res)
-        carry_duration = float(
-            lognorm.rvs(s=0.45, scale=math.exp(6.7)))
+        carry_duration = self.duration_sampler.sample("LOAD_CARRY", wi)
         yield self.env.process(itv_res.carry(self.env, wi, carry_duration, yc_res))
         # prepare to pick-up the container by the QC from the ITV
         yield self.env.process(itv_res.get_ready_to_put(self.env, wi, qc_res))
@@ -162,7 +164,7 @@ class LOAD():
         self.move_logger.log_move(vessel=vessel, pow_name=wi.pow, wi=wi, move_stage="CARRY",
                                   qc_res=qc_res, itv_res=itv_res, yc_res=yc_res)
 
-        self.itv_pool.put(itv_res)
+        self.itv_pool.put(itv_res, wi)
         put_request_dict = {"wi": wi, "vessel": vessel,
                             "qc_res": qc_res, "itv_res": itv_res, "yc_res": yc_res}
         put_request_result.succeed(put_request_dict)
@@ -178,7 +180,7 @@ class LOAD():
         yc_res = put_request["yc_res"]
         logging.info(
             f"DEBUG: {self.env.now}: Starting process LOAD-PUT for {wi.pow}-{cont.id}")
-        put_duration = float(lognorm.rvs(s=0.55, scale=math.exp(4.5)))
+        put_duration = self.duration_sampler.sample("LOAD_PUT", wi)
         yield self.env.process(qc_res.put(self.env, wi, put_duration))
 
         self.move_logger.log_move(vessel=vessel, pow_name=wi.pow, wi=wi, move_stage="PUT",
@@ -0,0 +1,139 @@
+import heapq
+import itertools
+from itertools import islice
+
+# order of the move kinds when they are not interleaved
+MOVE_KIND_RANKS = {"DSCH": 0, "LOAD": 1}
+
+
+def wi_sequence(wi) -> int:
+    """Default sequence number of a WI: its id (construction order of the WIs, the order of the POW lists)."""
+    return wi.id
+
+
+class WIQueue():
+    """
+    Work queue of a point of work: a heap of the WIs keyed on (priority, sequence number)
+
+    The WIs come from a source, either a list (left untouched) or any iterable / generator yielding the WIs in
+    sequence order: an iterable is only read chunk_size WIs at a time, when the heap runs empty or when its next
+    WI comes after the last WI read (ex: a WI pushed with a higher sequence number), so the WIs of a long POW are
+    built just in time. A WI handed to the POW is dropped by the queue, memory follows the work in flight, not
+    the total workload.
+    While the QC is working, WIs can be added (push), reprioritised or removed in O(log n): a removed or
+    reprioritised entry stays in the heap, marked as removed, and is skipped when it reaches the top.
+    The lowest priority value is served first, then the lowest sequence number.
+
+    Args:
+        source (iterable, optional): WIs of the POW. Defaults to None (empty queue).
+        chunk_size (int, optional): number of WIs read from an iterable source at a time. Defaults to 100.
+        sequence_key (callable, optional): sequence number of a WI. Defaults to the WI id (see wi_sequence).
+        interleave_move_kinds (bool, optional): DSCH and LOAD WIs interleaved by sequence number, otherwise
+            all the DSCH WIs of a priority level go before the LOAD ones (of the WIs read so far from an iterable
+            source). Defaults to True.
+    """
+
+    def __init__(self, source=None, chunk_size: int = 100, sequence_key=None,
+                 interleave_move_kinds: bool = True):
+        self.chunk_size = chunk_size
+        self.sequence_key = sequence_key if sequence_key is not None else wi_sequence
+        self.interleave_move_kinds = interleave_move_kinds
+        self.n_popped = 0
+        self._heap = []
+        self._n_removed = 0  # entries of the heap marked as removed
+        self._entries = {}  # WI id -> heap entry [priority, move kind rank, sequence, count, WI]
+        self._counter = itertools.count()
+        self._last_read_sequence = None  # sequence number of the last WI read from an iterable source
+        if isinstance(source, list):
+            for wi in source:
+                self._entries[wi.id] = self._new_entry(wi, 0)
+            self._heap = list(self._entries.values())
+            heapq.heapify(self._heap)
+            self._source = None
+        else:
+            self._source = iter(source) if source is not None else None
+
+    def _new_entry(self, wi, priority: float) -> list:
+        move_kind_rank = 0 if self.interleave_move_kinds else MOVE_KIND_RANKS.get(
+            wi.move_kind, len(MOVE_KIND_RANKS))
+        return [priority, move_kind_rank, self.sequence_key(wi), next(self._counter), wi]
+
+    def _fill(self):
+        n_read = 0
+        for wi in islice(self._source, self.chunk_size):
+            self.push(wi)
+            self._last_read_sequence = self._entries[wi.id][2]
+            n_read += 1
+        if n_read < self.chunk_size:
+            # exhausted, release the generator (and what it holds)
+            self._source = None
+
+    def _refill(self):
+        """Read the source until the top of the heap goes before its WIs not read yet (read with priority 0)."""
+        while self._source is not None:
+            self._discard_removed()
+            if self._heap:
+                priority, _, sequence = self._heap[0][:3]
+                if priority < 0 or (priority == 0 and self._last_read_sequence is not None and
+                                    sequence <= self._last_read_sequence):
+                    return
+            self._fill()
+
+    def _discard_removed(self):
+        while self._heap and self._heap[0][-1] is None:
+            heapq.heappop(self._heap)
+            self._n_removed -= 1
+
+    def __len__(self):
+        """Number of WIs in the heap (the WIs not read yet from an iterable source are not counted)."""
+        return len(self._entries)
+
+    def __contains__(self, wi):
+        return wi.id in self._entries
+
+    def __bool__(self):
+        if self._source is not None:
+            self._refill()
+        return len(self._entries) > 0
+
+    def push(self, wi, priority: float = 0):
+        """Add a WI (replacing its entry if it is already in the queue)."""
+        if wi.id in self._entries:
+            self.remove(wi)
+        entry = self._new_entry(wi, priority)
+        self._entries[wi.id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def reprioritise(self, wi, priority: float):
+        """Change the priority of a WI of the queue (KeyError when it is not in the queue)."""
+        if wi.id not in self._entries:
+            raise KeyError(f"WI {wi.id} is not in the work queue")
+        self.push(wi, priority)
+
+    def remove(self, wi):
+        """Remove a WI from the queue (KeyError when it is not in the queue)."""
+        entry = self._entries.pop(wi.id)
+        entry[-1] = None
+        self._n_removed += 1
+        if self._n_removed > len(self._entries):
+            # mostly removed entries: rebuild the heap
+            self._heap = [entry for entry in self._heap if entry[-1] is not None]
+            heapq.heapify(self._heap)
+            self._n_removed = 0
+
+    def peek(self):
+        """Next WI of the POW, left in the queue (None when the queue is empty)."""
+        if not self:
+            return None
+        self._discard_removed()
+        return self._heap[0][-1]
+
+    def pop(self):
+        """Next WI of the POW (IndexError when the queue is empty)."""
+        if not self:
+            raise IndexError("pop from an empty work queue")
+        self._discard_removed()
+        wi = heapq.heappop(self._heap)[-1]
+        del self._entries[wi.id]
+        self.n_popped += 1
+        return wi
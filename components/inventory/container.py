@@ -1,3 +1,7 @@
+# fields of a container in the WI export (the other attributes are the run state: location, transit state, ...)
+CONTAINER_FIELDS = ('id', 'category', 'freight_kind', 'line_op')
+
+
 class Container():
     """
     Simple Container with unique Id
@@ -10,11 +14,12 @@ class Container():
 
     def _get_transit_state(self):
         # INBOUND, EC/IN, YARD, EC/OUT, ADVISED, DEPARTED, RETIRED
-        pass
+        return getattr(self, "transit_state", None)
 
     def _get_container_location(self):
-        # Position Name: BLOCK, BAY, ROW, TIER
-        pass
+        # Position Name: BLOCK, BAY, ROW, TIER (set by the yard inventory, see YardInventory)
+        return (getattr(self, "block", None), getattr(self, "bay", None),
+                getattr(self, "row", None), getattr(self, "tier", None))
 
     def _set_location(self, block: str, bay: str, row: str, tier: str):
         self.block = block
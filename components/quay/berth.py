@@ -0,0 +1,154 @@
+from bisect import bisect_left, bisect_right
+
+
+class IntervalIndex:
+    """
+    Reserved [start, end) intervals of a resource (berth or quay crane), non overlapping and sorted:
+    the starts and the ends are two sorted lists searched with bisect.
+    The intervals ended before the current time are pruned, the index only holds the plan ahead.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def prune(self, time: float):
+        """Drop the intervals ended at time."""
+        n_ended = bisect_right(self.ends, time)
+        if n_ended > 0:
+            del self.starts[:n_ended]
+            del self.ends[:n_ended]
+
+    def earliest_start(self, time: float, duration: float) -> float:
+        """Earliest start, from time, of a free gap of duration."""
+        start = time
+        for i in range(bisect_right(self.ends, time), len(self.starts)):
+            if self.starts[i] >= start + duration:
+                break
+            start = max(start, self.ends[i])
+        return start
+
+    def reserve(self, start: float, end: float):
+        """Reserve a free interval (ValueError when it overlaps a reservation)."""
+        i = bisect_left(self.starts, start)
+        if (i < len(self.starts) and self.starts[i] < end) or (i > 0 and self.ends[i - 1] > start):
+            raise ValueError(
+                f"Interval [{start}, {end}) overlaps a reservation")
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+
+    def release(self, start: float, end: float):
+        """
+        End the reservation starting at start at end (the resource is freed early),
+        a reservation is never extended: an overrun is absorbed by the waits of the simulation
+        """
+        i = bisect_left(self.starts, start)
+        if i == len(self.starts) or self.starts[i] != start:
+            return
+        if end <= start:
+            del self.starts[i]
+            del self.ends[i]
+        else:
+            self.ends[i] = min(self.ends[i], end)
+
+
+class BerthAssignment:
+    """Berth and quay cranes planned for a vessel call, from start to end, and the QC of each POW."""
+
+    def __init__(self, carrier_id: str, berth_id: str, start: float, end: float, pow_qc: dict):
+        self.carrier_id = carrier_id
+        self.berth_id = berth_id
+        self.start = start
+        self.end = end
+        self.pow_qc = pow_qc
+
+    @property
+    def qc_ids(self) -> list:
+        return list(self.pow_qc.values())
+
+
+class BerthAllocator:
+    """
+    Assigns a berth and quay cranes to the vessel calls as they arrive
+
+    Each berth and each QC has an interval index of its reservations. A call is planned at the earliest time,
+    from its arrival, where a berth and the QCs it needs are free for its berth window (or default_duration),
+    and planned again (replan) when a vessel leaves before the end of its reservation:
+    each POW gets its own crane: the POW itself when it is a QC of the terminal (QC one-to-one to POW),
+    otherwise the cranes free the earliest. With the past reservations pruned, a call costs
+    O(B x Q log Q) for B berths and Q cranes, whatever the length of the schedule.
+
+    Args:
+        berth_ids (list): berths of the terminal
+        qc_ids (list): quay cranes of the terminal
+        default_duration (float, optional): planned duration of a call without berth window. Defaults to 24 hours.
+    """
+
+    def __init__(self, berth_ids: list, qc_ids: list, default_duration: float = 24*60*60):
+        self.berths = {berth_id: IntervalIndex() for berth_id in berth_ids}
+        self.qcs = {qc_id: IntervalIndex() for qc_id in qc_ids}
+        self.default_duration = default_duration
+        self.assignments = {}  # carrier id -> BerthAssignment of the calls in progress
+        self.calls = {}  # carrier id -> VesselCall of the calls in progress
+
+    def _select_qcs(self, call, start: float, duration: float) -> tuple:
+        """Cranes of the call (one per POW) and the earliest time they are all free from start."""
+        if all(pow_name in self.qcs for pow_name in call.pow):
+            pow_qc = {pow_name: pow_name for pow_name in call.pow}
+            qc_start = max((self.qcs[qc_id].earliest_start(start, duration) for qc_id in pow_qc.values()),
+                           default=start)
+            return pow_qc, qc_start
+        if len(call.pow) > len(self.qcs):
+            raise ValueError(
+                f"Vessel {call.carrier_id} has {len(call.pow)} POWs for {len(self.qcs)} quay cranes")
+        free_qcs = sorted((qc_index.earliest_start(start, duration), qc_id)
+                          for qc_id, qc_index in self.qcs.items())[:len(call.pow)]
+        pow_qc = {pow_name: qc_id for pow_name,
+                  (_, qc_id) in zip(call.pow, free_qcs)}
+        return pow_qc, max((qc_start for qc_start, _ in free_qcs), default=start)
+
+    def allocate(self, call, now: float) -> BerthAssignment:
+        """Plan a berth and cranes for the call (VesselCall) arrived at now and reserve them."""
+        duration = call.berth_duration if call.berth_duration else self.default_duration
+        for index in self.berths.values():
+            index.prune(now)
+        for index in self.qcs.values():
+            index.prune(now)
+        best = None
+        for berth_id, berth_index in self.berths.items():
+            start = berth_index.earliest_start(max(now, call.eta), duration)
+            while True:
+                pow_qc, qc_start = self._select_qcs(call, start, duration)
+                if qc_start <= start:
+                    break
+                start = berth_index.earliest_start(qc_start, duration)
+            if best is None or start < best.start:
+                best = BerthAssignment(
+                    call.carrier_id, berth_id, start, start + duration, pow_qc)
+        self.berths[best.berth_id].reserve(best.start, best.end)
+        for qc_id in best.qc_ids:
+            self.qcs[qc_id].reserve(best.start, best.end)
+        self.assignments[call.carrier_id] = best
+        self.calls[call.carrier_id] = call
+        return best
+
+    def replan(self, carrier_id: str, now: float) -> BerthAssignment:
+        """Plan again a call not started yet (ex: after a vessel left early), from now."""
+        assignment = self.assignments.pop(carrier_id)
+        self.berths[assignment.berth_id].release(assignment.start, assignment.start)
+        for qc_id in assignment.qc_ids:
+            self.qcs[qc_id].release(assignment.start, assignment.start)
+        return self.allocate(self.calls[carrier_id], now)
+
+    def release(self, carrier_id: str, end_time: float):
+        """Free the berth and the cranes of a call at the end of its operations."""
+        assignment = self.assignments.pop(carrier_id, None)
+        self.calls.pop(carrier_id, None)
+        if assignment is None:
+            return
+        self.berths[assignment.berth_id].release(assignment.start, end_time)
+        for qc_id in assignment.qc_ids:
+            self.qcs[qc_id].release(assignment.start, end_time)
@@ -0,0 +1,54 @@
+import csv
+import random
+
+
+class VesselCall:
+    """
+    Call of a vessel in the schedule: arrival (ETA), berth window and points of work
+    (each POW is worked by its own quay crane)
+
+    Args:
+        carrier_id (str): carrier visit of the call
+        eta (float): simulation time of the arrival
+        pow (dict): points of work, dict like: {'pow_id': [list of WIs] or WI iterator}
+        etd (float, optional): end of the berth window. Defaults to None (no window).
+    """
+
+    def __init__(self, carrier_id: str, eta: float, pow: dict, etd: float = None, **kwargs):
+        self.carrier_id = carrier_id
+        self.eta = eta
+        self.etd = etd
+        self.pow = pow
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    @property
+    def berth_duration(self) -> float:
+        """Length of the berth window (None without window)."""
+        if self.etd is None:
+            return None
+        return self.etd - self.eta
+
+
+def activity_schedule(activity_dict: dict, mean_interarrival: float = 5*60*60, start_time: float = 0):
+    """
+    Vessel calls of an activity dict ({'carrier_id': {'pow_id': [list of WIs]}}) in dict order,
+    separated by exponential gaps (the gap after a call is drawn when the next call is requested)
+    """
+    eta = start_time
+    for carrier_id, pow_dict in activity_dict.items():
+        yield VesselCall(carrier_id, eta, pow_dict)
+        eta += random.expovariate(1.0/mean_interarrival)
+
+
+def read_schedule_csv(file_path: str, pow_loader):
+    """
+    Stream the vessel calls of a schedule csv file (columns carrier_id, eta and optional etd; times in
+    simulation seconds, rows in ETA order): the file is read row by row and the POWs of a call are only loaded
+    (pow_loader(carrier_id), ex: the stream_activity of a MongoWISource) when the call is requested
+    """
+    with open(file_path, newline='') as f:
+        for row in csv.DictReader(f):
+            etd = row.get("etd")
+            yield VesselCall(row["carrier_id"], float(row["eta"]), pow_loader(row["carrier_id"]),
+                             etd=float(etd) if etd else None)
@@ -1,25 +1,44 @@
-import threading
 import logging
+import os
 import simpy
 import random
-from scipy.stats import lognorm
-import math
 from components.quay.vessel import Vessel
 from components.ec.che import QC, ITV, YC
 from components.ec.processes import Processes
+from components.ec.durations import DurationSampler
 from lib.move_trucker import MovementTracker
 from lib.che_log import CHELog
-from dotenv import load_dotenv
-import os
-# Load environment variables from a .env file
-load_dotenv()
+from lib.sinks import Sink
+from components.ec.wi_queue import WIQueue
+from components.quay.schedule import VesselCall
+from components.quay.berth import BerthAllocator
+from components.ec.itv_dispatch import ITVDispatcher, DispatchRule
+from components.yard.inventory import YardInventory
+from lib.rollups import RollupLog
+from lib.tracing import TracingPolicy
+from lib.event_bus import EventBus
 
-# Configure logging
-logging.basicConfig(
-    filename='logs/simulation_events.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+_runtime_configured = False
+
+
+def configure_runtime():
+    """
+    Load the environment variables from the .env file and configure the simulation log file,
+    done once, when the first terminal is built (not at import time)
+    """
+    global _runtime_configured
+    if _runtime_configured:
+        return
+    from dotenv import load_dotenv
+    # Load environment variables from a .env file
+    load_dotenv()
+    # Configure logging
+    logging.basicConfig(
+        filename='logs/simulation_events.log',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    _runtime_configured = True
 
 
 class Terminal(Processes):
@@ -29,7 +48,15 @@ class Terminal(Processes):
     """
     facility_id = "DMSLOG"
 
-    def __init__(self, env, n_itv: int, yc_block_dict: int, pow_dict: list, output_to_csv_file: bool = False):
+    def __init__(self, env, n_itv: int, yc_block_dict: int, pow_dict: list, output_to_csv_file: bool = False,
+                 duration_sampler: DurationSampler = None, db_name: str = 'terminal_simulator',
+                 conn_str_name: str = 'MONGO_DEV_CONN', tracing: TracingPolicy = None,
+                 journal_dir: str = None, move_sink: Sink = None, che_event_sink: Sink = None,
+                 che_config_sink: Sink = None, timeline_sink: Sink = None, rollup_sinks: dict = None,
+                 wi_chunk_size: int = 100, interleave_move_kinds: bool = True, sequence_key=None,
+                 berth_allocator: BerthAllocator = None, dispatch_rule: DispatchRule = None,
+                 yard_inventory: YardInventory = None, event_bus: EventBus = None):
+        configure_runtime()
         self.env = env          # simulation environment var
         # number of quay cranes ( = total pow)
         self.n_qc = len(pow_dict.keys())
@@ -37,33 +64,54 @@ class Terminal(Processes):
         self.yc_block_dict = yc_block_dict  # dict of yard cranes and their block id list
         self.n_yc = len(yc_block_dict.keys())  # number of yard cranes
         self.pow_dict = pow_dict  # pow and their carrier id
-        self.db_name = 'terminal_simulator'
-        self.conn_str_name = 'MONGO_DEV_CONN'
+        self.db_name = db_name
+        self.conn_str_name = conn_str_name
         self.output_to_csv_file = output_to_csv_file
+        self.wi_chunk_size = wi_chunk_size  # WIs read at a time from the WI iterators of the POWs
+        # DSCH and LOAD WIs of a POW interleaved by sequence, or DSCH first (see WIQueue)
+        self.interleave_move_kinds = interleave_move_kinds
+        self.sequence_key = sequence_key  # sequence number of the WIs in the work queues (None: WI id, see WIQueue)
+        # work queue of each POW in progress by (carrier id, POW), WIs can be added / reprioritised during the run
+        self.pow_queues = {}
+        # stage durations sampler (independent draws or common random numbers)
+        self.duration_sampler = duration_sampler if duration_sampler is not None else DurationSampler()
+        # moves and CHE events published to the subscribers as they are logged (see lib.event_bus)
+        self.event_bus = event_bus if event_bus is not None else EventBus()
         self.move_logger = MovementTracker(
             conn_str_name=self.conn_str_name, db_name=self.db_name, collection_name='sim_move_events',
-            output_to_csv_file=self.output_to_csv_file)
+            output_to_csv_file=self.output_to_csv_file, tracing=tracing, journal_dir=journal_dir,
+            sink=move_sink, event_bus=self.event_bus)
         self.che_logger = CHELog(
             db_name=self.db_name, string_conncetion=self.conn_str_name,
-            output_to_csv_file=self.output_to_csv_file)
+            output_to_csv_file=self.output_to_csv_file, tracing=tracing, journal_dir=journal_dir,
+            sim_id=self.move_logger.sim_id, event_bus=self.event_bus, event_sink=che_event_sink,
+            config_sink=che_config_sink, timeline_sink=timeline_sink)
+        self.rollup_logger = RollupLog(
+            db_name=self.db_name, string_conncetion=self.conn_str_name,
+            output_to_csv_file=self.output_to_csv_file, sinks=rollup_sinks)
 
         # convert counts to resourc pools (res)
         self.qc_pool = simpy.FilterStore(env)
         for k, v in self.pow_dict.items():
             qc_res = QC(self.env, k, v, self.che_logger)
+            qc_res.duration_sampler = self.duration_sampler
             self.qc_pool.put(qc_res)
             self.che_logger._add_che_config(qc_res)
         # - - - - - - - - - - - - - - - - -
-        self.itv_pool = simpy.Store(env)
-        for _ in range(self.n_itv):
-            itv_res = ITV(self.env, self.che_logger)
+        # idle trucks indexed by last position, chosen by the dispatch rule (see ITVDispatcher)
+        self.itv_pool = ITVDispatcher(
+            env, dispatch_rule, self.che_logger._get_che_event_last_position)
+        for i in range(self.n_itv):
+            itv_res = ITV(self.env, self.che_logger, id=f"{ITV.type}{i + 1:03d}")
+            itv_res.duration_sampler = self.duration_sampler
             self.itv_pool.put(itv_res)
             self.che_logger._add_che_config(itv_res)
         # - - - - - - - - - - - - - - - - -
         self.yc_pool = simpy.FilterStore(env)
-        for _ in range(self.n_yc):
-            yc_res = YC(self.env, self.che_logger)
+        for yc_id in self.yc_block_dict.keys():
+            yc_res = YC(self.env, self.che_logger, id=yc_id)
             yc_res.yard_zone = self.yc_block_dict[yc_res.id]
+            yc_res.duration_sampler = self.duration_sampler
             self.yc_pool.put(yc_res)
             self.che_logger._add_che_config(yc_res)
         logging.info('-'*50)
@@ -72,24 +120,59 @@ class Terminal(Processes):
         logging.info(f"------ Quay Cranes: {self.n_qc}")
         logging.info(f"------ Internal Trucks: {self.n_itv}")
         logging.info(f"------ Yard Cranes: {self.n_yc}")
-        vs_1 = {k: len(v) for k, v in self.pow_dict.items()}
-        logging.info(f"------ POW: {vs_1}")
+        logging.info(f"------ POW: {self.pow_dict}")
         logging.info('-'*50)
         # - - - - - - - - - - - - - - - - -
+        # berths and cranes assigned to the vessels as they arrive (None: berth on arrival, QC one-to-one to POW)
+        self.berth_allocator = berth_allocator
+        if self.berth_allocator is not None:
+            self.berth_pool = simpy.FilterStore(env)
+            for berth_id in self.berth_allocator.berths.keys():
+                self.berth_pool.put(berth_id)
+            self.berth_waits = {}  # carrier id -> event of the vessels waiting for their planned berth time
+        # - - - - - - - - - - - - - - - - -
+        # containers of the yard by block / bay / row / tier, updated by the YC puts (DSCH) and fetches (LOAD)
+        self.yard_inventory = yard_inventory
+        # - - - - - - - - - - - - - - - - -
         self.flag_save_to_mongo = False
+        # arrival, berth, start of operations and end times of the vessels
+        self.vessel_log = {}
         # - - - - - - - - - - - - - - - - -
         super().__init__()
 
-    def initialize_vessel(self, vessel: Vessel, carrier_id: str, pow: dict):
+    def initialize_vessel(self, vessel: Vessel, carrier_id: str, pow: dict, call: VesselCall = None):
         """
         Initialize the vessels and start the process to unload or/and load them 
         """
         try:
             logging.info('initialize_vessel')
-            vessel = vessel(env=self.env, carrier_id=carrier_id, pow=pow)
+            arrival_time = self.env.now
+            berth_id = None
+            qc_dict = {}  # POW -> seized crane
+            if self.berth_allocator is not None:
+                if call is None:
+                    call = VesselCall(carrier_id, self.env.now, pow)
+                assignment = self.berth_allocator.allocate(call, self.env.now)
+                while assignment.start > self.env.now:
+                    # woken up when the call is planned again after a vessel left early
+                    replanned_event = self.env.event()
+                    self.berth_waits[carrier_id] = replanned_event
+                    yield self.env.any_of([self.env.timeout(assignment.start - self.env.now), replanned_event])
+                    self.berth_waits.pop(carrier_id, None)
+                    assignment = self.berth_allocator.assignments[carrier_id]
+                # the berth and the cranes are really free once the previous vessels are done (overruns)
+                berth_id = yield self.berth_pool.get(lambda b: b == assignment.berth_id)
+                for pow_name, qc_id in assignment.pow_qc.items():
+                    qc_dict[pow_name] = yield self.qc_pool.get(lambda i, qc_id=qc_id: i.id == qc_id)
+                    qc_dict[pow_name].carrier_id = carrier_id
+            vessel = vessel(env=self.env, carrier_id=carrier_id, pow=pow, berth_id=berth_id)
+            self.vessel_log[vessel.id] = {
+                "arrival_time": arrival_time, "berth_id": berth_id,
+                "berth_time": self.env.now, "start_time": None, "end_time": None}
             logging.info(
                 f'{self.env.now:.2f}: Vessel:{vessel.id} is currently at berth')
             yield self.env.timeout(random.uniform(5, 10))
+            self.vessel_log[vessel.id]["start_time"] = self.env.now
             logging.info(
                 f'{self.env.now:.2f}: Vessel:{vessel.id} is starting operations')
             # get cranes and start unloading ship
@@ -101,42 +184,64 @@ class Terminal(Processes):
             pow_to_process = []
             for pow_name, pow_wi_list in pow.items():
                 pow_to_process.append(self.env.process(self.execute_pow(
-                    vessel, pow_name, pow_wi_list, unload_done_event)))
+                    vessel, pow_name, pow_wi_list, unload_done_event, qc_dict.get(pow_name))))
 
             # wait for all the cranes to finish
             yield self.env.all_of(pow_to_process)
+            self.vessel_log[vessel.id]["end_time"] = self.env.now
+            if self.berth_allocator is not None:
+                self.berth_pool.put(berth_id)
+                self.berth_allocator.release(carrier_id, self.env.now)
+                # plan the waiting vessels again, in arrival order
+                for waiting_carrier_id, replanned_event in list(self.berth_waits.items()):
+                    self.berth_allocator.replan(
+                        waiting_carrier_id, self.env.now)
+                    if not replanned_event.triggered:
+                        replanned_event.succeed()
             logging.info(
                 f'{self.env.now:.2f}: Vessel:{vessel.id} has been processed')
-            self.move_logger.push_to_mongo()
-            self.che_logger._push_che_config(sim_id=self.move_logger.sim_id)
-            self.che_logger._push_che_event(sim_id=self.move_logger.sim_id)
-            self.flag_save_to_mongo = True
+            self.flush_logs()
         except Exception as e:
             raise e
         finally:
             print(f"Simulation Id: {self.move_logger.sim_id}")
             if not self.flag_save_to_mongo:
-                if len(self.move_logger.move_events) > 0:
-                    self.move_logger.push_to_mongo()
-                if len(self.che_logger.che_config_list) > 0:
-                    self.che_logger._push_che_config(
-                        sim_id=self.move_logger.sim_id)
-                if len(self.che_logger.che_event_list) > 0:
-                    self.che_logger._push_che_event(
-                        sim_id=self.move_logger.sim_id)
-                self.flag_save_to_mongo = True
-
-    def execute_pow(self, vessel: Vessel, pow_name: str, pow_wi_list: list, unload_done_event: simpy.Event):
+                self.flush_logs()
+
+    def flush_logs(self, segment_end: float = None):
+        """
+        Push the moves, CHE configurations, CHE events, status timeline and rollups logged since the last push and
+        close the journals, done at the end of each vessel and of the run (see run_simulation)
+        The rollup segment ends at segment_end (default: now).
+        """
+        self.move_logger.push_to_mongo()
+        self.che_logger._push_che_config(sim_id=self.move_logger.sim_id)
+        self.che_logger._push_che_event(sim_id=self.move_logger.sim_id)
+        self.rollup_logger.push_rollups(self.move_logger.sim_id, self.che_logger.status_timeline,
+                                        self.move_logger.move_ends,
+                                        self.env.now if segment_end is None else segment_end)
+        self.move_logger.close_journal()
+        self.che_logger.close_journal()
+        self.flag_save_to_mongo = True
+
+    def execute_pow(self, vessel: Vessel, pow_name: str, pow_wi_list: list, unload_done_event: simpy.Event,
+                    qc_res: QC = None):
         """
         Execute The point of work (pow) for the vessel and run all the related work instructions
+        (with the crane seized by the vessel for the POW, or the crane of the POW)
         """
         logging.debug(
             f"DEBUG: {self.env.now}: Starting process for {pow_name}")
-        # sort the work instructions by id
-        pow_wi_list.sort(key=lambda wi: wi.id, reverse=True)
+        # work queue fed from the WI list or WI iterator of the POW
+        pow_queue = WIQueue(pow_wi_list, self.wi_chunk_size, sequence_key=self.sequence_key,
+                            interleave_move_kinds=self.interleave_move_kinds)
+        # the POW of the next vessel on the same crane has its own queue
+        queue_key = (vessel.id, pow_name)
+        self.pow_queues[queue_key] = pow_queue
         # seize a crane resource
         c_req = self.env.event()
-        qc_res = yield self.qc_pool.get(lambda i: i.id == pow_name)
+        if qc_res is None:
+            qc_res = yield self.qc_pool.get(lambda i: i.id == pow_name)
         c_req.succeed()
         logging.info(
             f'{self.env.now:.2f}: Vessel:{vessel.id} has requested a crane')
@@ -153,9 +258,9 @@ class Terminal(Processes):
             logging.info(
                 f'{self.env.now:.2f}: Vessel:{vessel.id} has seized crane {qc_res.id}')
             self.flag_load_start = False
-            while len(pow_wi_list) > 0:
+            while pow_queue:
                 # get a container WI
-                wi = pow_wi_list.pop()
+                wi = pow_queue.pop()
                 if wi.move_kind == "DSCH":
                     yield self.env.process(self.process_dsch_wi(wi, qc_res, vessel))
                 elif wi.move_kind == "LOAD":
@@ -171,6 +276,8 @@ class Terminal(Processes):
         if not unload_done_event.triggered:
             unload_done_event.succeed()
         self.qc_pool.put(qc_res)
+        if self.pow_queues.get(queue_key) is pow_queue:
+            del self.pow_queues[queue_key]
         logging.debug(
             f"DEBUG: {self.env.now}: Finished process for {pow_name}")
 
@@ -0,0 +1,223 @@
+from lib.utils import _is_missing
+
+BLOCK_SHIFT = 24  # slot number: block number << BLOCK_SHIFT | slot in the block
+
+
+def label_index(label) -> int:
+    """
+    Index (from 0) of a bay / row / tier label: numbers ('01', 3) count from 1, letters ('A', 'b') from 'A'
+    """
+    if isinstance(label, str):
+        label = label.strip()
+        if label.isdigit():
+            return int(label) - 1
+        if len(label) == 1 and label.isalpha():
+            return ord(label.upper()) - ord("A")
+        raise ValueError(f"Unknown slot label: {label}")
+    return int(label) - 1
+
+
+class YardBlock():
+    """
+    Block of the yard: occupancy array (bay x row x tier) of container handles (0: empty slot) and height of
+    each stack (bay x row), both views of the arrays of the YardInventory
+    """
+
+    def __init__(self, block_id: str, number: int, shape: tuple, slots, heights):
+        self.block_id = block_id
+        self.number = number
+        self.shape = shape
+        self.slots = slots
+        self.heights = heights
+
+    @property
+    def capacity(self) -> int:
+        n_bays, n_rows, n_tiers = self.shape
+        return n_bays * n_rows * n_tiers
+
+
+class YardInventory():
+    """
+    Containers of the yard, by block, bay, row and tier
+
+    Each block is a dense occupancy array (bay x row x tier, int32 handles of the containers) with the height of
+    its stacks (bay x row, int8), and a container id -> slot number dict gives the position of a container: the
+    slot of a container, the height of a stack and the number of containers above a container are O(1).
+    The stacks are kept without holes: a container put above the top of its stack drops on the top, a container
+    fetched from under others costs rehandles, the containers above are put back on the same stack.
+    A yard of 100k TEU takes 4 bytes per slot and one dict entry per container.
+    The positions which cannot be served (slot taken, stack full, unknown block) are counted in conflicts.
+
+    Args:
+        blocks (dict): shape of each block, dict like: {'block_id': (n_bays, n_rows, n_tiers)}
+    """
+
+    def __init__(self, blocks: dict):
+        # numpy is imported with the first inventory, not with the module
+        import numpy as np
+        capacity = sum(n_bays * n_rows * n_tiers for n_bays,
+                       n_rows, n_tiers in blocks.values())
+        n_stacks = sum(n_bays * n_rows for n_bays, n_rows, _ in blocks.values())
+        self.occupancy = np.zeros(capacity, dtype=np.int32)
+        self.stack_heights = np.zeros(n_stacks, dtype=np.int8)
+        self.blocks = {}
+        self._block_list = []
+        slot_offset, stack_offset = 0, 0
+        for number, (block_id, shape) in enumerate(blocks.items()):
+            n_bays, n_rows, n_tiers = shape
+            if n_bays * n_rows * n_tiers >= 1 << BLOCK_SHIFT:
+                raise ValueError(f"Block {block_id} is too large")
+            block = YardBlock(block_id, number, tuple(shape),
+                              self.occupancy[slot_offset:slot_offset + n_bays * n_rows * n_tiers].reshape(shape),
+                              self.stack_heights[stack_offset:stack_offset + n_bays * n_rows].reshape(n_bays, n_rows))
+            self.blocks[block_id] = block
+            self._block_list.append(block)
+            slot_offset += block.capacity
+            stack_offset += n_bays * n_rows
+        self._slots = {}  # container id -> slot number
+        self._ids = [None]  # handle -> container id (handle 0: empty slot)
+        self._free_handles = []
+        self.n_rehandles = 0
+        self.conflicts = {"OCCUPIED": 0, "FLOATING": 0, "FULL": 0,
+                          "UNKNOWN_BLOCK": 0, "UNKNOWN_SLOT": 0, "NOT_IN_YARD": 0}
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, container_id: str):
+        return container_id in self._slots
+
+    # - - - - - - - - - - - - - - - - - queries
+    def _decode(self, slot: int) -> tuple:
+        block = self._block_list[slot >> BLOCK_SHIFT]
+        _, n_rows, n_tiers = block.shape
+        bay_row, tier = divmod(slot & ((1 << BLOCK_SHIFT) - 1), n_tiers)
+        bay, row = divmod(bay_row, n_rows)
+        return block, bay, row, tier
+
+    def _encode(self, block: YardBlock, bay: int, row: int, tier: int) -> int:
+        _, n_rows, n_tiers = block.shape
+        return block.number << BLOCK_SHIFT | (bay * n_rows + row) * n_tiers + tier
+
+    def locate(self, container_id: str) -> tuple:
+        """Slot (block id, bay, row, tier indexes) of a container (None when it is not in the yard)."""
+        slot = self._slots.get(container_id)
+        if slot is None:
+            return None
+        block, bay, row, tier = self._decode(slot)
+        return block.block_id, bay, row, tier
+
+    def stack_height(self, block_id: str, bay: int, row: int) -> int:
+        """Number of containers of a stack."""
+        return int(self.blocks[block_id].heights[bay, row])
+
+    def n_above(self, container_id: str) -> int:
+        """Number of containers above a container of the yard (rehandles to fetch it)."""
+        block, bay, row, tier = self._decode(self._slots[container_id])
+        return int(block.heights[bay, row]) - tier - 1
+
+    def container_at(self, block_id: str, bay: int, row: int, tier: int) -> str:
+        """Container id in a slot (None when the slot is empty)."""
+        return self._ids[self.blocks[block_id].slots[bay, row, tier]]
+
+    def occupancy_ratio(self, block_id: str = None) -> float:
+        """Occupied slots / slots of a block (or of the yard)."""
+        if block_id is None:
+            return len(self._slots) / max(len(self.occupancy), 1)
+        block = self.blocks[block_id]
+        return int(block.heights.sum()) / block.capacity
+
+    # - - - - - - - - - - - - - - - - - moves
+    def place(self, container_id: str, block_id: str, bay, row, tier) -> tuple:
+        """
+        Put a container in a slot (labels of the WI position), on the top of the stack when the slot is taken,
+        above the top or without tier. Returns the slot (block id, bay, row, tier indexes), None when the container
+        could not be placed.
+        """
+        block = self.blocks.get(block_id)
+        if block is None:
+            self.conflicts["UNKNOWN_BLOCK"] += 1
+            return None
+        n_bays, n_rows, n_tiers = block.shape
+        try:
+            bay, row = label_index(bay), label_index(row)
+            tier = None if _is_missing(tier) else label_index(tier)
+        except (TypeError, ValueError):
+            bay, row = -1, -1
+        if not (0 <= bay < n_bays and 0 <= row < n_rows):
+            self.conflicts["UNKNOWN_SLOT"] += 1
+            return None
+        if container_id in self._slots:
+            self.remove(container_id)
+        height = int(block.heights[bay, row])
+        if height >= n_tiers:
+            self.conflicts["FULL"] += 1
+            return None
+        if tier is not None:
+            if tier < height:
+                self.conflicts["OCCUPIED"] += 1
+            elif tier > height:
+                self.conflicts["FLOATING"] += 1
+        tier = height
+        if self._free_handles:
+            handle = self._free_handles.pop()
+            self._ids[handle] = container_id
+        else:
+            handle = len(self._ids)
+            self._ids.append(container_id)
+        block.slots[bay, row, tier] = handle
+        block.heights[bay, row] = height + 1
+        self._slots[container_id] = self._encode(block, bay, row, tier)
+        return block_id, bay, row, tier
+
+    def remove(self, container_id: str) -> int:
+        """
+        Take a container out of the yard, the containers above it go down one tier (rehandled on the same stack).
+        Returns the number of rehandles.
+        """
+        block, bay, row, tier = self._decode(self._slots.pop(container_id))
+        stack = block.slots[bay, row]
+        height = int(block.heights[bay, row])
+        handle = int(stack[tier])
+        n_rehandles = height - tier - 1
+        if n_rehandles > 0:
+            stack[tier:height - 1] = stack[tier + 1:height]
+            for above_tier in range(tier, height - 1):
+                self._slots[self._ids[stack[above_tier]]] = self._encode(
+                    block, bay, row, above_tier)
+        stack[height - 1] = 0
+        block.heights[bay, row] = height - 1
+        self._ids[handle] = None
+        self._free_handles.append(handle)
+        self.n_rehandles += n_rehandles
+        return n_rehandles
+
+    def put_container(self, cont, block_id: str, bay, row, tier) -> tuple:
+        """YC put of a container object: placed in the yard, its location and transit state updated."""
+        slot = self.place(cont.id, block_id, bay, row, tier)
+        if slot is not None:
+            _, _, _, tier_index = slot
+            cont._set_location(block_id, bay, row, tier_index + 1)
+            cont._set_transit_state("YARD")
+        return slot
+
+    def fetch_container(self, cont, block_id: str = None, bay=None, row=None, tier=None) -> int:
+        """
+        YC fetch of a container object, returns the number of rehandles. A container not known by the inventory
+        (in the yard before the run) is first placed at its WI position (block_id, bay, row, tier).
+        """
+        if cont.id not in self._slots:
+            self.conflicts["NOT_IN_YARD"] += 1
+            if block_id is None or self.place(cont.id, block_id, bay, row, tier) is None:
+                return 0
+        n_rehandles = self.remove(cont.id)
+        cont._set_location(None, None, None, None)
+        cont._set_transit_state("EC/OUT")
+        return n_rehandles
+
+    def load_wis(self, wi_list):
+        """Place the containers of LOAD WIs at their yard position (yard of the run start)."""
+        for wi in wi_list:
+            if wi.move_kind == "LOAD":
+                self.put_container(wi.container_obj, wi.fm_block,
+                                   wi.fm_bay, wi.fm_row, wi.fm_tier)
@@ -0,0 +1,207 @@
+import asyncio
+import multiprocessing
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from lib.kpi import compute_terminal_kpis
+from lib.runner import run_simulation
+from lib.wi_shared import SharedActivity
+
+
+def progress_snapshot(terminal) -> dict:
+    """Progress of a run: simulation time reached and number of moves / CHE events processed (traced or not)."""
+    n_moves = sum(counter["n_moves"]
+                  for counter in terminal.move_logger.move_counters.values())
+    n_che_events = sum(terminal.che_logger.che_event_counters.values())
+    return {"sim_time": terminal.env.now, "n_moves": n_moves, "n_che_events": n_che_events,
+            "n_events": n_moves + n_che_events}
+
+
+def run_scenario(activity_dict: dict, scenario: dict, cancel_event=None, progress=None,
+                 flush_on_cancel: bool = True) -> dict:
+    """
+    Run a scenario (run_simulation keyword arguments: n_itv, yc_block_dict, until, ...) in a worker thread or
+    process and return its results as a picklable dict. progress(snapshot) is called every check_interval of
+    simulation time (see progress_snapshot). A run cancelled through the cancel_event stops at the next check and,
+    with flush_on_cancel, pushes the moves and CHE events logged so far.
+
+    Returns:
+        dict: {'simulation_id', 'cancelled', 'sim_time', 'n_moves', 'n_che_events', 'kpis', 'vessel_log'}
+    """
+    if isinstance(activity_dict, SharedActivity):
+        activity_dict = activity_dict.build()
+    progress_callback = None
+    if progress is not None:
+        def progress_callback(terminal):
+            progress(progress_snapshot(terminal))
+    terminal = run_simulation(activity_dict, cancel_event=cancel_event,
+                              progress_callback=progress_callback, **scenario)
+    cancelled = cancel_event is not None and cancel_event.is_set()
+    if cancelled and flush_on_cancel:
+        # partial flush of the records logged before the cancellation
+        terminal.flush_logs()
+    snapshot = progress_snapshot(terminal)
+    return {"simulation_id": terminal.move_logger.sim_id, "cancelled": cancelled, "sim_time": snapshot["sim_time"],
+            "n_moves": snapshot["n_moves"], "n_che_events": snapshot["n_che_events"],
+            "kpis": compute_terminal_kpis(terminal),
+            "vessel_log": terminal.vessel_log}
+
+
+class SimulationHandle():
+    """
+    Run submitted to an AsyncSimulator: progress() async iterator, cancel() and the results as an awaitable
+    (await handle, or await handle.result()). Cancelling the task awaiting the results cancels the run.
+    """
+
+    def __init__(self, loop, cancel_event, progress_queue=None, poll_interval: float = 0.1,
+                 progress_buffer: int = 1000):
+        self.loop = loop
+        self.cancel_event = cancel_event
+        self.last_progress = None
+        self._progress = deque(maxlen=progress_buffer)
+        self._progress_queue = progress_queue  # manager queue of a process run, None for a thread run
+        self._poll_interval = poll_interval
+        self._waiter = None
+        self._future = None
+        self._watcher = None
+
+    def _start(self, future):
+        self._future = future
+        self._watcher = self.loop.create_task(self._watch())
+
+    def _push_progress(self, snapshot: dict):
+        self.last_progress = snapshot
+        self._progress.append(snapshot)
+        self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def _drain_queue(self):
+        if self._progress_queue is None:
+            return
+        while True:
+            try:
+                snapshot = self._progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            self._push_progress(snapshot)
+
+    async def _watch(self):
+        try:
+            while not self._future.done():
+                if self._progress_queue is None:
+                    await asyncio.wait([self._future])
+                else:
+                    await asyncio.wait([self._future], timeout=self._poll_interval)
+                    self._drain_queue()
+            self._drain_queue()
+        finally:
+            self._wake()
+
+    def done(self) -> bool:
+        return self._watcher.done()
+
+    def cancel(self):
+        """Stop the run at its next check (see run_scenario), the results are still returned."""
+        self.cancel_event.set()
+
+    async def progress(self):
+        """Progress snapshots (see progress_snapshot) as they arrive, until the end of the run (single consumer)."""
+        while True:
+            while self._progress:
+                yield self._progress.popleft()
+            if self._watcher.done():
+                return
+            self._waiter = self.loop.create_future()
+            await self._waiter
+            self._waiter = None
+
+    async def result(self) -> dict:
+        try:
+            result = await asyncio.shield(self._future)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        await asyncio.shield(self._watcher)
+        return result
+
+    def __await__(self):
+        return self.result().__await__()
+
+
+class AsyncSimulator():
+    """
+    Asyncio facade of run_simulation for async services: the scenarios run in an executor, the event loop only
+    awaits their progress and results, many what-if runs can be in flight from one loop.
+
+        async with AsyncSimulator(max_workers=4) as simulator:
+            handle = simulator.submit(activity_dict, n_itv=8, yc_block_dict=yc_block_dict, until=until, seed=1)
+            async for snapshot in handle.progress():
+                ...
+            result = await handle
+
+    With executor="thread" the runs share the process (and its global random generators: concurrent seeded runs
+    are not reproducible); with executor="process" the activity and the scenario must be picklable (a
+    SharedActivity avoids pickling the WIs), the progress and the cancellation go through a multiprocessing
+    manager.
+
+    Args:
+        executor (str, optional): "thread" or "process". Defaults to "thread".
+        max_workers (int, optional): runs in parallel. Defaults to the executor default.
+        poll_interval (float, optional): seconds between two reads of the progress of a process run. Defaults to 0.1.
+        flush_on_cancel (bool, optional): push the records of a cancelled run. Defaults to True.
+    """
+
+    def __init__(self, executor: str = "thread", max_workers: int = None, poll_interval: float = 0.1,
+                 flush_on_cancel: bool = True):
+        if executor == "thread":
+            self.executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="simulation")
+        elif executor == "process":
+            self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            raise ValueError(f"Unknown executor: {executor}")
+        self.executor_type = executor
+        self.poll_interval = poll_interval
+        self.flush_on_cancel = flush_on_cancel
+        self._manager = None
+
+    def submit(self, activity_dict: dict, **scenario) -> SimulationHandle:
+        """Start a run of the scenario (run_simulation keyword arguments), from a coroutine of the loop."""
+        loop = asyncio.get_running_loop()
+        if self.executor_type == "thread":
+            handle = SimulationHandle(loop, threading.Event())
+
+            def progress(snapshot):
+                loop.call_soon_threadsafe(handle._push_progress, snapshot)
+        else:
+            if self._manager is None:
+                self._manager = multiprocessing.Manager()
+            progress_queue = self._manager.Queue()
+            handle = SimulationHandle(loop, self._manager.Event(), progress_queue,
+                                      self.poll_interval)
+            progress = progress_queue.put
+        future = loop.run_in_executor(self.executor, run_scenario, activity_dict, scenario,
+                                      handle.cancel_event, progress, self.flush_on_cancel)
+        handle._start(future)
+        return handle
+
+    async def run(self, activity_dict: dict, **scenario) -> dict:
+        """Run a scenario and return its results."""
+        return await self.submit(activity_dict, **scenario)
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        # joining the workers would block the loop
+        await asyncio.get_running_loop().run_in_executor(None, self.shutdown)
@@ -0,0 +1,118 @@
+import datetime
+import math
+
+
+def to_bson_value(value):
+    """
+    Native BSON value of a logger field: None for the missing values (None, nan, NaT),
+    python scalars instead of numpy ones, datetimes and strings as they are
+    """
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        return None if math.isnan(value) else value
+    if isinstance(value, datetime.datetime):
+        # NaT is a datetime that is not equal to itself
+        return None if value != value else value
+    item = getattr(value, "item", None)
+    if item is not None:
+        # numpy scalar
+        return to_bson_value(item())
+    return value
+
+
+def _hashable(value):
+    """Hashable form of a BSON value, the lists (ex: che_yard_zone) and sub-documents included."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple((k, _hashable(v)) for k, v in value.items())
+    return value
+
+
+def _to_bson_document(record: dict, extra_fields: dict = None) -> dict:
+    document = {key: to_bson_value(value) for key, value in record.items()}
+    if extra_fields:
+        document.update(extra_fields)
+    return document
+
+
+def encode_bson_batches(records: list, extra_fields: dict = None, drop_duplicates: bool = False,
+                        batch_size: int = 1000, key_fields: tuple = None):
+    """
+    Encode the logger records (dicts) straight to BSON documents, in a single pass and without DataFrame
+
+    Args:
+        records (list): logger records
+        extra_fields (dict, optional): fields set on every document (ex: simulation_id, created_at). Defaults to None.
+        drop_duplicates (bool, optional): skip the records with the same key as an already encoded one. Defaults to False.
+        batch_size (int, optional): number of documents per batch. Defaults to 1000.
+        key_fields (tuple, optional): natural key of the records for drop_duplicates (ex: ('move_id',)).
+            Defaults to None (all the fields).
+
+    Yields:
+        list: batches of RawBSONDocument, ready for insert_many
+    """
+    from bson import encode
+    from bson.raw_bson import RawBSONDocument
+    seen = set() if drop_duplicates else None
+    batch = []
+    for record in records:
+        document = _to_bson_document(record)
+        if seen is not None:
+            if key_fields is not None:
+                record_key = tuple(_hashable(document[field]) for field in key_fields)
+            else:
+                record_key = _hashable(document)
+            if record_key in seen:
+                continue
+            seen.add(record_key)
+        if extra_fields:
+            document.update(extra_fields)
+        batch.append(RawBSONDocument(encode(document)))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ensure_unique_key_index(collection, key_fields: tuple):
+    """Create the unique index on the natural key of the records (no-op when it already exists)."""
+    collection.create_index([(field, 1) for field in key_fields], unique=True,
+                            name="_".join(key_fields) + "_key")
+
+
+def upsert_bson_batches(collection, records: list, key_fields: tuple, extra_fields: dict = None,
+                        batch_size: int = 1000) -> int:
+    """
+    Write the logger records as unordered bulk upserts on their natural key (see ensure_unique_key_index):
+    writing the same records again (re-flush, retry of a failed batch) replaces them instead of duplicating them
+
+    Args:
+        collection: MongoDB collection
+        records (list): logger records
+        key_fields (tuple): natural key of the records (ex: ('simulation_id', 'move_id'))
+        extra_fields (dict, optional): fields set on every document, may be part of the key. Defaults to None.
+        batch_size (int, optional): number of upserts per bulk write. Defaults to 1000.
+
+    Returns:
+        int: number of written documents
+    """
+    from bson import encode
+    from bson.raw_bson import RawBSONDocument
+    from pymongo import ReplaceOne
+    n_written = 0
+    requests = []
+    for record in records:
+        document = _to_bson_document(record, extra_fields)
+        requests.append(ReplaceOne({field: document[field] for field in key_fields},
+                                   RawBSONDocument(encode(document)), upsert=True))
+        if len(requests) >= batch_size:
+            collection.bulk_write(requests, ordered=False)
+            n_written += len(requests)
+            requests = []
+    if requests:
+        collection.bulk_write(requests, ordered=False)
+        n_written += len(requests)
+    return n_written
@@ -1,7 +1,10 @@
 from datetime import datetime, timedelta
-import pandas as pd
-import numpy as np
 from lib.connect_db import DataBase
+from lib.sinks import Sink, NullSink, make_default_sink
+from lib.che_timeline import CHEStatusTimeline, CHE_STATUS_INTERVAL_KEY_FIELDS
+from lib.tracing import TracingPolicy
+from lib.event_journal import EventJournalWriter, CHE_EVENT_JOURNAL_FIELDS
+from lib.event_bus import EventBus, CHE_EVENT
 from components.ec.wi import WI
 from lib.utils import convert_sim_time_to_datetime, gather_position_elements, find_fm_block_ref, find_to_block_ref
 import sys
@@ -23,6 +26,7 @@ che_event_generic = {
     "pow_id": None,
     "wi_id": None,
     "che_id": None,
+    "event_seq": None,  # sequence number of the event of the CHE
     "che_status": None,  # idle, busy, moving, waiting, error
     "move_kind": None,
     "move_kind_description": None,
@@ -31,22 +35,46 @@ che_event_generic = {
     "event_description": None,
     "last_position": None,
 }
+# natural keys of the CHE records
+CHE_CONFIG_KEY_FIELDS = ("simulation_id", "che_id")
+CHE_EVENT_KEY_FIELDS = ("simulation_id", "che_id", "event_seq")
 
 
 class CHELog(DataBase):
 
     def __init__(self, db_name: str, string_conncetion: str, output_to_csv_file: bool = False,
-                 output_path: str = 'data/'):
+                 output_path: str = 'data/', tracing: TracingPolicy = None, journal_dir: str = None,
+                 sim_id: str = None, event_sink: Sink = None, config_sink: Sink = None,
+                 event_bus: EventBus = None, timeline_sink: Sink = None):
         self.db_name = db_name
         self.string_conncetion = string_conncetion
         self.output_to_csv_file = output_to_csv_file
         self.output_path = output_path
-        if not self.output_to_csv_file:
-            self.db = self.getMongoConnection(
-                self.db_name, self.string_conncetion)
+        self.db = None  # MongoDB database of the default sinks, connected on first use
         self.che_config_list = []
         self.che_event_list = []
-        self.sim_id = None
+        self.che_event_seq = {}  # che_id -> sequence number of the next event
+        # destinations of the records (default: csv files or MongoDB collections, see _get_sink)
+        self.event_sink = event_sink
+        self.config_sink = config_sink
+        self.timeline_sink = timeline_sink
+        # number of records already written to the sinks
+        self._n_pushed_configs = 0
+        self._n_pushed_events = 0
+        # status intervals of the CHEs, built from the events during the run
+        self.status_timeline = CHEStatusTimeline()
+        self._n_pushed_intervals = 0
+        # events logged in full (None: all of them), every event is counted in che_event_counters
+        self.tracing = tracing
+        self.che_event_counters = {}  # (che_id, che_status) -> number of events
+        self.sim_id = sim_id
+        # binary journal of the CHE events (see lib.event_journal), flushed on every push
+        self.journal = None
+        if journal_dir is not None:
+            self.journal = EventJournalWriter(os.path.join(
+                journal_dir, f"che_event_logs_{self.sim_id}"), CHE_EVENT_JOURNAL_FIELDS)
+        # CHE events published to the subscribers as they are logged (see lib.event_bus)
+        self.event_bus = event_bus
         self.facility_id = os.environ.get('SIMULATION_FACILITY_ID', 'DMSLOG')
 
     def _add_che_config(self, che: object):
@@ -61,11 +89,26 @@ class CHELog(DataBase):
         che_config["che_equipment_pool_id"] = che.equipment_pool_id
         self.che_config_list.append(che_config)
 
+    def _register_che(self, che: object):
+        """Register the type of a CHE (before its first event) for the CHE type filters of the event bus."""
+        if self.event_bus is not None:
+            self.event_bus.register_che(che.id, che.type)
+
     def _add_single_che_event(self, env, wi: object, che_id: str, che_status: str, event_description: str):
         """Add a single CHE event to the list."""
+        event_seq = self.che_event_seq.get(che_id, 0)
+        self.che_event_seq[che_id] = event_seq + 1
+        counter_key = (che_id, che_status)
+        self.che_event_counters[counter_key] = self.che_event_counters.get(
+            counter_key, 0) + 1
+        self.status_timeline.add_event(
+            che_id, che_status, env.now, wi.id if wi is not None else None)
+        if self.tracing is not None and not self.tracing.traces(wi, che_id):
+            return
         che_event = che_event_generic.copy()
         che_event["simulation_id"] = self.sim_id
         che_event["che_id"] = che_id
+        che_event["event_seq"] = event_seq
         che_event["che_status"] = che_status
         che_event["event_time"] = env.now
         che_event["event_datetime"] = convert_sim_time_to_datetime(env.now)
@@ -79,6 +122,10 @@ class CHELog(DataBase):
             che_event["last_position"] = self._get_che_event_last_position(
                 wi, event_description)
         self.che_event_list.append(che_event)
+        if self.journal is not None:
+            self.journal.append(che_event)
+        if self.event_bus is not None:
+            self.event_bus.publish(CHE_EVENT, che_event)
 
     def _extract_move_stage(self, event_description: str):
         """Extract the move stage from the event description."""
@@ -191,65 +238,84 @@ class CHELog(DataBase):
     #         else:
     #             return None
 
-    def prepare_df_mongo_save(self, df: pd.DataFrame, time_columns_to_format: list = ['created_at']) -> pd.DataFrame:
-        """Prepare the dataframe for saving to MongoDB."""
-        df['simulation_id'] = self.sim_id
-        df['created_at'] = datetime.utcnow()
-        data_types_infos = {str(col): str(dtype.name)
-                            for col, dtype in df.dtypes.to_dict().items()}
-        int_columns_list = [
-            c for c, dtype in data_types_infos.items() if dtype.startswith('int')]
-        float_columns_list = [
-            c for c, dtype in data_types_infos.items() if dtype.startswith('float')]
-
-        for col in int_columns_list:
-            df[col] = df[col].astype('int')
-
-        for col in float_columns_list:
-            df[col] = df[col].astype('float')
-        for col in time_columns_to_format:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
-        df[time_columns_to_format] = df[time_columns_to_format].replace(
-            'NaT', '')
-        df[time_columns_to_format] = df[time_columns_to_format].astype(
-            object).mask(df.isna(), np.nan)
-        return df
-
-    def _push_che_config(self, sim_id: int, collection_name: str = 'che_config'):
-        """ Push the CHE configuration to the MongoDB collection """
+    def _get_sink(self, sink_name: str, collection_name: str, key_fields: tuple):
+        sink = getattr(self, sink_name)
+        if sink is None:
+            # default destination (csv file or MongoDB collection), once the simulation id is known
+            if not self.output_to_csv_file and self.db is None:
+                self.db = self.getMongoConnection(
+                    self.db_name, self.string_conncetion)
+            sink = make_default_sink(self.output_to_csv_file, self.output_path, collection_name,
+                                     self.sim_id, self.db, key_fields)
+            setattr(self, sink_name, sink)
+        return sink
+
+    def _push_che_config(self, sim_id: str, collection_name: str = 'che_config'):
+        """ Push the CHE configurations added since the last push to the config sink """
         self.sim_id = sim_id
         self.collection_name = collection_name
-        df = pd.DataFrame(self.che_config_list)
-        df = self.prepare_df_mongo_save(df)
-        if self.output_to_csv_file:
-            file_path_name = os.path.join(
-                self.output_path, f"{self.collection_name}_{self.sim_id}.csv")
-            df.to_csv(file_path_name, index=False)
+        sink = self._get_sink('config_sink', collection_name,
+                              CHE_CONFIG_KEY_FIELDS)
+        n_configs = len(self.che_config_list)
+        che_configs = self.che_config_list[self._n_pushed_configs:n_configs]
+        for che_config in che_configs:
+            che_config["simulation_id"] = self.sim_id
+        self._n_pushed_configs = n_configs
+        sink.write(che_configs)
+        sink.flush()
+        if che_configs:
+            print(
+                f"Pushed {len(che_configs)} CHE configurations to {sink.name}")
         else:
-            if not df.empty:
-                self.db[collection_name].insert_many(
-                    df.to_dict(orient='records'))
-                print(
-                    f"Pushed {len(df)} CHE configurations to MongoDB collection: {collection_name}")
-            else:
-                print("No CHE configurations to push to MongoDB.")
-
-    def _push_che_event(self, sim_id: int, collection_name: str = 'che_event_logs'):
-        """ Push the CHE events to the MongoDB collection """
+            print("No CHE configurations to push.")
+
+    def close_journal(self):
+        """Close the files of the CHE event journal (reopened in a new segment if events are logged again)."""
+        if self.journal is not None:
+            self.journal.close()
+
+    def _push_che_event(self, sim_id: str, collection_name: str = 'che_event_logs'):
+        """ Push the CHE events logged since the last push to the event sink """
         self.sim_id = sim_id
         self.collection_name = collection_name
-        df = pd.DataFrame(self.che_event_list)
-        df = self.prepare_df_mongo_save(df, time_columns_to_format=[
-                                        'event_datetime', 'created_at'])
-        if self.output_to_csv_file:
+        if self.journal is not None:
+            self.journal.flush()
+        sink = self._get_sink('event_sink', collection_name,
+                              CHE_EVENT_KEY_FIELDS)
+        n_events = len(self.che_event_list)
+        che_events = self.che_event_list[self._n_pushed_events:n_events]
+        for che_event in che_events:
+            che_event["simulation_id"] = self.sim_id
+        self._n_pushed_events = n_events
+        sink.write(che_events)
+        sink.flush()
+        if che_events:
+            print(f"Pushed {len(che_events)} CHE events to {sink.name}")
+        else:
+            print("No CHE events to push.")
+        self._push_che_status_timeline()
+
+    def _push_che_status_timeline(self, collection_name: str = 'che_status_timeline'):
+        """
+        Export the status timeline (intervals up to the last event): a compressed .npz file of dictionary-encoded
+        columns with the csv output, interval records upserted on (simulation_id, che_id, start_time) otherwise
+        or with a timeline sink (the open intervals are pushed again with their final end on the next push),
+        nothing with a NullSink
+        """
+        if isinstance(self.timeline_sink, NullSink):
+            return
+        if self.output_to_csv_file and self.timeline_sink is None:
             file_path_name = os.path.join(
-                self.output_path, f"{self.collection_name}_{self.sim_id}.csv")
-            df.to_csv(file_path_name, index=False)
+                self.output_path, f"{collection_name}_{self.sim_id}.npz")
+            self.status_timeline.save(file_path_name)
         else:
-            if not df.empty:
-                self.db[collection_name].insert_many(
-                    df.to_dict(orient='records'))
-                print(
-                    f"Pushed {len(df)} CHE events to MongoDB collection: {collection_name}")
-            else:
-                print("No CHE events to push to MongoDB.")
+            sink = self._get_sink('timeline_sink', collection_name,
+                                  CHE_STATUS_INTERVAL_KEY_FIELDS)
+            n_intervals = len(self.status_timeline)
+            intervals = self.status_timeline.to_records(
+                self._n_pushed_intervals)
+            for interval in intervals:
+                interval["simulation_id"] = self.sim_id
+            self._n_pushed_intervals = n_intervals
+            sink.write(intervals)
+            sink.flush()
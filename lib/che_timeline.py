@@ -0,0 +1,116 @@
+from array import array
+
+# natural key of a status interval
+CHE_STATUS_INTERVAL_KEY_FIELDS = ("simulation_id", "che_id", "start_time")
+
+
+class CHEStatusTimeline:
+    """
+    Run-length-encoded status timeline of the CHEs, built incrementally from the CHE events
+
+    Consecutive events of a CHE with the same status and WI are merged into one interval
+    (che_id, status, start, end, wi_id). The CHE ids and statuses are dictionary-encoded (int codes into
+    the strings table), the intervals are kept in compact typed arrays (one column per field, -1 for no WI).
+    The interval of each CHE stays open until its next status change.
+    """
+
+    def __init__(self):
+        self.strings = []  # dictionary of the encoded strings
+        self._string_codes = {}
+        self.che_codes = array('i')
+        self.status_codes = array('i')
+        self.start_times = array('d')
+        self.end_times = array('d')
+        self.wi_ids = array('q')
+        self._open = {}  # che code -> [status code, start time, wi id] of the open interval
+        self.last_time = 0.0
+
+    def intern(self, value: str) -> int:
+        """Code of a string in the dictionary (added on first use)."""
+        code = self._string_codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            self._string_codes[value] = code
+            self.strings.append(value)
+        return code
+
+    def add_event(self, che_id: str, status: str, time: float, wi_id: int = None):
+        """Record a CHE event: extends the open interval of the CHE or closes it and opens a new one."""
+        che_code = self.intern(che_id)
+        status_code = self.intern(status)
+        wi_id = -1 if wi_id is None else int(wi_id)
+        self.last_time = max(self.last_time, time)
+        interval = self._open.get(che_code)
+        if interval is not None:
+            if interval[0] == status_code and interval[2] == wi_id:
+                return
+            self._close(che_code, interval, time)
+        self._open[che_code] = [status_code, time, wi_id]
+
+    def _close(self, che_code: int, interval: list, end_time: float):
+        if end_time <= interval[1]:
+            # zero-length interval (several status changes at the same time)
+            return
+        self.che_codes.append(che_code)
+        self.status_codes.append(interval[0])
+        self.start_times.append(interval[1])
+        self.end_times.append(end_time)
+        self.wi_ids.append(interval[2])
+
+    def __len__(self):
+        return len(self.che_codes)
+
+    def _iter_intervals(self, start: int = 0, until: float = None):
+        """(che code, status code, start, end, wi id) of the closed intervals from start, then of the open ones."""
+        for i in range(start, len(self.che_codes)):
+            yield self.che_codes[i], self.status_codes[i], self.start_times[i], self.end_times[i], self.wi_ids[i]
+        until = self.last_time if until is None else until
+        for che_code, (status_code, start_time, wi_id) in self._open.items():
+            if until > start_time:
+                yield che_code, status_code, start_time, until, wi_id
+
+    def columns(self, until: float = None) -> dict:
+        """
+        Numpy columns of the timeline, the open intervals end at until (defaults to the last event time)
+
+        Returns:
+            dict: che_code, status_code (int32), start_time, end_time (float64), wi_id (int64) and strings
+        """
+        import numpy as np
+        # the closed intervals are read straight from the typed arrays, only the open ones are built
+        open_intervals = list(self._iter_intervals(
+            start=len(self.che_codes), until=until))
+        che_codes, status_codes, start_times, end_times, wi_ids = zip(
+            *open_intervals) if open_intervals else ((), (), (), (), ())
+        return {
+            "che_code": np.concatenate([np.frombuffer(self.che_codes, dtype=np.int32),
+                                        np.asarray(che_codes, dtype=np.int32)]),
+            "status_code": np.concatenate([np.frombuffer(self.status_codes, dtype=np.int32),
+                                           np.asarray(status_codes, dtype=np.int32)]),
+            "start_time": np.concatenate([np.frombuffer(self.start_times, dtype=np.float64),
+                                          np.asarray(start_times, dtype=np.float64)]),
+            "end_time": np.concatenate([np.frombuffer(self.end_times, dtype=np.float64),
+                                        np.asarray(end_times, dtype=np.float64)]),
+            "wi_id": np.concatenate([np.frombuffer(self.wi_ids, dtype=np.int64),
+                                     np.asarray(wi_ids, dtype=np.int64)]),
+            "strings": np.asarray(self.strings, dtype=str),
+        }
+
+    def to_records(self, start: int = 0, until: float = None) -> list:
+        """Decoded interval records (che_id, che_status, start_time, end_time, duration, wi_id), ex: for a Gantt chart."""
+        return [{"che_id": self.strings[che_code], "che_status": self.strings[status_code],
+                 "start_time": start_time, "end_time": end_time, "duration": end_time - start_time,
+                 "wi_id": wi_id if wi_id >= 0 else None}
+                for che_code, status_code, start_time, end_time, wi_id in self._iter_intervals(start, until)]
+
+    def save(self, file_path: str, until: float = None):
+        """Save the columns of the timeline (see columns) to a compressed .npz file."""
+        import numpy as np
+        np.savez_compressed(file_path, **self.columns(until))
+
+
+def load_timeline(file_path: str) -> dict:
+    """Load the columns of a timeline saved by CHEStatusTimeline.save."""
+    import numpy as np
+    with np.load(file_path) as data:
+        return {name: data[name] for name in data.files}
@@ -1,11 +1,11 @@
 import json
 import os
-import numpy as np
-import pandas as pd
 import logging
 import datetime
 import time
-from pymongo import MongoClient
+
+# pooled MongoClient by (connection string, process id), see DataBase.getMongoConnection
+_mongo_clients = {}
 
 
 class DataBase:
@@ -22,15 +22,22 @@ class DataBase:
             _type_: _description_
         """
 
+        from pymongo import MongoClient
         mongoStringConnection = os.environ.get(string_conncetion)
         # print(f"DEBUG: getMongoConnection : {mongoStringConnection}")
-        client = MongoClient(mongoStringConnection)
+        # one client (and its connection pool) per connection string and process:
+        # the loggers, sinks and WI sources of a run share the pooled connections
+        client_key = (mongoStringConnection, os.getpid())
+        client = _mongo_clients.get(client_key)
+        if client is None:
+            client = MongoClient(mongoStringConnection)
+            _mongo_clients[client_key] = client
 
         mongoDatabase = client[DB]
 
         return mongoDatabase
 
-    def pushDataFrameIntoMongoCollection(self, dbName: str, collectionName: str, stringConncetion: str, df: pd.DataFrame,
+    def pushDataFrameIntoMongoCollection(self, dbName: str, collectionName: str, stringConncetion: str, df,
                                          deleteExistingDocumentsBeforePush: bool = True, deleteQuery={}) -> None:
         """Push dataframe into a mongo collection  
 
@@ -71,7 +78,7 @@ class DataBase:
         logging.info("The new documents insertion have been finished --- %s seconds ---" %
                      (time.time() - start_time))
 
-    def loadCollectionFromMongo(self, dbName: str, collectionName: str, stringConncetion: str, query: dict = None, projection=None) -> pd.DataFrame:
+    def loadCollectionFromMongo(self, dbName: str, collectionName: str, stringConncetion: str, query: dict = None, projection=None):
         """Load mongo collection as dataframe using find method
 
         Args:
@@ -83,6 +90,7 @@ class DataBase:
         Returns:
             pd.DataFrame: collection as a dataframe
         """
+        import pandas as pd
         start_time = time.time()
         logging.info(f"Loading {collectionName} Data ... ")
         dbConn = self.getMongoConnection(dbName, stringConncetion)
@@ -108,6 +116,7 @@ class MyEncoder(json.JSONEncoder):
     """
 
     def default(self, obj):
+        import numpy as np
         if isinstance(obj, np.integer):
             return int(obj)
         elif isinstance(obj, np.floating):
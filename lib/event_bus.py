@@ -0,0 +1,140 @@
+from collections import deque
+
+MOVE_EVENT = "move"  # records of MovementTracker.log_move
+CHE_EVENT = "che_event"  # records of CHELog._add_single_che_event
+EVENT_TYPES = (MOVE_EVENT, CHE_EVENT)
+
+
+class Subscription():
+    """Callback of a subscriber for an event type, with its filters (None: no filter)."""
+
+    def __init__(self, event_type: str, callback, pow_ids=None, che_types=None, predicate=None):
+        self.event_type = event_type
+        self.callback = callback
+        self.pow_ids = set(pow_ids) if pow_ids is not None else None
+        self.che_types = set(che_types) if che_types is not None else None
+        self.predicate = predicate
+
+
+class EventBus():
+    """
+    In-process publish / subscribe of the logger records: the MovementTracker publishes every move (MOVE_EVENT)
+    and the CHELog every CHE event it logs (CHE_EVENT), the subscribers get the records as they are logged
+
+    A subscriber registers a callback(event_type, record) for an event type, optionally filtered on the POWs,
+    on the CHE types (QC, TT, RTG: type of the che_id of the record, registered with the CHE configurations)
+    or by a predicate(record). The records are the ones of the loggers: read only.
+    Publishing an event type without subscriber is a dict lookup.
+    """
+
+    def __init__(self):
+        self._subscriptions = {}  # event type -> list of Subscription
+        self.che_types = {}  # che id -> che type
+
+    def register_che(self, che_id: str, che_type: str):
+        self.che_types[che_id] = che_type
+
+    def has_subscribers(self, event_type: str) -> bool:
+        return bool(self._subscriptions.get(event_type))
+
+    def subscribe(self, event_type: str, callback, pow_ids: list = None, che_types: list = None,
+                  predicate=None) -> Subscription:
+        """Register callback(event_type, record) for the records of event_type (see EVENT_TYPES)."""
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type: {event_type}")
+        subscription = Subscription(
+            event_type, callback, pow_ids, che_types, predicate)
+        # copy on write: a callback can unsubscribe while the event is dispatched
+        self._subscriptions[event_type] = self._subscriptions.get(
+            event_type, []) + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = [s for s in self._subscriptions.get(subscription.event_type, [])
+                         if s is not subscription]
+        if subscriptions:
+            self._subscriptions[subscription.event_type] = subscriptions
+        else:
+            self._subscriptions.pop(subscription.event_type, None)
+
+    def publish(self, event_type: str, record: dict):
+        subscriptions = self._subscriptions.get(event_type)
+        if not subscriptions:
+            return
+        for subscription in subscriptions:
+            if subscription.pow_ids is not None and record.get("pow_id") not in subscription.pow_ids:
+                continue
+            if subscription.che_types is not None and \
+                    self.che_types.get(record.get("che_id")) not in subscription.che_types:
+                continue
+            if subscription.predicate is not None and not subscription.predicate(record):
+                continue
+            subscription.callback(event_type, record)
+
+
+class AsyncEventStream():
+    """
+    Asyncio adapter of the EventBus: async iterator of the (event_type, record) of the subscribed event types,
+    for a simulation running in another thread (ex: an executor) or in the loop thread itself.
+    The records are handed to the loop with call_soon_threadsafe; when the consumer falls more than maxsize
+    records behind, the oldest ones are dropped (n_dropped). close() ends the iteration.
+
+        async for event_type, record in AsyncEventStream(terminal.event_bus, pow_ids=["QC01"]):
+            ...
+
+    Args:
+        bus (EventBus): bus of the terminal
+        event_types (tuple, optional): subscribed event types. Defaults to EVENT_TYPES.
+        maxsize (int, optional): records kept for the consumer. Defaults to 10000.
+        loop (asyncio.AbstractEventLoop, optional): loop of the consumer. Defaults to the running loop.
+        **filters: pow_ids, che_types and predicate of the subscriptions (see EventBus.subscribe)
+    """
+
+    _END = object()
+
+    def __init__(self, bus: EventBus, event_types: tuple = EVENT_TYPES, maxsize: int = 10000, loop=None,
+                 **filters):
+        # asyncio is imported with the first stream, not with the module
+        import asyncio
+        self.bus = bus
+        self.maxsize = maxsize
+        self.loop = loop if loop is not None else asyncio.get_running_loop()
+        self.n_dropped = 0
+        self._items = deque()
+        self._waiter = None
+        self._closed = False
+        self._subscriptions = [bus.subscribe(event_type, self._on_event, **filters)
+                               for event_type in event_types]
+
+    def _on_event(self, event_type: str, record: dict):
+        self.loop.call_soon_threadsafe(self._push, (event_type, record))
+
+    def _push(self, item):
+        if item is not self._END and len(self._items) >= self.maxsize:
+            self._items.popleft()
+            self.n_dropped += 1
+        self._items.append(item)
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def close(self):
+        """Unsubscribe, the records already received are still iterated."""
+        if self._closed:
+            return
+        self._closed = True
+        for subscription in self._subscriptions:
+            self.bus.unsubscribe(subscription)
+        self.loop.call_soon_threadsafe(self._push, self._END)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._items:
+            self._waiter = self.loop.create_future()
+            await self._waiter
+            self._waiter = None
+        item = self._items.popleft()
+        if item is self._END:
+            raise StopAsyncIteration
+        return item
@@ -0,0 +1,205 @@
+import glob
+import json
+import math
+import os
+import struct
+from datetime import datetime
+from lib.utils import convert_sim_time_to_datetime
+
+# record layouts: (field, type), type is 'str' (interned string id, int32, -1 for None),
+# 'int' (int64, -1 for None) or 'float' (float64, nan for None)
+MOVE_JOURNAL_FIELDS = (
+    ("pow_id", "str"), ("line_op", "str"), ("ufv_id", "int"), ("wi_id", "int"), ("move_id", "str"),
+    ("container_id", "str"), ("category", "str"), ("freight_kind", "str"), ("carrier_id", "str"),
+    ("move_kind", "str"), ("move_kind_description", "str"), ("che_id", "str"),
+    ("fm_che", "str"), ("fm_block_ref", "str"), ("fm_block_class", "str"), ("fm_block", "str"),
+    ("fm_bay", "str"), ("fm_row", "str"), ("fm_tier", "str"),
+    ("to_che", "str"), ("to_block_ref", "str"), ("to_block_class", "str"), ("to_block", "str"),
+    ("to_bay", "str"), ("to_row", "str"), ("to_tier", "str"),
+    ("move_dispatch_time", "float"), ("move_start_time", "float"), ("move_end_time", "float"),
+)
+CHE_EVENT_JOURNAL_FIELDS = (
+    ("pow_id", "str"), ("wi_id", "int"), ("che_id", "str"), ("event_seq", "int"), ("che_status", "str"),
+    ("move_kind", "str"), ("move_kind_description", "str"), ("event_time", "float"),
+    ("event_description", "str"), ("last_position", "str"),
+)
+_STRUCT_CODES = {"str": "i", "int": "q", "float": "d"}
+_NUMPY_TYPES = {"str": "<i4", "int": "<i8", "float": "<f8"}
+_DATE_REFERENCE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def journal_dtype(fields: tuple):
+    """Numpy structured dtype of the records of a journal (same packed layout as the struct records)."""
+    import numpy as np
+    return np.dtype([(name, _NUMPY_TYPES[kind]) for name, kind in fields])
+
+
+class EventJournalWriter:
+    """
+    Append-only binary journal of logger records (moves or CHE events)
+
+    The records are packed with struct in a fixed layout and appended to segment files
+    (<path>_<segment>.bin), the strings are interned: each segment has its own string dictionary,
+    appended as json lines to <path>_<segment>.strings before the records that use them are written.
+    A crash leaves at most a partial last record, which the reader ignores.
+    A closed journal (ex: end of a vessel) starts a new segment on its next append.
+
+    Args:
+        path (str): path prefix of the segments (ex: data/journal/sim_move_events_<simulation_id>)
+        fields (tuple): record layout (MOVE_JOURNAL_FIELDS or CHE_EVENT_JOURNAL_FIELDS)
+        records_per_segment (int, optional): number of records of a segment. Defaults to 1 000 000.
+    """
+
+    def __init__(self, path: str, fields: tuple, records_per_segment: int = 1000000):
+        self.path = path
+        self.fields = fields
+        self.records_per_segment = records_per_segment
+        self._struct = struct.Struct(
+            "<" + "".join(_STRUCT_CODES[kind] for _, kind in fields))
+        self.date_reference = datetime.now().replace(
+            hour=6, minute=0, second=0, microsecond=0).strftime(_DATE_REFERENCE_FORMAT)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.segment = -1
+        self._data_file = None
+        self._strings_file = None
+        self._open_segment(0)
+
+    def _open_segment(self, segment: int):
+        self.close()
+        self.segment = segment
+        segment_path = f"{self.path}_{segment:05d}"
+        with open(f"{segment_path}.json", 'w') as f:
+            json.dump({"fields": self.fields,
+                      "date_reference": self.date_reference}, f)
+        self._data_file = open(f"{segment_path}.bin", 'wb')
+        # line-buffered: a new string reaches the file before any record using it
+        self._strings_file = open(f"{segment_path}.strings", 'w', buffering=1)
+        self._string_ids = {}
+        self._n_records = 0
+
+    def _intern(self, value) -> int:
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return -1
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = len(self._string_ids)
+            self._string_ids[value] = string_id
+            self._strings_file.write(json.dumps(value) + "\n")
+        return string_id
+
+    def append(self, record: dict):
+        """Append a logger record (dict with the journal fields)."""
+        if self._data_file is None or self._n_records >= self.records_per_segment:
+            self._open_segment(self.segment + 1)
+        values = []
+        for name, kind in self.fields:
+            value = record[name]
+            if kind == "str":
+                values.append(self._intern(value))
+            elif kind == "int":
+                values.append(-1 if value is None else int(value))
+            else:
+                values.append(math.nan if value is None else float(value))
+        self._data_file.write(self._struct.pack(*values))
+        self._n_records += 1
+
+    def flush(self):
+        """Write the buffered records to the OS."""
+        if self._strings_file is not None:
+            self._strings_file.flush()
+            self._data_file.flush()
+
+    def close(self):
+        """Write the buffered records and release the files of the segment."""
+        if self._data_file is not None:
+            self.flush()
+            self._data_file.close()
+            self._strings_file.close()
+            self._data_file = None
+            self._strings_file = None
+
+
+class JournalSegment:
+    """
+    Memory-mapped segment of a journal: columns are numpy views on the file (nothing is parsed),
+    the string columns hold ids into the strings list of the segment
+    """
+
+    def __init__(self, segment_path: str):
+        import numpy as np
+        with open(f"{segment_path}.json") as f:
+            meta = json.load(f)
+        self.fields = tuple(tuple(field) for field in meta["fields"])
+        self.date_reference = meta["date_reference"]
+        dtype = journal_dtype(self.fields)
+        n_records = os.path.getsize(f"{segment_path}.bin") // dtype.itemsize
+        # a partial last record (crash while appending) is left out
+        self.records = np.memmap(f"{segment_path}.bin", dtype=dtype, mode='r', shape=(n_records,)) \
+            if n_records > 0 else np.empty(0, dtype=dtype)
+        with open(f"{segment_path}.strings") as f:
+            self.strings = [json.loads(line)
+                            for line in f if line.endswith("\n")]
+
+    def __len__(self):
+        return len(self.records)
+
+    def column(self, name: str):
+        """Numpy column of a field (string ids for the string fields)."""
+        return self.records[name]
+
+    def iter_records(self):
+        """Decoded records (dicts of python values, None for missing)."""
+        for row in self.records.tolist():
+            record = {}
+            for (name, kind), value in zip(self.fields, row):
+                if kind == "str":
+                    value = self.strings[value] if value >= 0 else None
+                elif kind == "int":
+                    value = value if value >= 0 else None
+                elif math.isnan(value):
+                    value = None
+                record[name] = value
+            yield record
+
+
+def open_journal(path: str) -> list:
+    """Memory-map all the segments of a journal (path prefix given to EventJournalWriter)."""
+    segment_paths = sorted(glob.glob(f"{glob.escape(path)}_[0-9][0-9][0-9][0-9][0-9].bin"))
+    return [JournalSegment(segment_path[:-len(".bin")]) for segment_path in segment_paths]
+
+
+def journal_to_move_events(path: str, simulation_id: str = None) -> list:
+    """
+    Convert a move journal to sim_move_events records (like MovementTracker.move_events),
+    a move journaled several times keeps its last record, at the position of the first one
+    """
+    from lib.move_trucker import generic_move
+    move_events = {}
+    for segment in open_journal(path):
+        for record in segment.iter_records():
+            move = generic_move.copy()
+            move.update(record)
+            move["simulation_id"] = simulation_id
+            for time_column in ("move_dispatch", "move_start", "move_end"):
+                move[f"{time_column}_datetime"] = convert_sim_time_to_datetime(
+                    move[f"{time_column}_time"], segment.date_reference)
+            if move["move_end_time"] is not None and move["move_start_time"] is not None:
+                move["mv_duration"] = move["move_end_time"] - \
+                    move["move_start_time"]
+            move_events[move["move_id"]] = move
+    return list(move_events.values())
+
+
+def journal_to_che_events(path: str, simulation_id: str = None) -> list:
+    """Convert a CHE event journal to che_event_logs records (like CHELog.che_event_list)."""
+    from lib.che_log import che_event_generic
+    che_events = []
+    for segment in open_journal(path):
+        for record in segment.iter_records():
+            che_event = che_event_generic.copy()
+            che_event.update(record)
+            che_event["simulation_id"] = simulation_id
+            che_event["event_datetime"] = convert_sim_time_to_datetime(
+                che_event["event_time"], segment.date_reference)
+            che_events.append(che_event)
+    return che_events
@@ -0,0 +1,133 @@
+def _qc_move_che(move: dict):
+    """Return the QC id of a move record if the move is a quay crane move (DSCH fetch, LOAD put)."""
+    if move["move_kind"] == "DSCH" and move["move_kind_description"] == "FETCH":
+        return move["che_id"]
+    if move["move_kind"] == "LOAD" and move["move_kind_description"] == "PUT":
+        return move["che_id"]
+    return None
+
+
+def compute_kpis(move_events: list, che_events: list = None, vessel_log: dict = None) -> dict:
+    """
+    Compute the simulation KPIs from the move (and CHE) event records
+
+    With the terminal vessel_log, the vessel makespan is the time from berth to the end of the operations
+    (only for the processed vessels, the others are counted in unfinished_vessels), otherwise the time from
+    the first to the last move of the carrier
+
+    Returns a flat dict of floats, suitable for json or for replication statistics:
+        completed_moves, qc_moves, qc_moves_per_hour (gross, per QC), vessel_makespan (mean over carriers,
+        nan when no vessel was processed), and the vessel_makespan of each carrier as vessel_makespan_<carrier_id>,
+        unfinished_vessels and berth_wait (mean time from arrival to berth) with a vessel_log
+    """
+    kpis = {"completed_moves": 0, "qc_moves": 0,
+            "qc_moves_per_hour": 0.0, "vessel_makespan": float('nan')}
+    qc_moves = {}
+    qc_first_start = {}
+    qc_last_end = {}
+    carrier_start = {}
+    carrier_end = {}
+    seen = set()
+    for move in move_events:
+        if move["move_id"] in seen:
+            continue
+        seen.add(move["move_id"])
+        if move["move_kind_description"] == "PUT":
+            kpis["completed_moves"] += 1
+        start, end = move["move_dispatch_time"], move["move_end_time"]
+        carrier_id = move["carrier_id"]
+        if start is not None:
+            carrier_start[carrier_id] = min(
+                carrier_start.get(carrier_id, start), start)
+        if end is not None:
+            carrier_end[carrier_id] = max(
+                carrier_end.get(carrier_id, end), end)
+        qc_id = _qc_move_che(move)
+        if qc_id is None or start is None or end is None:
+            continue
+        qc_moves[qc_id] = qc_moves.get(qc_id, 0) + 1
+        qc_first_start[qc_id] = min(qc_first_start.get(qc_id, start), start)
+        qc_last_end[qc_id] = max(qc_last_end.get(qc_id, end), end)
+    # - - - - - - - - - - - - - - - - -
+    kpis["qc_moves"] = sum(qc_moves.values())
+    qc_rates = []
+    for qc_id, n_moves in qc_moves.items():
+        span = qc_last_end[qc_id] - qc_first_start[qc_id]
+        if span > 0:
+            qc_rates.append(float(n_moves / (span / 3600)))
+    if qc_rates:
+        kpis["qc_moves_per_hour"] = sum(qc_rates) / len(qc_rates)
+    if vessel_log is not None:
+        carrier_start = {carrier_id: log["berth_time"] for carrier_id, log in vessel_log.items()
+                         if log["end_time"] is not None}
+        carrier_end = {carrier_id: log["end_time"] for carrier_id, log in vessel_log.items()
+                       if log["end_time"] is not None}
+        kpis["unfinished_vessels"] = float(len(vessel_log) - len(carrier_end))
+    makespans = []
+    for carrier_id, start in carrier_start.items():
+        if carrier_id in carrier_end:
+            makespan = float(carrier_end[carrier_id] - start)
+            kpis[f"vessel_makespan_{carrier_id}"] = makespan
+            makespans.append(makespan)
+    if makespans:
+        kpis["vessel_makespan"] = sum(makespans) / len(makespans)
+    if vessel_log:
+        berth_waits = [float(log["berth_time"] - log["arrival_time"]) for log in vessel_log.values()
+                       if log.get("arrival_time") is not None]
+        if berth_waits:
+            kpis["berth_wait"] = sum(berth_waits) / len(berth_waits)
+    # - - - - - - - - - - - - - - - - -
+    if che_events:
+        kpis["che_events"] = len(che_events)
+    return kpis
+
+
+def compute_counter_kpis(move_counters: dict) -> dict:
+    """
+    Compute the move KPIs from the move counters of the MovementTracker, they count every move
+    even when only a sample of the WIs is traced in full (see TracingPolicy)
+
+    Returns:
+        dict: completed_moves, qc_moves, qc_moves_per_hour (gross, per QC, the POW of a QC move is the QC)
+    """
+    kpis = {"completed_moves": 0, "qc_moves": 0, "qc_moves_per_hour": 0.0}
+    qc_counters = {}
+    for (pow_id, move_kind, move_stage), counter in move_counters.items():
+        if move_stage == "PUT":
+            kpis["completed_moves"] += counter["n_moves"]
+        if (move_kind, move_stage) in (("DSCH", "FETCH"), ("LOAD", "PUT")):
+            qc_counters.setdefault(pow_id, []).append(counter)
+    qc_rates = []
+    for pow_id, counters in qc_counters.items():
+        n_moves = sum(counter["n_moves"] for counter in counters)
+        kpis["qc_moves"] += n_moves
+        starts = [counter["first_start_time"] for counter in counters
+                  if counter["first_start_time"] is not None]
+        ends = [counter["last_end_time"] for counter in counters
+                if counter["last_end_time"] is not None]
+        if starts and ends and max(ends) > min(starts):
+            qc_rates.append(float(n_moves / ((max(ends) - min(starts)) / 3600)))
+    if qc_rates:
+        kpis["qc_moves_per_hour"] = sum(qc_rates) / len(qc_rates)
+    kpis["completed_moves"] = float(kpis["completed_moves"])
+    kpis["qc_moves"] = float(kpis["qc_moves"])
+    return kpis
+
+
+def compute_terminal_kpis(terminal, with_che_events: bool = False) -> dict:
+    """
+    Compute the KPIs of a terminal after its run (see compute_kpis, with the vessel_log of the terminal)
+
+    When the loggers only trace a sample of the WIs (TracingPolicy), the move records are a sample: the move KPIs
+    then come from the move counters (see compute_counter_kpis) and the number of CHE events from the CHE event
+    counters, which count every record.
+    """
+    move_logger = terminal.move_logger
+    kpis = compute_kpis(move_logger.move_events,
+                        vessel_log=terminal.vessel_log)
+    if move_logger.tracing is not None:
+        kpis.update(compute_counter_kpis(move_logger.move_counters))
+    if with_che_events:
+        kpis["che_events"] = sum(
+            terminal.che_logger.che_event_counters.values())
+    return kpis
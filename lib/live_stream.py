@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+import socket
+import threading
+from collections import deque
+from lib.bson_encoder import to_bson_value
+from lib.event_bus import EventBus, EVENT_TYPES
+
+
+def encode_event(event_type: str, event: dict) -> bytes:
+    """Json line of a logger event: {"type": "move" / "che_event", "event": {...}}, datetimes as strings."""
+    document = {key: to_bson_value(value) for key, value in event.items()}
+    return (json.dumps({"type": event_type, "event": document}, default=str) + "\n").encode()
+
+
+class _Subscriber():
+    """Connection of a subscriber: bounded queue of lines, sent by its own thread."""
+
+    def __init__(self, conn, name: str, max_queue: int, coalesce: bool):
+        self.conn = conn
+        self.name = name
+        self.max_queue = max_queue
+        self.coalesce = coalesce
+        self.queue = deque()
+        self.n_dropped = 0  # lines dropped since the last send (coalesce)
+        self.sending = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(
+            target=self._send_loop, name=f"live-{name}", daemon=True)
+
+    def offer(self, line: bytes) -> bool:
+        """Queue a line without waiting, False when the subscriber is too slow and must be dropped."""
+        with self.condition:
+            if self.closed:
+                return False
+            if len(self.queue) >= self.max_queue:
+                if not self.coalesce:
+                    return False
+                self.queue.popleft()
+                self.n_dropped += 1
+            self.queue.append(line)
+            self.condition.notify_all()
+        return True
+
+    def _send_loop(self):
+        try:
+            while True:
+                with self.condition:
+                    while not self.queue and not self.closed:
+                        self.condition.wait()
+                    if self.closed:
+                        break
+                    lines = list(self.queue)
+                    self.queue.clear()
+                    n_dropped, self.n_dropped = self.n_dropped, 0
+                    self.sending = True
+                if n_dropped:
+                    lines.insert(0, (json.dumps(
+                        {"type": "dropped", "count": n_dropped}) + "\n").encode())
+                self.conn.sendall(b"".join(lines))
+                with self.condition:
+                    self.sending = False
+                    self.condition.notify_all()
+        except OSError:
+            pass
+        finally:
+            self.close()
+
+    def drain(self, timeout: float):
+        """Wait until the queued lines are sent (or timeout seconds)."""
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.closed or (not self.queue and not self.sending), timeout)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.queue.clear()
+            self.condition.notify_all()
+        try:
+            # wakes up a send blocked on a subscriber that does not read
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+
+
+class LivePublisher():
+    """
+    Local publisher of the move and CHE events as they are logged: json lines over a TCP socket on localhost
+    (or a Unix socket), for the dashboards of a paced run (see run_simulation(speed=)).
+    The publisher is a subscriber of the event bus of the terminal (attach).
+
+    The simulation never waits for a subscriber: an event is encoded once and put in the bounded queue of every
+    subscriber, sent by a thread of the subscriber. A subscriber whose queue is full is dropped (disconnected),
+    or with coalesce=True loses its oldest lines, announced by a {"type": "dropped", "count": n} line.
+    Without subscriber, publish returns at once.
+
+    Args:
+        host (str, optional): listening address. Defaults to '127.0.0.1'.
+        port (int, optional): listening port. Defaults to 0 (any free port, see address).
+        unix_path (str, optional): Unix socket path used instead of TCP. Defaults to None.
+        max_queue (int, optional): events queued per subscriber. Defaults to 1000.
+        coalesce (bool, optional): drop the oldest events of a slow subscriber instead of the subscriber.
+            Defaults to False.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, unix_path: str = None, max_queue: int = 1000,
+                 coalesce: bool = False):
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.max_queue = max_queue
+        self.coalesce = coalesce
+        self.subscribers = []
+        self.n_published = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._accept_thread = None
+
+    @property
+    def address(self):
+        """Address of the listening socket ((host, port) or the Unix socket path)."""
+        return self._server.getsockname() if self._server is not None else None
+
+    def start(self):
+        if self.unix_path is not None:
+            if os.path.exists(self.unix_path):
+                os.remove(self.unix_path)
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._server.bind(self.unix_path)
+        else:
+            self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._server.bind((self.host, self.port))
+        self._server.listen()
+        self._accept_thread = threading.Thread(
+            target=self._accept_loop, name="live-accept", daemon=True)
+        self._accept_thread.start()
+        logging.info(f"Live events published on {self.address}")
+        return self
+
+    def _accept_loop(self):
+        n_accepted = 0
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            if self.unix_path is None:
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            n_accepted += 1
+            subscriber = _Subscriber(
+                conn, f"subscriber-{n_accepted}", self.max_queue, self.coalesce)
+            subscriber.thread.start()
+            with self._lock:
+                self.subscribers.append(subscriber)
+
+    def attach(self, bus: EventBus, event_types: tuple = EVENT_TYPES, **filters):
+        """Publish the events of an event bus (filters: see EventBus.subscribe)."""
+        return [bus.subscribe(event_type, self.publish, **filters) for event_type in event_types]
+
+    def publish(self, event_type: str, event: dict):
+        """Send an event to the subscribers (never blocks)."""
+        if not self.subscribers:
+            return
+        line = encode_event(event_type, event)
+        self.n_published += 1
+        with self._lock:
+            slow_subscribers = [subscriber for subscriber in self.subscribers
+                                if not subscriber.offer(line)]
+            for subscriber in slow_subscribers:
+                self.subscribers.remove(subscriber)
+        for subscriber in slow_subscribers:
+            logging.warning(
+                f"Live subscriber {subscriber.name} dropped (queue full or closed)")
+            subscriber.close()
+
+    def close(self, drain_timeout: float = 1.0):
+        """Stop listening and disconnect the subscribers, after sending their queued events (up to drain_timeout)."""
+        if self._server is not None:
+            try:
+                # wakes up the accept thread
+                self._server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._server.close()
+            self._server = None
+            if self.unix_path is not None and os.path.exists(self.unix_path):
+                os.remove(self.unix_path)
+        with self._lock:
+            subscribers, self.subscribers = self.subscribers, []
+        for subscriber in subscribers:
+            subscriber.drain(drain_timeout)
+            subscriber.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
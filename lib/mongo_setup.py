@@ -0,0 +1,70 @@
+import logging
+import sys
+sys.path.append('../')
+
+# metaField of the che_event_logs time-series collection: {simulation_id, che_id}
+CHE_EVENT_META_FIELD = "che_meta"
+
+
+def is_timeseries_collection(collection) -> bool:
+    """Check whether a MongoDB collection is a time-series collection."""
+    return "timeseries" in collection.options()
+
+
+def provision_database(db, move_collection_name: str = 'sim_move_events', che_event_collection_name: str = 'che_event_logs',
+                       che_config_collection_name: str = 'che_config', granularity: str = 'seconds') -> dict:
+    """
+    Create the simulation collections and their indexes, run once per database (running it again is a no-op)
+
+    che_event_logs: time-series collection (timeField event_datetime, metaField che_meta = {simulation_id, che_id}),
+                    indexed by simulation, CHE and time
+    sim_move_events: unique (simulation_id, move_id) key and (simulation_id, pow_id, move_end_time) index
+    che_config: unique (simulation_id, che_id) key
+    An existing plain che_event_logs collection is left as it is (its documents would have to be migrated),
+    the loggers keep writing to it with upserts.
+
+    Args:
+        db: MongoDB database (see DataBase.getMongoConnection)
+
+    Returns:
+        dict: {collection name: list of index names}
+    """
+    from lib.move_trucker import MOVE_KEY_FIELDS
+    from lib.che_log import CHE_CONFIG_KEY_FIELDS
+    from lib.bson_encoder import ensure_unique_key_index
+    existing_collections = db.list_collection_names()
+    if che_event_collection_name not in existing_collections:
+        db.create_collection(che_event_collection_name, timeseries={
+            "timeField": "event_datetime",
+            "metaField": CHE_EVENT_META_FIELD,
+            "granularity": granularity,
+        })
+        logging.info(
+            f"Time-series collection {che_event_collection_name} created")
+    che_events = db[che_event_collection_name]
+    if is_timeseries_collection(che_events):
+        che_events.create_index([(f"{CHE_EVENT_META_FIELD}.simulation_id", 1), (f"{CHE_EVENT_META_FIELD}.che_id", 1),
+                                 ("event_datetime", 1)], name="simulation_id_che_id_event_datetime")
+    else:
+        logging.warning(
+            f"{che_event_collection_name} already exists and is not a time-series collection")
+    moves = db[move_collection_name]
+    ensure_unique_key_index(moves, MOVE_KEY_FIELDS)
+    moves.create_index([("simulation_id", 1), ("pow_id", 1), ("move_end_time", 1)],
+                       name="simulation_id_pow_id_move_end_time")
+    ensure_unique_key_index(db[che_config_collection_name], CHE_CONFIG_KEY_FIELDS)
+    return {name: list(db[name].index_information())
+            for name in (move_collection_name, che_event_collection_name, che_config_collection_name)}
+
+
+if __name__ == "__main__":
+    # python -m lib.mongo_setup [db_name] [conn_str_name]
+    from dotenv import load_dotenv
+    from lib.connect_db import DataBase
+    load_dotenv()
+    db_name = sys.argv[1] if len(sys.argv) > 1 else 'terminal_simulator'
+    conn_str_name = sys.argv[2] if len(sys.argv) > 2 else 'MONGO_DEV_CONN'
+    indexes = provision_database(
+        DataBase.getMongoConnection(db_name, conn_str_name))
+    for collection_name, index_names in indexes.items():
+        print(f"{collection_name}: {', '.join(index_names)}")
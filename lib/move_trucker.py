@@ -1,11 +1,14 @@
+import uuid
 from datetime import datetime, timedelta
-import pandas as pd
-import numpy as np
 from lib.connect_db import DataBase
+from lib.sinks import Sink, make_default_sink
 from components.quay.vessel import Vessel
 from components.ec.che import QC, ITV, YC
 from components.ec.wi import WI
 from lib.utils import convert_sim_time_to_datetime
+from lib.tracing import TracingPolicy
+from lib.event_journal import EventJournalWriter, MOVE_JOURNAL_FIELDS
+from lib.event_bus import EventBus, MOVE_EVENT
 import sys
 import os
 sys.path.append('../')
@@ -46,6 +49,16 @@ generic_move = {
     "move_end_datetime": None,
     "mv_duration": None
 }
+# natural key of a move record
+MOVE_KEY_FIELDS = ("simulation_id", "move_id")
+
+
+def new_simulation_id() -> str:
+    """
+    Unique id of a run: UTC start time (readable, sortable) and a random suffix, runs started in the same second
+    (replications, concurrent runs) get their own id, records and output files
+    """
+    return f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:12]}"
 
 
 # class MovementEvent:
@@ -67,7 +80,9 @@ class MovementTracker(DataBase):
     """
 
     def __init__(self, simulation_name: str = '', conn_str_name: str = 'MONGO_DEV_CONN', db_name: str = 'terminal_simulator',
-                 output_to_csv_file: bool = False, output_path: str = 'data/', collection_name: str = 'sim_move_events'):
+                 output_to_csv_file: bool = False, output_path: str = 'data/', collection_name: str = 'sim_move_events',
+                 tracing: TracingPolicy = None, journal_dir: str = None, sink: Sink = None,
+                 event_bus: EventBus = None):
         super().__init__()
         self.simulation_name = simulation_name
         self.conn_str_name = conn_str_name
@@ -75,32 +90,61 @@ class MovementTracker(DataBase):
         self.output_to_csv_file = output_to_csv_file
         self.output_path = output_path
         self.collection_name = collection_name
-        if not simulation_name:
-            self.db = self.getMongoConnection(
-                db_name, conn_str_name)  # Database
-            self.collection = self.db[collection_name]  # Collection
         self.move_events = []  # List to store move events
-        self.sim_id = int(datetime.utcnow().strftime('%Y%m%d%H%M%S'))
+        self.move_index = {}  # move_id -> position of the move in move_events
+        self._pending_moves = {}  # positions of the moves not pushed yet (ordered set)
+        # moves logged in full (None: all of them), every move is counted in move_counters
+        self.tracing = tracing
+        self.move_counters = {}  # (pow_id, move_kind, move_kind_description) -> counters
+        self._counted_moves = set()  # move ids already counted (a move logged again is counted once)
+        # (counter key, move end time) of every counted move, in log order, for the move rollups (see RollupLog)
+        self.move_ends = []
+        self.sim_id = new_simulation_id()
+        # destination of the moves, by default the csv file or the MongoDB collection (moves upserted on their key)
+        if sink is None:
+            # pymongo is only needed (and imported) for the MongoDB output
+            db = self.getMongoConnection(
+                db_name, conn_str_name) if not self.output_to_csv_file else None
+            sink = make_default_sink(self.output_to_csv_file, self.output_path, collection_name,
+                                     self.sim_id, db, MOVE_KEY_FIELDS)
+        self.sink = sink
+        # binary journal of the moves (see lib.event_journal), flushed on every push
+        self.journal = None
+        if journal_dir is not None:
+            self.journal = EventJournalWriter(os.path.join(
+                journal_dir, f"{collection_name}_{self.sim_id}"), MOVE_JOURNAL_FIELDS)
+        # moves published to the subscribers as they are logged (see lib.event_bus)
+        self.event_bus = event_bus
 
     def log_move(self, vessel: Vessel, pow_name: str, wi: WI, move_stage: str, qc_res: QC = None, itv_res: ITV = None, yc_res: YC = None):
         """ log move event """
         # move_stage = "PUT", "FETCH", "CARRY"
-        mv_suffix = self._generate_mv_suffix(move_stage, wi)
+        che_id = self._get_move_che_id(wi, move_stage, qc_res, itv_res, yc_res)
+        dispatch_time = self._set_dispatch_time(
+            wi, move_stage, qc_res, itv_res, yc_res)
+        end_time = self._set_move_end_time(
+            wi, move_stage, qc_res, itv_res, yc_res)
+        move_id = f"{wi.gkey}{self._generate_mv_suffix(move_stage, wi)}"
+        if move_id not in self._counted_moves:
+            self._counted_moves.add(move_id)
+            self._count_move(pow_name, wi.move_kind, move_stage,
+                             dispatch_time, end_time)
+        if self.tracing is not None and not self.tracing.traces(wi, che_id):
+            return
         move = generic_move.copy()
-        move["simulation_id"] = None
+        move["simulation_id"] = self.sim_id
         move["pow_id"] = pow_name
         move["line_op"] = wi.container_obj.line_op
         move["ufv_id"] = wi.ufv_gkey
         move["wi_id"] = wi.id
-        move["move_id"] = f"{wi.gkey}{mv_suffix}"
+        move["move_id"] = move_id
         move["container_id"] = wi.container_obj.id
         move["category"] = wi.container_obj.category
         move["freight_kind"] = wi.container_obj.freight_kind
         move["carrier_id"] = vessel.carrier_id
         move["move_kind"] = wi.move_kind
         move["move_kind_description"] = move_stage
-        move["che_id"] = self._get_move_che_id(
-            wi, move_stage, qc_res, itv_res, yc_res)
+        move["che_id"] = che_id
         move["fm_che"] = self._find_fm_che(
             wi, move_stage, qc_res, itv_res, yc_res)
         move["fm_block_ref"] = self._find_fm_block_ref(wi)
@@ -117,11 +161,9 @@ class MovementTracker(DataBase):
         move["to_bay"] = wi.to_bay
         move["to_row"] = wi.to_row
         move["to_tier"] = wi.to_tier
-        move["move_dispatch_time"] = self._set_dispatch_time(
-            wi, move_stage, qc_res, itv_res, yc_res)
+        move["move_dispatch_time"] = dispatch_time
         move["move_start_time"] = move["move_dispatch_time"]
-        move["move_end_time"] = self._set_move_end_time(
-            wi, move_stage, qc_res, itv_res, yc_res)
+        move["move_end_time"] = end_time
         move["move_dispatch_datetime"] = convert_sim_time_to_datetime(
             move["move_dispatch_time"])
         move["move_start_datetime"] = convert_sim_time_to_datetime(
@@ -133,7 +175,37 @@ class MovementTracker(DataBase):
                                    move["move_start_time"])
         else:
             move["mv_duration"] = None
-        self.move_events.append(move)
+        # dedup on the natural key: a move logged again replaces the previous record
+        index = self.move_index.get(move["move_id"])
+        if index is None:
+            index = len(self.move_events)
+            self.move_index[move["move_id"]] = index
+            self.move_events.append(move)
+        else:
+            self.move_events[index] = move
+        self._pending_moves[index] = None
+        if self.journal is not None:
+            self.journal.append(move)
+        if self.event_bus is not None:
+            self.event_bus.publish(MOVE_EVENT, move)
+
+    def _count_move(self, pow_name: str, move_kind: str, move_stage: str, start_time: float, end_time: float):
+        """Update the counters of the moves (number, total duration, first start, last end)."""
+        key = (pow_name, move_kind, move_stage)
+        counter = self.move_counters.get(key)
+        if counter is None:
+            counter = {"n_moves": 0, "total_duration": 0.0,
+                       "first_start_time": None, "last_end_time": None}
+            self.move_counters[key] = counter
+        counter["n_moves"] += 1
+        if start_time is not None and end_time is not None:
+            counter["total_duration"] += end_time - start_time
+        if start_time is not None and (counter["first_start_time"] is None or start_time < counter["first_start_time"]):
+            counter["first_start_time"] = start_time
+        if end_time is not None and (counter["last_end_time"] is None or end_time > counter["last_end_time"]):
+            counter["last_end_time"] = end_time
+        if end_time is not None:
+            self.move_ends.append((key, end_time))
 
     def _get_move_che_id(self, wi: WI, move_stage: str, qc_res: QC = None, itv_res: ITV = None, yc_res: YC = None):
         if wi.move_kind == "DSCH":
@@ -215,6 +287,7 @@ class MovementTracker(DataBase):
             date_reference = datetime.strptime(
                 date_reference, "%Y-%m-%d %H:%M:%S")
         if sim_time is not None:
+            import pandas as pd
             sim_time = timedelta(seconds=sim_time)
             sim_time = pd.to_datetime(date_reference) + sim_time
         else:
@@ -355,51 +428,21 @@ class MovementTracker(DataBase):
     #     """Convert the event list to a pandas DataFrame."""
     #     move_events_data = [event.to_dict() for event in self.move_events]
     #     return pd.DataFrame(move_events_data)
-    def prepare_mv_events_for_mongo_save(self) -> pd.DataFrame:
-        """Prepare the move events for saving to MongoDB."""
-        df_events = pd.DataFrame(self.move_events)
-        df_events = df_events.drop_duplicates()
-        # print(f"DEBUG: {df_events.tail()}")
-        df_events['simulation_id'] = self.sim_id
-        df_events['created_at'] = datetime.utcnow()
-        data_types_infos = {str(col): str(dtype.name)
-                            for col, dtype in df_events.dtypes.to_dict().items()}
-        int_columns_list = [
-            c for c, dtype in data_types_infos.items() if dtype.startswith('int')]
-        float_columns_list = [
-            c for c, dtype in data_types_infos.items() if dtype.startswith('float')]
-
-        for col in int_columns_list:
-            df_events[col] = df_events[col].astype('int')
-
-        for col in float_columns_list:
-            df_events[col] = df_events[col].astype('float')
-        time_columns_to_format = [
-            'move_dispatch_datetime', 'move_start_datetime', 'move_end_datetime', 'created_at']
-        for col in time_columns_to_format:
-            df_events[col] = pd.to_datetime(df_events[col], errors='coerce')
-        df_events[time_columns_to_format] = df_events[time_columns_to_format].replace(
-            'NaT', '')
-        df_events[time_columns_to_format] = df_events[time_columns_to_format].astype(
-            object).mask(df_events.isna(), np.nan)
-        df_events = df_events.drop_duplicates()
-        return df_events
+    def close_journal(self):
+        """Close the files of the move journal (reopened in a new segment if moves are logged again)."""
+        if self.journal is not None:
+            self.journal.close()
 
     def push_to_mongo(self):
-        """Push all logged events to MongoDB."""
-        df_events = self.prepare_mv_events_for_mongo_save()
-        if self.output_to_csv_file:
-            file_path_name = os.path.join(
-                self.output_path, f"{self.collection_name}_{self.sim_id}.csv")
-            df_events.to_csv(file_path_name, index=False)
-            print(
-                f"Saved {len(df_events)} events to CSV file: {file_path_name}")
+        """Push the events logged (or replaced) since the last push to the sink (MongoDB or csv file by default)."""
+        if self.journal is not None:
+            self.journal.flush()
+        pending_moves = [self.move_events[index]
+                         for index in self._pending_moves]
+        self._pending_moves.clear()
+        self.sink.write(pending_moves)
+        self.sink.flush()
+        if pending_moves:
+            print(f"Pushed {len(pending_moves)} events to {self.sink.name}")
         else:
-            if not df_events.empty:
-                # Convert DataFrame to list of dicts
-                records = df_events.to_dict(orient='records')
-                self.collection.insert_many(records)
-                print(
-                    f"Pushed {len(records)} events to MongoDB collection: {self.collection.name}")
-            else:
-                print("No events to push to MongoDB.")
+            print("No events to push.")
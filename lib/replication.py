@@ -0,0 +1,169 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from components.ec.durations import DurationSampler
+from lib.kpi import compute_terminal_kpis
+from lib.runner import run_simulation, null_output_options
+from lib.wi_shared import SharedActivity
+
+
+def confidence_interval(values: list, confidence: float = 0.95) -> dict:
+    """
+    Student-t confidence interval of the mean of independent observations
+
+    Returns:
+        dict: {'mean', 'half_width', 'ci_low', 'ci_high', 'n'}
+    """
+    n = len(values)
+    mean = sum(values) / n if n > 0 else float('nan')
+    if n < 2:
+        half_width = float('inf')
+    else:
+        from scipy.stats import t as student_t
+        variance = sum((v - mean) ** 2 for v in values) / (n - 1)
+        half_width = float(student_t.ppf(
+            (1 + confidence) / 2, n - 1)) * math.sqrt(variance / n)
+    return {"mean": mean, "half_width": half_width,
+            "ci_low": mean - half_width, "ci_high": mean + half_width, "n": n}
+
+
+def run_replication(activity_dict: dict, scenario: dict, seed: int, crn: bool = True,
+                    antithetic: bool = False, cancel_event=None) -> dict:
+    """
+    Run one replication of a scenario (run_simulation keyword arguments: n_itv, yc_block_dict, until, ...)
+    and return its KPIs, or None if it was cancelled through the cancel_event
+    The outputs are discarded (see null_output_options), unless the scenario gives its own sinks.
+    The activity can be a SharedActivity, its WI views are then built over the shared WI table of the process
+    """
+    if isinstance(activity_dict, SharedActivity):
+        activity_dict = activity_dict.build()
+    sampler = DurationSampler(mode="crn" if crn else "independent",
+                              seed=seed, antithetic=antithetic)
+    terminal = run_simulation(activity_dict, seed=seed, duration_sampler=sampler,
+                              cancel_event=cancel_event, **dict(null_output_options(), **scenario))
+    if cancel_event is not None and cancel_event.is_set():
+        return None
+    return compute_terminal_kpis(terminal)
+
+
+def compare_scenarios(activity_dict: dict, scenario_a: dict, scenario_b: dict, n_replications: int = 10,
+                      kpi_names: tuple = ('qc_moves_per_hour',), crn: bool = True, antithetic: bool = False,
+                      confidence: float = 0.95, base_seed: int = 0) -> dict:
+    """
+    Compare two scenarios over paired replications and report the paired-difference (b - a) confidence intervals
+
+    Both scenarios of a replication share its seed, with crn the same WI gets the same stage durations in both.
+    With antithetic, each replication is a pair of runs (u and 1 - u) and the pair average is the observation,
+    so 2 * n_replications runs are done per scenario.
+
+    A replication with a nan KPI in either scenario (ex: vessel_makespan without finished vessel) is left out of
+    the intervals of that KPI and counted in their n_excluded.
+
+    Returns:
+        dict: {kpi_name: {'a': ci, 'b': ci, 'diff': ci}} with ci as returned by confidence_interval and its n_excluded
+    """
+    observations = {kpi_name: {"a": [], "b": [], "diff": []}
+                    for kpi_name in kpi_names}
+    n_excluded = {kpi_name: 0 for kpi_name in kpi_names}
+    for r in range(n_replications):
+        seed = base_seed + r
+        twins = (False, True) if antithetic else (False,)
+        kpis_a = [run_replication(activity_dict, scenario_a, seed, crn, twin)
+                  for twin in twins]
+        kpis_b = [run_replication(activity_dict, scenario_b, seed, crn, twin)
+                  for twin in twins]
+        for kpi_name in kpi_names:
+            value_a = sum(k[kpi_name] for k in kpis_a) / len(kpis_a)
+            value_b = sum(k[kpi_name] for k in kpis_b) / len(kpis_b)
+            if math.isnan(value_a) or math.isnan(value_b):
+                n_excluded[kpi_name] += 1
+                continue
+            observations[kpi_name]["a"].append(value_a)
+            observations[kpi_name]["b"].append(value_b)
+            observations[kpi_name]["diff"].append(value_b - value_a)
+    comparison = {}
+    for kpi_name, kpi_obs in observations.items():
+        comparison[kpi_name] = {}
+        for k, v in kpi_obs.items():
+            comparison[kpi_name][k] = confidence_interval(v, confidence)
+            comparison[kpi_name][k]["n_excluded"] = n_excluded[kpi_name]
+    return comparison
+
+
+def _is_precise(ci: dict, relative_precision: float, absolute_precision: float = None) -> bool:
+    """
+    Stopping rule of a KPI: half-width below relative_precision * |mean| (never met by a zero or nan mean),
+    or below absolute_precision when given
+    """
+    if absolute_precision is not None and ci["half_width"] <= absolute_precision:
+        return True
+    return ci["mean"] != 0 and ci["half_width"] <= relative_precision * abs(ci["mean"])
+
+
+def run_until_precision(activity_dict: dict, scenario: dict, kpi_names: tuple = ('qc_moves_per_hour', 'vessel_makespan'),
+                        relative_precision: float = 0.05, confidence: float = 0.95, min_replications: int = 5,
+                        max_replications: int = 100, max_workers: int = None, crn: bool = True,
+                        base_seed: int = 0, absolute_precision: float = None) -> dict:
+    """
+    Sequential sampling: run replications of the scenario in parallel until the confidence interval half-width
+    of every KPI is below relative_precision * |mean| (or absolute_precision), or max_replications is reached.
+    The replications in flight are cancelled as soon as the criterion is met.
+
+    Results are consumed in seed order (not completion order) so that fast replications do not bias the estimate.
+    A nan KPI (ex: vessel_makespan of a replication whose vessels did not finish before until) is left out of
+    its confidence interval and counted in its n_excluded, the replications with unfinished vessels are counted
+    in n_unfinished.
+    Pass a SharedActivity to have the workers attach to a shared WI table instead of receiving pickled WIs.
+
+    Returns:
+        dict: {'converged', 'n_replications', 'n_unfinished', 'kpis': {kpi_name: ci}} with ci as returned by
+            confidence_interval and its n_excluded
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    observations = {kpi_name: [] for kpi_name in kpi_names}
+    n_excluded = {kpi_name: 0 for kpi_name in kpi_names}
+    n_unfinished = 0
+    results = {}
+    in_flight = {}
+    next_submit = 0
+    next_consume = 0
+    converged = False
+    with multiprocessing.Manager() as manager:
+        cancel_event = manager.Event()
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            while not converged and (in_flight or next_submit < max_replications):
+                while len(in_flight) < max_workers and next_submit < max_replications:
+                    future = executor.submit(run_replication, activity_dict, scenario, base_seed + next_submit,
+                                             crn, False, cancel_event)
+                    in_flight[future] = next_submit
+                    next_submit += 1
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[in_flight.pop(future)] = future.result()
+                while next_consume in results:
+                    kpis = results.pop(next_consume)
+                    if kpis.get("unfinished_vessels", 0) > 0:
+                        n_unfinished += 1
+                    for kpi_name in kpi_names:
+                        if math.isnan(kpis[kpi_name]):
+                            n_excluded[kpi_name] += 1
+                        else:
+                            observations[kpi_name].append(kpis[kpi_name])
+                    next_consume += 1
+                if next_consume >= min_replications:
+                    converged = all(_is_precise(confidence_interval(values, confidence), relative_precision,
+                                                absolute_precision)
+                                    for values in observations.values())
+        finally:
+            # stop the replications in flight and drop the queued ones
+            cancel_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+    kpis = {}
+    for kpi_name, values in observations.items():
+        kpis[kpi_name] = confidence_interval(values, confidence)
+        kpis[kpi_name]["n_excluded"] = n_excluded[kpi_name]
+    return {"converged": converged, "n_replications": next_consume, "n_unfinished": n_unfinished,
+            "kpis": kpis}
@@ -0,0 +1,277 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import time
+import types
+import uuid
+from components.ec.che import QC, ITV, YC
+from components.ec.durations import DURATION_PARAMS
+from components.inventory.container import CONTAINER_FIELDS
+from lib.kpi import compute_terminal_kpis
+from lib.runner import run_simulation
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# source of the simulation model and of its results (events, KPIs), a change in these files invalidates the cached results
+MODEL_SOURCE_PATHS = tuple(os.path.join(_ROOT_DIR, path) for path in (
+    'components', 'lib/runner.py', 'lib/kpi.py', 'lib/move_trucker.py', 'lib/che_log.py', 'lib/tracing.py',
+    'lib/utils.py'))
+_WI_EXCLUDED_FIELDS = ('id', 'stage', 'container_obj')
+# run options of run_simulation without effect on the results (outputs)
+_OUTPUT_OPTIONS = ('output_to_csv_file', 'db_name', 'conn_str_name', 'speed')
+# run options with side effects or state of their own: such runs are not cached
+_UNCACHED_OPTIONS = ('cancel_event', 'progress_callback', 'live_publisher', 'event_bus', 'move_sink',
+                     'che_event_sink', 'che_config_sink', 'timeline_sink', 'rollup_sinks', 'journal_dir',
+                     'yard_inventory', 'schedule')
+
+
+def compute_model_version(source_paths: tuple = MODEL_SOURCE_PATHS) -> str:
+    """Hash the python sources of the simulation model (directories and files)."""
+    sha = hashlib.sha256()
+    for source_path in source_paths:
+        if os.path.isfile(source_path):
+            file_paths = [source_path]
+        else:
+            file_paths = []
+            for root, dirs, files in os.walk(source_path):
+                dirs.sort()
+                file_paths.extend(os.path.join(root, file_name) for file_name in sorted(files)
+                                  if file_name.endswith('.py'))
+        for file_path in file_paths:
+            sha.update(os.path.relpath(file_path, _ROOT_DIR).encode())
+            with open(file_path, 'rb') as f:
+                sha.update(f.read())
+    return sha.hexdigest()[:16]
+
+
+def _wi_fields(wi) -> dict:
+    """Data fields of a WI, or of a view over a shared WI table (see lib.wi_shared), without its run state."""
+    table = vars(wi).get("_table")
+    if table is not None:
+        names = [name for name in table.columns if name not in CONTAINER_FIELDS]
+    else:
+        names = [name for name in vars(wi) if not name.startswith('_') and name not in _WI_EXCLUDED_FIELDS]
+    fields = {name: str(getattr(wi, name)) for name in names}
+    fields.update({f"container_{name}": str(getattr(wi.container_obj, name, None))
+                   for name in CONTAINER_FIELDS})
+    return fields
+
+
+def fingerprint_activity(activity_dict: dict) -> str:
+    """
+    Fingerprint of the WI dataset of an activity (dict like: {'carrier_id': {'pow_id': [list of WIs]}})
+    The global WI ids and the run state are left out, only the WI content and its order in the POW matter
+    """
+    sha = hashlib.sha256()
+    for carrier_id, pow_dict in activity_dict.items():
+        sha.update(f"<{carrier_id}>".encode())
+        for pow_name, wi_list in pow_dict.items():
+            sha.update(f"[{pow_name}]".encode())
+            for wi in wi_list:
+                sha.update(json.dumps(_wi_fields(wi), sort_keys=True).encode())
+    return sha.hexdigest()
+
+
+def _describe_option(value):
+    """Json description of a run option object (duration sampler, tracing policy, dispatch rule, ...)."""
+    if isinstance(value, (types.FunctionType, types.BuiltinFunctionType)):
+        # ex: sequence_key, described by its name
+        return f"{value.__module__}.{value.__qualname__}"
+    if hasattr(value, '__dict__'):
+        description = {"class": f"{type(value).__module__}.{type(value).__qualname__}"}
+        description.update({name: attribute for name, attribute in vars(value).items()
+                            if not name.startswith('_')})
+        return description
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    return str(value)
+
+
+def describe_scenario(scenario: dict) -> dict:
+    """
+    Description of the run options (run_simulation keyword arguments) in the cache key: the output options are
+    left out, the objects are described by their class and public attributes
+    """
+    return json.loads(json.dumps({name: value for name, value in scenario.items() if name not in _OUTPUT_OPTIONS},
+                                 sort_keys=True, default=_describe_option))
+
+
+def get_duration_params() -> dict:
+    """Duration parameters of the model: stage lognormal parameters and CHE task clipping bounds."""
+    return {
+        "stages": DURATION_PARAMS,
+        "che": {che.type: [che.min_duration, che.max_duration] for che in (QC, ITV, YC)},
+    }
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of simulation results
+
+    An entry is keyed by a hash of (WI dataset fingerprint, terminal config and run options, duration parameters,
+    seed, model version) and holds the KPIs (kpis.json) and optionally the move and CHE event tables (events.pkl).
+    The cache is bounded by max_size_bytes, least recently used entries are evicted first.
+    """
+
+    def __init__(self, cache_dir: str = 'data/cache/results', max_size_bytes: int = 512*1024*1024,
+                 model_version: str = None):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.model_version = model_version if model_version is not None else compute_model_version()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, activity_dict: dict, terminal_config: dict, seed: int, duration_params: dict = None) -> str:
+        """Build the cache key of a simulation run."""
+        if duration_params is None:
+            duration_params = get_duration_params()
+        key_elements = {
+            "wi_fingerprint": fingerprint_activity(activity_dict),
+            "terminal_config": terminal_config,
+            "duration_params": duration_params,
+            "seed": seed,
+            "model_version": self.model_version,
+        }
+        key_str = json.dumps(key_elements, sort_keys=True, default=str)
+        return hashlib.sha256(key_str.encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str, with_events: bool = False) -> dict:
+        """Return the cached result of the key ({'kpis', 'move_events', 'che_events'}) or None on a miss."""
+        entry_path = self._entry_path(key)
+        meta_path = os.path.join(entry_path, 'meta.json')
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["model_version"] != self.model_version:
+                return None
+            with open(os.path.join(entry_path, 'kpis.json')) as f:
+                result = {"kpis": json.load(f)}
+            if with_events:
+                events_path = os.path.join(entry_path, 'events.pkl')
+                if not os.path.exists(events_path):
+                    return None
+                with open(events_path, 'rb') as f:
+                    result.update(pickle.load(f))
+        except FileNotFoundError:
+            return None
+        # the meta file modification time is the LRU clock
+        os.utime(meta_path)
+        logging.info(f"Result cache hit: {key}")
+        return result
+
+    def put(self, key: str, kpis: dict, move_events: list = None, che_events: list = None):
+        """Store a result in the cache, then evict the least recently used entries above the size limit."""
+        tmp_path = self._entry_path(f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_path)
+        with open(os.path.join(tmp_path, 'kpis.json'), 'w') as f:
+            json.dump(kpis, f)
+        if move_events is not None or che_events is not None:
+            with open(os.path.join(tmp_path, 'events.pkl'), 'wb') as f:
+                pickle.dump({"move_events": move_events or [],
+                            "che_events": che_events or []}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({"model_version": self.model_version,
+                      "created_at": time.time()}, f)
+        entry_path = self._entry_path(key)
+        if os.path.exists(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+        try:
+            os.replace(tmp_path, entry_path)
+        except OSError:
+            # another process stored the same entry meanwhile
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self._evict()
+
+    def _list_entries(self) -> list:
+        """List the entries as (last_access, size, path)."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry_path = self._entry_path(name)
+            if name.startswith('.tmp-') or not os.path.isdir(entry_path):
+                continue
+            try:
+                last_access = os.path.getmtime(
+                    os.path.join(entry_path, 'meta.json'))
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_path))
+            except FileNotFoundError:
+                continue
+            entries.append((last_access, size, entry_path))
+        return entries
+
+    def size(self) -> int:
+        """Total size of the cache entries in bytes."""
+        return sum(size for _, size, _ in self._list_entries())
+
+    def _evict(self):
+        entries = sorted(self._list_entries())
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in entries:
+            if total_size <= self.max_size_bytes:
+                break
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total_size -= size
+            logging.info(f"Result cache evicted: {entry_path}")
+
+    def invalidate(self, model_version: str = None) -> int:
+        """
+        Remove the entries computed by another model version than model_version (defaults to the current one)
+        Returns the number of removed entries
+        """
+        if model_version is None:
+            model_version = self.model_version
+        n_removed = 0
+        for _, _, entry_path in self._list_entries():
+            try:
+                with open(os.path.join(entry_path, 'meta.json')) as f:
+                    entry_version = json.load(f)["model_version"]
+            except (FileNotFoundError, ValueError, KeyError):
+                entry_version = None
+            if entry_version != model_version:
+                shutil.rmtree(entry_path, ignore_errors=True)
+                n_removed += 1
+        return n_removed
+
+    def clear(self):
+        """Remove all the entries."""
+        for _, _, entry_path in self._list_entries():
+            shutil.rmtree(entry_path, ignore_errors=True)
+
+
+def cached_run_simulation(cache: ResultCache, activity_dict: dict, n_itv: int, yc_block_dict: dict,
+                          until: float = 8*60*60, seed: int = None, with_events: bool = False,
+                          output_to_csv_file: bool = True, **scenario) -> dict:
+    """
+    Run the simulation through the result cache, only a seeded run is cached
+    The other run options (engine, duration_sampler, tracing, dispatch_rule, berth_ids, ...) are passed to
+    run_simulation and are part of the key, a run with side effects (sinks, journals, cancel event, yard
+    inventory, schedule, ...) is never cached.
+
+    Returns:
+        dict: {'kpis', 'cache_hit'} and 'move_events', 'che_events' if with_events
+    """
+    key = None
+    if seed is not None and not any(scenario.get(name) is not None for name in _UNCACHED_OPTIONS):
+        terminal_config = {"n_itv": n_itv, "yc_block_dict": yc_block_dict, "until": until,
+                           "pow_carrier": {pow_name: carrier_id for carrier_id, pow_dict in activity_dict.items()
+                                           for pow_name in pow_dict.keys()},
+                           "scenario": describe_scenario(scenario)}
+        key = cache.make_key(activity_dict, terminal_config, seed)
+        result = cache.get(key, with_events=with_events)
+        if result is not None:
+            result["cache_hit"] = True
+            return result
+    terminal = run_simulation(activity_dict, n_itv, yc_block_dict, until=until, seed=seed,
+                              output_to_csv_file=output_to_csv_file, **scenario)
+    move_events = terminal.move_logger.move_events
+    che_events = terminal.che_logger.che_event_list
+    kpis = compute_terminal_kpis(terminal, with_che_events=True)
+    if key is not None:
+        cache.put(key, kpis, move_events, che_events)
+    result = {"kpis": kpis, "cache_hit": False}
+    if with_events:
+        result.update({"move_events": move_events, "che_events": che_events})
+    return result
@@ -0,0 +1,189 @@
+from lib.connect_db import DataBase
+from lib.sinks import NullSink, make_default_sink
+from lib.utils import convert_sim_time_to_datetime
+from lib.che_timeline import CHEStatusTimeline
+import sys
+sys.path.append('../')
+
+# natural keys of the rollup records (a bucket cut by a flush has one record per segment)
+CHE_STATUS_ROLLUP_KEY_FIELDS = (
+    "simulation_id", "segment", "che_id", "che_status", "bucket_start")
+POW_MOVE_ROLLUP_KEY_FIELDS = ("simulation_id", "segment", "pow_id",
+                              "move_kind", "move_kind_description", "bucket_start")
+
+
+def _encode(values: list):
+    """Dictionary-encode a list of labels: (int codes, numpy array of the labels)."""
+    import numpy as np
+    labels, codes = np.unique(np.asarray(
+        values, dtype=object).astype(str), return_inverse=True)
+    return codes.reshape(-1), labels
+
+
+def che_status_durations(che_ids: list, statuses: list, start_times: list, end_times: list, segment_start: float,
+                         segment_end: float, bucket: float = 3600) -> list:
+    """
+    Time spent by each CHE in each status, per time bucket, over a segment of the run
+
+    The status intervals are clipped to the segment, split over the buckets and summed with numpy.
+
+    Args:
+        che_ids, statuses, start_times, end_times (list): CHE status intervals (see CHEStatusTimeline)
+        segment_start (float): simulation time of the start of the segment
+        segment_end (float): simulation time of the end of the segment
+        bucket (float, optional): bucket length in seconds. Defaults to 3600.
+
+    Returns:
+        list: dicts (che_id, che_status, bucket_start, duration)
+    """
+    import numpy as np
+    if len(start_times) == 0 or segment_end <= segment_start:
+        return []
+    che_codes, che_labels = _encode(che_ids)
+    status_codes, status_labels = _encode(statuses)
+    start = np.clip(np.asarray(start_times, dtype=float),
+                    segment_start, segment_end)
+    end = np.clip(np.asarray(end_times, dtype=float),
+                  segment_start, segment_end)
+    # split the intervals over the buckets they overlap
+    first_bucket = np.floor(start / bucket).astype(np.int64)
+    last_bucket = np.maximum(np.ceil(end / bucket).astype(
+        np.int64) - 1, first_bucket)
+    n_buckets = last_bucket - first_bucket + 1
+    interval = np.repeat(np.arange(len(start)), n_buckets)
+    offset = np.arange(len(interval)) - \
+        np.repeat(np.cumsum(n_buckets) - n_buckets, n_buckets)
+    bucket_index = first_bucket[interval] + offset
+    duration = np.minimum(end[interval], (bucket_index + 1) * bucket) - \
+        np.maximum(start[interval], bucket_index * bucket)
+    keep = duration > 0
+    interval, bucket_index, duration = interval[keep], bucket_index[keep], duration[keep]
+    if len(duration) == 0:
+        return []
+    # sum by (CHE, status, bucket)
+    min_bucket = bucket_index.min()
+    n_bucket_values = bucket_index.max() - min_bucket + 1
+    key = (che_codes[interval] * len(status_labels) + status_codes[interval]) * n_bucket_values + \
+        (bucket_index - min_bucket)
+    keys, key_inverse = np.unique(key, return_inverse=True)
+    total_duration = np.bincount(key_inverse.reshape(-1), weights=duration)
+    che_status_key, bucket_offset = np.divmod(keys, n_bucket_values)
+    che_key, status_key = np.divmod(che_status_key, len(status_labels))
+    return [{"che_id": str(che_labels[c]), "che_status": str(status_labels[s]),
+             "bucket_start": float((b + min_bucket) * bucket), "duration": float(d)}
+            for c, s, b, d in zip(che_key, status_key, bucket_offset, total_duration)]
+
+
+def pow_move_counts(pow_ids: list, move_kinds: list, move_stages: list, end_times: list, bucket: float = 3600) -> list:
+    """
+    Number of moves of each POW, per move kind / stage and per time bucket of their end
+
+    Returns:
+        list: dicts (pow_id, move_kind, move_kind_description, bucket_start, n_moves)
+    """
+    import numpy as np
+    if len(end_times) == 0:
+        return []
+    pow_codes, pow_labels = _encode(pow_ids)
+    kind_codes, kind_labels = _encode(move_kinds)
+    stage_codes, stage_labels = _encode(move_stages)
+    bucket_index = np.floor(np.asarray(end_times, dtype=float) / bucket).astype(np.int64)
+    rows = np.stack([pow_codes, kind_codes, stage_codes, bucket_index], axis=1)
+    keys, counts = np.unique(rows, axis=0, return_counts=True)
+    return [{"pow_id": str(pow_labels[p]), "move_kind": str(kind_labels[k]), "move_kind_description": str(stage_labels[s]),
+             "bucket_start": float(b * bucket), "n_moves": int(n)}
+            for (p, k, s, b), n in zip(keys, counts)]
+
+
+class RollupLog(DataBase):
+    """
+    Pre-aggregated rollups of the run, computed at the end of each flush segment from the logger buffers:
+        che_status_rollups: time spent by each CHE in each status per time bucket
+        pow_move_rollups: number of moves of each POW per time bucket
+    They are written to their own collections (or csv files in data/) keyed by simulation_id and segment,
+    the dashboards read them instead of the raw che_event_logs.
+    The sinks argument (collection name -> Sink, see lib.sinks) replaces these default destinations, a rollup
+    with a NullSink is not computed.
+    """
+
+    def __init__(self, db_name: str, string_conncetion: str, output_to_csv_file: bool = False,
+                 output_path: str = 'data/', bucket: float = 3600, sinks: dict = None):
+        self.db_name = db_name
+        self.string_conncetion = string_conncetion
+        self.output_to_csv_file = output_to_csv_file
+        self.output_path = output_path
+        self.bucket = bucket
+        self.sinks = dict(sinks) if sinks is not None else {}
+        if not self.output_to_csv_file and set(self.sinks) != {'che_status_rollups', 'pow_move_rollups'}:
+            self.db = self.getMongoConnection(
+                self.db_name, self.string_conncetion)
+        self.segment = 0
+        self.segment_start = 0
+        # number of closed status intervals / moves already rolled up
+        self._n_rolled_intervals = 0
+        self._n_rolled_moves = 0
+
+    def _build_che_status_rollup(self, status_timeline: CHEStatusTimeline, segment_end: float) -> list:
+        # the intervals closed since the last push and the open ones, clipped to the segment
+        n_intervals = len(status_timeline)
+        intervals = status_timeline.to_records(
+            self._n_rolled_intervals, until=segment_end)
+        self._n_rolled_intervals = n_intervals
+        return che_status_durations([interval["che_id"] for interval in intervals],
+                                    [interval["che_status"] for interval in intervals],
+                                    [interval["start_time"] for interval in intervals],
+                                    [interval["end_time"] for interval in intervals],
+                                    self.segment_start, segment_end, self.bucket)
+
+    def _build_pow_move_rollup(self, move_ends: list) -> list:
+        # the moves ended since the last push
+        n_moves = len(move_ends)
+        moves = move_ends[self._n_rolled_moves:n_moves]
+        self._n_rolled_moves = n_moves
+        return pow_move_counts([key[0] for key, _ in moves], [key[1] for key, _ in moves],
+                               [key[2] for key, _ in moves], [end_time for _, end_time in moves], self.bucket)
+
+    def _save(self, records: list, collection_name: str, key_fields: tuple, sim_id: str):
+        if not records:
+            return
+        sink = self.sinks.get(collection_name)
+        if sink is None:
+            sink = make_default_sink(self.output_to_csv_file, self.output_path, collection_name,
+                                     sim_id, getattr(self, 'db', None), key_fields)
+            self.sinks[collection_name] = sink
+        sink.write(records)
+        sink.flush()
+        print(
+            f"Saved {len(records)} rollup records to {sink.name} (segment {self.segment})")
+
+    def push_rollups(self, sim_id: str, status_timeline: CHEStatusTimeline, move_ends: list, segment_end: float):
+        """
+        Roll up the CHE status intervals and the moves logged since the last push (the current segment) and save them
+
+        Both rollups come from the unsampled streams of the loggers, they are complete even when the loggers only
+        trace a sample of the WIs (see TracingPolicy): the status rollup from the status timeline of the CHELog,
+        the move rollup from the move ends of the MovementTracker (every counted move).
+
+        Args:
+            sim_id (str): simulation id
+            status_timeline (CHEStatusTimeline): status timeline of the CHELog
+            move_ends (list): (counter key, end time) of the moves of the MovementTracker (see move_ends)
+            segment_end (float): simulation time of the push
+        """
+        extra_fields = {"simulation_id": sim_id, "segment": self.segment}
+        che_status_rollup, pow_move_rollup = [], []
+        if not isinstance(self.sinks.get('che_status_rollups'), NullSink):
+            che_status_rollup = self._build_che_status_rollup(
+                status_timeline, segment_end)
+        if not isinstance(self.sinks.get('pow_move_rollups'), NullSink):
+            pow_move_rollup = self._build_pow_move_rollup(move_ends)
+        for records in (che_status_rollup, pow_move_rollup):
+            for i, record in enumerate(records):
+                records[i] = dict(extra_fields, **record,
+                                  bucket_start_datetime=convert_sim_time_to_datetime(record["bucket_start"]))
+        self._save(che_status_rollup, 'che_status_rollups',
+                   CHE_STATUS_ROLLUP_KEY_FIELDS, sim_id)
+        self._save(pow_move_rollup, 'pow_move_rollups',
+                   POW_MOVE_ROLLUP_KEY_FIELDS, sim_id)
+        self.segment += 1
+        self.segment_start = max(self.segment_start, segment_end)
@@ -0,0 +1,206 @@
+import random
+import simpy
+import simpy.rt
+from components.terminal import Terminal
+from components.quay.vessel import Vessel
+from components.quay.schedule import activity_schedule
+from components.quay.berth import BerthAllocator
+from components.ec.itv_dispatch import DispatchRule
+from components.yard.inventory import YardInventory
+from components.ec.durations import DurationSampler
+from lib.tracing import TracingPolicy
+from lib.sinks import Sink, NullSink
+from lib.live_stream import LivePublisher
+from lib.event_bus import EventBus
+from components.ec.fast_engine import FastEnvironment, PacedFastEnvironment, FastTerminal
+
+
+def run_terminal_activity(env: simpy.Environment, terminal: Terminal, activity_dict: dict, schedule=None):
+    """
+    Generate the arrialve of ships and notifies the terminal it has
+    has arrived and waiting for a birth
+    (the vessel calls of the schedule, read one at a time, or the activity separated by exponential gaps)
+    """
+    # print("Starting run_terminal_activity")
+    if schedule is None:
+        schedule = activity_schedule(activity_dict)
+    for call in schedule:
+        # Wait for the arrival of the call
+        if call.eta > env.now:
+            yield env.timeout(call.eta - env.now)
+        # Process the vessel arrival
+        env.process(terminal.initialize_vessel(
+            Vessel, call.carrier_id, call.pow, call))
+
+
+def copy_activity_dict(activity_dict: dict) -> dict:
+    """
+    Copy the carrier -> pow -> WI list structure, the activity can be run again
+    (the WI iterators / generators are single use and kept as is, see WIQueue)
+    """
+    return {carrier_id: {pow_name: list(wi_list) if isinstance(wi_list, list) else wi_list
+                         for pow_name, wi_list in pow_dict.items()}
+            for carrier_id, pow_dict in activity_dict.items()}
+
+
+def null_output_options() -> dict:
+    """
+    run_simulation options discarding every output of the run: moves, CHE events and configurations, status
+    timeline and rollups (ex: replications only looking at the KPIs of the in-memory buffers)
+    """
+    return {"move_sink": NullSink(), "che_event_sink": NullSink(), "che_config_sink": NullSink(),
+            "timeline_sink": NullSink(), "rollup_sinks": {"che_status_rollups": NullSink(), "pow_move_rollups": NullSink()}}
+
+
+def run_simulation(activity_dict: dict, n_itv: int, yc_block_dict: dict, until: float = 8*60*60,
+                   seed: int = None, output_to_csv_file: bool = True,
+                   duration_sampler: DurationSampler = None, cancel_event=None,
+                   check_interval: float = 10*60, engine: str = "simpy", db_name: str = 'terminal_simulator',
+                   conn_str_name: str = 'MONGO_DEV_CONN', tracing: TracingPolicy = None,
+                   journal_dir: str = None, move_sink: Sink = None, che_event_sink: Sink = None,
+                   che_config_sink: Sink = None, timeline_sink: Sink = None, rollup_sinks: dict = None,
+                   wi_chunk_size: int = 100, interleave_move_kinds: bool = True, sequence_key=None, schedule=None,
+                   qc_ids: list = None, berth_ids: list = None, dispatch_rule: DispatchRule = None,
+                   yard_inventory: YardInventory = None, speed: float = None,
+                   live_publisher: LivePublisher = None, event_bus: EventBus = None,
+                   progress_callback=None) -> Terminal:
+    """
+    Build a terminal for the activity (dict like: {'carrier_id': {'pow_id': [list of WIs]}}) and run it,
+    a POW can also be given as a WI iterator / generator, read in chunks during the run (see WIQueue)
+
+    Args:
+        activity_dict (dict): carriers and their points of work
+        n_itv (int): number of internal trucks
+        yc_block_dict (dict): yard cranes and their block id list
+        until (float, optional): simulation horizon in seconds. Defaults to 8 hours.
+        seed (int, optional): seed of the random generators. Defaults to None (not seeded).
+        output_to_csv_file (bool, optional): output events to csv instead of MongoDB. Defaults to True.
+        duration_sampler (DurationSampler, optional): stage durations sampler. Defaults to independent draws.
+        cancel_event (optional): threading/multiprocessing Event, the run stops at the next check once it is set.
+        check_interval (float, optional): simulation time between two checks of the cancel_event (and two calls of
+            the progress_callback). Defaults to 10 minutes.
+        engine (str, optional): "simpy" (Terminal) or "fast" (FastTerminal heap kernel). Defaults to "simpy".
+        db_name (str, optional): MongoDB database of the events (see lib.mongo_setup). Defaults to 'terminal_simulator'.
+        conn_str_name (str, optional): environment variable of the MongoDB connection string. Defaults to 'MONGO_DEV_CONN'.
+        tracing (TracingPolicy, optional): WIs logged in full, the others are only counted. Defaults to None (all).
+        journal_dir (str, optional): directory of the binary event journals (see lib.event_journal). Defaults to None (no journal).
+        move_sink (Sink, optional): destination of the moves (see lib.sinks). Defaults to the csv file / MongoDB collection.
+        che_event_sink (Sink, optional): destination of the CHE events. Defaults to the csv file / MongoDB collection.
+        che_config_sink (Sink, optional): destination of the CHE configurations. Defaults to the csv file / MongoDB
+            collection.
+        timeline_sink (Sink, optional): destination of the CHE status intervals (a NullSink skips the export).
+            Defaults to the .npz file / MongoDB collection (see CHELog).
+        rollup_sinks (dict, optional): destination of the rollups by collection name, 'che_status_rollups' and
+            'pow_move_rollups' (a NullSink skips the rollup, see RollupLog). Defaults to the csv files / MongoDB
+            collections.
+        wi_chunk_size (int, optional): number of WIs read at a time from the WI iterators of the POWs. Defaults to 100.
+        interleave_move_kinds (bool, optional): DSCH and LOAD WIs of a POW interleaved by sequence, otherwise DSCH first.
+            Defaults to True.
+        sequence_key (callable, optional): sequence number of a WI in the work queues of the POWs (see WIQueue).
+            Defaults to None (WI id).
+        schedule (iterable, optional): vessel calls (VesselCall, in ETA order) read one at a time during the run,
+            instead of the activity_dict arrivals. Defaults to None.
+        qc_ids (list, optional): quay cranes of the terminal. Defaults to the POWs of the activity (QC one-to-one to POW).
+        berth_ids (list, optional): berths, assigned with the cranes to the vessels as they arrive (see BerthAllocator).
+            Defaults to None (vessels berth on arrival).
+        dispatch_rule (DispatchRule, optional): choice of the truck of each request (see components.ec.itv_dispatch).
+            Defaults to None (first idle truck).
+        yard_inventory (YardInventory, optional): containers of the yard, updated by the YC puts and fetches
+            (see components.yard.inventory). Defaults to None (no yard state).
+        speed (float, optional): paced run, simulated seconds per wall-clock second (simpy.rt.RealtimeEnvironment
+            or PacedFastEnvironment). Defaults to None (as fast as possible).
+        live_publisher (LivePublisher, optional): started publisher streaming the moves and CHE events as they are
+            logged (see lib.live_stream). Defaults to None.
+        event_bus (EventBus, optional): bus of the moves and CHE events, with its subscribers (see lib.event_bus).
+            Defaults to None (a bus of the terminal, without subscriber).
+        progress_callback (callable, optional): called with the terminal every check_interval of simulation time.
+            Defaults to None.
+
+    The records logged since the last push (end of the last vessel) are pushed at the end of the run, unless the
+    run was cancelled.
+
+    Returns:
+        Terminal: the terminal after the run, with its move and CHE loggers
+    """
+    if seed is not None:
+        import numpy as np
+        random.seed(seed)
+        np.random.seed(seed)
+    if schedule is None:
+        activity_dict = copy_activity_dict(activity_dict)
+    if qc_ids is not None:
+        pow_carrier_dict = {qc_id: None for qc_id in qc_ids}
+    elif schedule is None:
+        pow_carrier_dict = {pow_name: carrier_id for carrier_id, pow_dict in activity_dict.items()
+                            for pow_name in pow_dict.keys()}
+    else:
+        raise ValueError("The quay cranes (qc_ids) are needed to run a schedule")
+    if live_publisher is not None:
+        event_bus = event_bus if event_bus is not None else EventBus()
+        live_publisher.attach(event_bus)
+    berth_allocator = BerthAllocator(berth_ids, list(
+        pow_carrier_dict.keys())) if berth_ids is not None else None
+    if engine == "fast":
+        env = FastEnvironment() if speed is None else PacedFastEnvironment(speed)
+        terminal = FastTerminal(env, n_itv=n_itv, yc_block_dict=yc_block_dict, pow_dict=pow_carrier_dict,
+                                output_to_csv_file=output_to_csv_file, duration_sampler=duration_sampler,
+                                db_name=db_name, conn_str_name=conn_str_name, tracing=tracing, journal_dir=journal_dir,
+                                move_sink=move_sink, che_event_sink=che_event_sink, che_config_sink=che_config_sink,
+                                timeline_sink=timeline_sink, rollup_sinks=rollup_sinks, wi_chunk_size=wi_chunk_size,
+                                interleave_move_kinds=interleave_move_kinds, sequence_key=sequence_key,
+                                berth_allocator=berth_allocator,
+                                dispatch_rule=dispatch_rule, yard_inventory=yard_inventory,
+                                event_bus=event_bus)
+        if schedule is None:
+            terminal.schedule_activity(Vessel, activity_dict)
+        else:
+            terminal.schedule_calls(Vessel, schedule)
+    elif engine == "simpy":
+        if speed is None:
+            env = simpy.Environment()
+        else:
+            # late events are run late instead of raising (strict=False)
+            env = simpy.rt.RealtimeEnvironment(factor=1/speed, strict=False)
+        terminal = Terminal(env,
+                            n_itv=n_itv,
+                            yc_block_dict=yc_block_dict,
+                            pow_dict=pow_carrier_dict,
+                            output_to_csv_file=output_to_csv_file,
+                            duration_sampler=duration_sampler,
+                            db_name=db_name,
+                            conn_str_name=conn_str_name,
+                            tracing=tracing,
+                            journal_dir=journal_dir,
+                            move_sink=move_sink,
+                            che_event_sink=che_event_sink,
+                            che_config_sink=che_config_sink,
+                            timeline_sink=timeline_sink,
+                            rollup_sinks=rollup_sinks,
+                            wi_chunk_size=wi_chunk_size,
+                            interleave_move_kinds=interleave_move_kinds,
+                            sequence_key=sequence_key,
+                            berth_allocator=berth_allocator,
+                            dispatch_rule=dispatch_rule,
+                            yard_inventory=yard_inventory,
+                            event_bus=event_bus
+                            )
+        env.process(run_terminal_activity(
+            env, terminal, activity_dict, schedule))
+    else:
+        raise ValueError(f"Unknown simulation engine: {engine}")
+    if cancel_event is None and progress_callback is None:
+        env.run(until=until)
+    else:
+        while env.now < until and (cancel_event is None or not cancel_event.is_set()):
+            env.run(until=min(env.now + check_interval, until))
+            if progress_callback is not None:
+                progress_callback(terminal)
+    if cancel_event is None or not cancel_event.is_set():
+        # moves and CHE events logged after the end of the last vessel (ex: last DSCH carries and puts), the
+        # rollup segment ends at the last event (the idle time up to a long until is not split into buckets)
+        terminal.flush_logs(segment_end=terminal.che_logger.status_timeline.last_time)
+    else:
+        # a cancelled run is pushed by its caller, if needed (ex: flush_on_cancel of lib.async_runner)
+        terminal.move_logger.close_journal()
+        terminal.che_logger.close_journal()
+    return terminal
@@ -0,0 +1,237 @@
+import csv
+import logging
+import os
+from datetime import datetime
+from lib.bson_encoder import ensure_unique_key_index, upsert_bson_batches, encode_bson_batches
+from lib.mongo_setup import CHE_EVENT_META_FIELD, is_timeseries_collection
+
+
+class Sink:
+    """
+    Destination of the logger records (moves, CHE events, ...)
+
+    The loggers write the records of each flush segment with write(batch), then call flush().
+    The sink buffers the records and writes them by batches of batch_size (None: one batch per flush),
+    a batch that failed stays in the buffer and is written again on the next flush.
+    """
+
+    def __init__(self, batch_size: int = 1000):
+        self.batch_size = batch_size
+        self._buffer = []
+        self.n_written = 0
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
+
+    def write(self, batch: list):
+        """Add records, full batches are written right away."""
+        self._buffer.extend(batch)
+        if self.batch_size is not None:
+            while len(self._buffer) >= self.batch_size:
+                self._write_buffer(self.batch_size)
+
+    def _write_buffer(self, n_records: int):
+        records = self._buffer[:n_records]
+        n_done = self._write_batch(records)
+        n_done = len(records) if n_done is None else n_done
+        del self._buffer[:n_done]
+        self.n_written += n_done
+
+    def _write_batch(self, records: list):
+        """Write a batch, return the number of written records (None: all of them)."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Write the buffered records."""
+        while self._buffer:
+            self._write_buffer(len(self._buffer) if self.batch_size is None
+                               else min(self.batch_size, len(self._buffer)))
+
+    def close(self):
+        self.flush()
+
+
+class NullSink(Sink):
+    """Drop the records (ex: runs only looking at the KPIs of the in-memory buffers)."""
+
+    def _write_batch(self, records: list):
+        return None
+
+
+class InMemorySink(Sink):
+    """Keep the written records in a list (ex: tests)."""
+
+    def __init__(self, batch_size: int = None):
+        super().__init__(batch_size)
+        self.records = []
+
+    def _write_batch(self, records: list):
+        self.records.extend(records)
+
+
+class CSVSink(Sink):
+    """
+    Append the records to a csv file, with their created_at time
+
+    The header holds the fields of the records written so far: missing fields are left empty, and a record with
+    new fields (ex: a CHE config of another type) rewrites the file once with the extended header.
+    """
+
+    def __init__(self, file_path: str, batch_size: int = 1000):
+        super().__init__(batch_size)
+        self.file_path = file_path
+        self._fieldnames = None
+
+    @property
+    def name(self) -> str:
+        return self.file_path
+
+    def _extend_header(self, fields: list):
+        """Add fields (before created_at) and rewrite the rows already written with the new header."""
+        fieldnames = self._fieldnames[:-1] + fields + ["created_at"]
+        tmp_path = f"{self.file_path}.tmp"
+        with open(self.file_path, newline='') as f_in, open(tmp_path, 'w', newline='') as f_out:
+            writer = csv.DictWriter(f_out, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(csv.DictReader(f_in))
+        os.replace(tmp_path, self.file_path)
+        self._fieldnames = fieldnames
+
+    def _write_batch(self, records: list):
+        created_at = datetime.utcnow()
+        known_fields = set(self._fieldnames) if self._fieldnames is not None else set()
+        new_fields = {}
+        for record in records:
+            if not known_fields.issuperset(record):
+                new_fields.update((field, None) for field in record if field not in known_fields)
+                known_fields.update(record)
+        if self._fieldnames is None:
+            self._fieldnames = list(new_fields) + ["created_at"]
+            os.makedirs(os.path.dirname(self.file_path) or '.', exist_ok=True)
+            with open(self.file_path, 'w', newline='') as f:
+                csv.DictWriter(f, fieldnames=self._fieldnames).writeheader()
+        elif new_fields:
+            self._extend_header(list(new_fields))
+        with open(self.file_path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self._fieldnames)
+            for record in records:
+                writer.writerow(dict(record, created_at=created_at))
+
+
+class MongoSink(Sink):
+    """
+    Write the records to a MongoDB collection, encoded straight to BSON (see lib.bson_encoder), with their created_at time
+
+    With key_fields, the records are upserted on their natural key (unique index created on the first write):
+    writing them again does not duplicate them.
+    A time-series collection (see lib.mongo_setup) cannot have unique indexes: the records get their metaField
+    ({simulation_id, che_id}) and are inserted in order, a failed batch is retried from the first record not inserted.
+    """
+
+    def __init__(self, collection, key_fields: tuple = None, batch_size: int = 1000):
+        super().__init__(batch_size)
+        self.collection = collection
+        self.key_fields = key_fields
+        self._timeseries = None
+
+    @property
+    def name(self) -> str:
+        return f"MongoDB collection {self.collection.name}"
+
+    def _write_batch(self, records: list):
+        from pymongo.errors import BulkWriteError
+        if self._timeseries is None:
+            self._timeseries = is_timeseries_collection(self.collection)
+            if self.key_fields is not None and not self._timeseries:
+                ensure_unique_key_index(self.collection, self.key_fields)
+        extra_fields = {"created_at": datetime.utcnow()}
+        if not self._timeseries and self.key_fields is not None:
+            upsert_bson_batches(self.collection, records, self.key_fields,
+                                extra_fields=extra_fields, batch_size=len(records))
+            return None
+        if self._timeseries:
+            records = (dict(record, **{CHE_EVENT_META_FIELD: {"simulation_id": record["simulation_id"],
+                                                               "che_id": record["che_id"]}})
+                       for record in records)
+        n_inserted = 0
+        for batch in encode_bson_batches(records, extra_fields, batch_size=self.batch_size or 1000):
+            try:
+                self.collection.insert_many(batch, ordered=True)
+            except BulkWriteError as e:
+                n_inserted += e.details.get("nInserted", 0)
+                # the inserted records leave the buffer, the others are retried on the next flush
+                self._buffer[:n_inserted] = []
+                self.n_written += n_inserted
+                raise
+            n_inserted += len(batch)
+        return n_inserted
+
+
+class JournalSink(Sink):
+    """Append the records to a binary event journal (see lib.event_journal)."""
+
+    def __init__(self, path: str, fields: tuple, batch_size: int = None):
+        from lib.event_journal import EventJournalWriter
+        super().__init__(batch_size)
+        self.journal = EventJournalWriter(path, fields)
+
+    @property
+    def name(self) -> str:
+        return f"journal {self.journal.path}"
+
+    def _write_batch(self, records: list):
+        for record in records:
+            self.journal.append(record)
+
+    def flush(self):
+        super().flush()
+        self.journal.flush()
+
+    def close(self):
+        super().close()
+        self.journal.close()
+
+
+class FanOutSink(Sink):
+    """Write the records to several sinks, each one with its own batch size."""
+
+    def __init__(self, sinks: list):
+        super().__init__(batch_size=None)
+        self.sinks = sinks
+
+    @property
+    def name(self) -> str:
+        return ", ".join(sink.name for sink in self.sinks)
+
+    def write(self, batch: list):
+        for sink in self.sinks:
+            sink.write(batch)
+        self.n_written += len(batch)
+
+    def flush(self):
+        errors = []
+        for sink in self.sinks:
+            try:
+                sink.flush()
+            except Exception as e:
+                # a failing sink does not stop the others, its records stay in its buffer
+                logging.error(f"Flush of the sink {sink.name} failed: {e}")
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def make_default_sink(output_to_csv_file: bool, output_path: str, collection_name: str, sim_id: int,
+                      db=None, key_fields: tuple = None) -> Sink:
+    """
+    Sink of the output_to_csv_file option of the loggers: <output_path>/<collection_name>_<sim_id>.csv,
+    or the MongoDB collection of the database
+    """
+    if output_to_csv_file:
+        return CSVSink(os.path.join(output_path, f"{collection_name}_{sim_id}.csv"))
+    return MongoSink(db[collection_name], key_fields)
@@ -0,0 +1,162 @@
+import logging
+import threading
+from lib.replication import confidence_interval, _is_precise
+from lib.runner import run_simulation
+
+
+def mser_truncation(values: list, batch_size: int = 5) -> int:
+    """
+    MSER-m warm-up detection: truncation point (in observations) minimizing the marginal standard error
+    of the remaining batched series. Only the first half of the series is searched,
+    a truncation above n/2 means the warm-up is not over yet and is returned as None.
+    """
+    n_batches = len(values) // batch_size
+    if n_batches < 2:
+        return None
+    batches = [sum(values[i*batch_size:(i + 1)*batch_size]) / batch_size
+               for i in range(n_batches)]
+    # suffix sums to evaluate every truncation in one pass
+    suffix_sum = [0.0] * (n_batches + 1)
+    suffix_sq = [0.0] * (n_batches + 1)
+    for i in range(n_batches - 1, -1, -1):
+        suffix_sum[i] = suffix_sum[i + 1] + batches[i]
+        suffix_sq[i] = suffix_sq[i + 1] + batches[i] ** 2
+    best_d, best_mser = 0, float('inf')
+    for d in range(n_batches - 1):
+        m = n_batches - d
+        mean = suffix_sum[d] / m
+        mser = max(suffix_sq[d] / m - mean ** 2, 0.0) / m
+        if mser < best_mser:
+            best_d, best_mser = d, mser
+    if best_d > n_batches // 2:
+        return None
+    return best_d * batch_size
+
+
+def batch_means_ci(values: list, n_batches: int = 20, confidence: float = 0.95) -> dict:
+    """
+    Batch-means confidence interval of the steady-state mean of a (truncated) output series
+    The leading observations that do not fill a batch are dropped.
+    """
+    batch_size = len(values) // n_batches
+    if batch_size < 1:
+        return confidence_interval([], confidence)
+    values = values[len(values) - batch_size*n_batches:]
+    batches = [sum(values[i*batch_size:(i + 1)*batch_size]) / batch_size
+               for i in range(n_batches)]
+    ci = confidence_interval(batches, confidence)
+    ci["batch_size"] = batch_size
+    return ci
+
+
+def steady_state_estimate(values: list, n_batches: int = 20, confidence: float = 0.95,
+                          mser_batch_size: int = 5) -> dict:
+    """Delete the warm-up (MSER) then compute the batch-means CI, half_width is inf while the warm-up is not over."""
+    truncation = mser_truncation(values, mser_batch_size)
+    if truncation is None:
+        ci = confidence_interval([], confidence)
+    else:
+        ci = batch_means_ci(values[truncation:], n_batches, confidence)
+    ci["truncation"] = truncation
+    return ci
+
+
+class SteadyStateMonitor():
+    """
+    Online steady-state analysis of a single long run over the move and CHE event streams
+
+    Every bucket of simulation time, the monitor reads the move counters and the CHE status timeline of the
+    terminal loggers (complete even when only a sample of the WIs is traced) and closes one observation of:
+        throughput: completed moves (PUT) per hour
+        utilization: share of the CHE time not spent IDLE
+    It then detects the warm-up (MSER) and computes the batch-means confidence intervals,
+    done_event is set once every half-width is below relative_precision * |mean|.
+
+    The monitor is the progress_callback of run_simulation (both engines), its done_event the cancel_event
+    that stops the run, the run horizon (until) is the max time of the analysis:
+        run_simulation(activity_dict, ..., until=max_time, **monitor.run_options())
+    """
+
+    def __init__(self, bucket: float = 30*60, relative_precision: float = 0.05,
+                 n_batches: int = 20, confidence: float = 0.95):
+        self.bucket = bucket
+        self.relative_precision = relative_precision
+        self.n_batches = n_batches
+        self.confidence = confidence
+        self.done_event = threading.Event()
+        self.observations = {"throughput": [], "utilization": []}
+        self.estimates = {}
+        self._n_completed_moves = 0
+        self._n_intervals = 0  # closed intervals of the status timeline already read
+        self._bucket_start = 0.0
+        self._bucket_moves = 0
+        self._busy_time = 0.0
+
+    def run_options(self) -> dict:
+        """run_simulation keyword arguments calling the monitor at the end of every bucket."""
+        return {"progress_callback": self, "check_interval": self.bucket, "cancel_event": self.done_event}
+
+    def _read_moves(self, terminal):
+        n_completed_moves = sum(counter["n_moves"] for (_, _, move_stage), counter
+                                in terminal.move_logger.move_counters.items() if move_stage == "PUT")
+        self._bucket_moves += n_completed_moves - self._n_completed_moves
+        self._n_completed_moves = n_completed_moves
+
+    def _read_status_timeline(self, terminal, now: float):
+        """Busy (not IDLE) time of the CHEs in the bucket: intervals closed since the last bucket, then open ones."""
+        timeline = terminal.che_logger.status_timeline
+        for interval in timeline.to_records(self._n_intervals, now):
+            if interval["che_status"] != "IDLE":
+                self._busy_time += max(interval["end_time"] -
+                                       max(interval["start_time"], self._bucket_start), 0.0)
+        self._n_intervals = len(timeline)
+
+    def _close_bucket(self, terminal):
+        now = terminal.env.now
+        self._read_moves(terminal)
+        self._read_status_timeline(terminal, now)
+        n_che = max(len(terminal.che_logger.che_config_list), 1)
+        self.observations["throughput"].append(
+            self._bucket_moves * 3600 / self.bucket)
+        self.observations["utilization"].append(
+            self._busy_time / (n_che * self.bucket))
+        self._bucket_start = now
+        self._bucket_moves = 0
+        self._busy_time = 0.0
+
+    def is_precise(self) -> bool:
+        return all(_is_precise(ci, self.relative_precision) for ci in self.estimates.values())
+
+    def __call__(self, terminal):
+        """Close the bucket ending now (a last partial bucket at the end of the run is left out)."""
+        if self.done_event.is_set() or terminal.env.now < self._bucket_start + self.bucket:
+            return
+        self._close_bucket(terminal)
+        self.estimates = {name: steady_state_estimate(values, self.n_batches, self.confidence)
+                          for name, values in self.observations.items()}
+        if self.is_precise():
+            logging.info(
+                f'{terminal.env.now:.2f}: steady state precision reached: {self.estimates}')
+            self.done_event.set()
+
+
+def run_steady_state(activity_dict: dict, scenario: dict, monitor: SteadyStateMonitor = None) -> dict:
+    """
+    Run one long replication of a scenario (run_simulation keyword arguments: n_itv, yc_block_dict, until, ...)
+    until the steady-state estimates of the monitor are precise or the run horizon is reached
+
+    Returns:
+        dict: {'converged', 'sim_time', 'n_buckets', 'estimates', 'terminal'}
+    """
+    monitor = monitor if monitor is not None else SteadyStateMonitor()
+    terminal = run_simulation(activity_dict, **scenario, **monitor.run_options())
+    converged = monitor.done_event.is_set()
+    if converged:
+        # the run is stopped before the end of the vessels, push the records logged so far
+        terminal.flush_logs()
+    else:
+        logging.info(
+            f'{terminal.env.now:.2f}: steady state max time reached before precision: {monitor.estimates}')
+    return {"converged": converged, "sim_time": terminal.env.now,
+            "n_buckets": len(monitor.observations["throughput"]),
+            "estimates": monitor.estimates, "terminal": terminal}
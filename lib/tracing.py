@@ -0,0 +1,50 @@
+import hashlib
+
+
+class TracingPolicy:
+    """
+    Which WIs get a full trace (move records and CHE events) in the loggers
+
+    A WI is traced when its POW is in pow_ids, when the CHE of the record is in che_ids, or when it falls in
+    the hash-sampled fraction sample_rate of the WIs. The sampling only depends on (seed, WI gkey): the same WIs are
+    traced in every run and in every logger, so their move records and CHE events stay consistent.
+    The records of the other WIs only update the counters of the loggers.
+    The CHE events without WI (INITIALIZE) are always traced.
+
+    Args:
+        sample_rate (float, optional): fraction of the WIs traced in full, between 0 and 1. Defaults to 1.
+        pow_ids (list, optional): POWs traced in full. Defaults to None.
+        che_ids (list, optional): CHEs traced in full. Defaults to None.
+        seed (int, optional): seed of the sampling hash. Defaults to 0.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, pow_ids: list = None, che_ids: list = None, seed: int = 0):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(
+                f"The sample rate must be between 0 and 1: {sample_rate}")
+        self.sample_rate = sample_rate
+        self.pow_ids = set(pow_ids) if pow_ids is not None else set()
+        self.che_ids = set(che_ids) if che_ids is not None else set()
+        self.seed = seed
+        self._sampled_wis = {}  # WI key -> sampled, the hash is computed once per WI
+
+    def is_sampled(self, wi: object) -> bool:
+        """Deterministic hash sampling of the WI."""
+        if self.sample_rate >= 1:
+            return True
+        if self.sample_rate <= 0:
+            return False
+        wi_key = getattr(wi, "gkey", wi.id)
+        sampled = self._sampled_wis.get(wi_key)
+        if sampled is None:
+            digest = hashlib.blake2b(
+                f"{self.seed}:{wi_key}".encode(), digest_size=8).digest()
+            sampled = int.from_bytes(digest, "big") < self.sample_rate * 2**64
+            self._sampled_wis[wi_key] = sampled
+        return sampled
+
+    def traces(self, wi: object, che_id: str = None) -> bool:
+        """Check whether the record of the WI (handled by the CHE) is logged in full."""
+        if wi is None or che_id in self.che_ids:
+            return True
+        return wi.pow in self.pow_ids or self.is_sampled(wi)
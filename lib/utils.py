@@ -1,22 +1,25 @@
+import math
 from datetime import datetime, timedelta
-import pandas as pd
-import numpy as np
 from components.ec.wi import WI
 
 
+def _is_missing(value) -> bool:
+    """None or nan (like pd.isnull for the scalar values of a WI)."""
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
 def convert_sim_time_to_datetime(sim_time: float, date_reference: str = None):
     """Convert simulation time in seconds to datetime with respect to a datetime reference."""
     if date_reference is None:
+        # today at 06:00, built directly as a datetime (parsing a string on every event is costly)
         date_reference = datetime.now().replace(
-            hour=6, minute=0, second=0, microsecond=0).strftime("%Y-%m-%d %H:%M:%S")
-        # date_reference = datetime.strptime(
-        #     date_reference, "%Y-%m-%d %H:%M:%S")
+            hour=6, minute=0, second=0, microsecond=0)
     else:
         date_reference = datetime.strptime(
             date_reference, "%Y-%m-%d %H:%M:%S")
     if sim_time is not None:
-        sim_time = timedelta(seconds=sim_time)
-        sim_time = pd.to_datetime(date_reference) + sim_time
+        sim_time = timedelta(seconds=float(sim_time))
+        sim_time = date_reference + sim_time
     else:
         sim_time = None
     return sim_time
@@ -24,9 +27,9 @@ def convert_sim_time_to_datetime(sim_time: float, date_reference: str = None):
 
 def gather_position_elements(carrier_visit: str, block_ref: str, block: str, bay: str, row: str, tier: str):
     """Gather the position elements into a single string."""
-    if carrier_visit is None or pd.isnull(carrier_visit):
+    if _is_missing(carrier_visit):
         carrier_visit = "UNKNOWN"
-    if block is None or pd.isnull(block):
+    if _is_missing(block):
         block = ""
     return f"{block_ref}-{carrier_visit}-{block}{bay}{row}{tier}"
 
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+import numpy as np
+import pandas as pd
+
+WI_CACHE_FORMAT_VERSION = 1
+
+
+def hash_file(file_path: str, chunk_size: int = 1024*1024) -> str:
+    """sha256 of a file content."""
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class WIDatasetCache:
+    """
+    Typed columnar binary cache of a WI csv export
+
+    The csv is converted once into a directory of .npy files, one per column:
+        numeric and bool columns are stored as is, datetime columns as int64 nanoseconds
+        string columns are dictionary-encoded: int32 codes (-1 for missing) + fixed-width unicode categories
+    The .npy files are memory-mapped on load, so startup does not parse anything and the pages are shared
+    between the processes reading the same dataset through the OS page cache.
+    The cache is invalidated by the sha256 of the source file (the hash is only recomputed when its size or
+    modification time changed).
+    """
+
+    def __init__(self, csv_path: str, cache_dir: str = None):
+        self.csv_path = csv_path
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(csv_path) or '.', 'cache')
+        file_name = os.path.splitext(os.path.basename(csv_path))[0]
+        self.cache_path = os.path.join(cache_dir, f"{file_name}.wi")
+
+    def _load_meta(self) -> dict:
+        try:
+            with open(os.path.join(self.cache_path, 'meta.json')) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def is_valid(self) -> bool:
+        """Check the cache against the source file."""
+        meta = self._load_meta()
+        if meta is None or meta.get("format_version") != WI_CACHE_FORMAT_VERSION:
+            return False
+        stat = os.stat(self.csv_path)
+        if meta["source_size"] == stat.st_size and meta["source_mtime_ns"] == stat.st_mtime_ns:
+            return True
+        if meta["source_size"] != stat.st_size or meta["source_sha256"] != hash_file(self.csv_path):
+            return False
+        # same content, only touched: refresh the recorded modification time
+        meta["source_mtime_ns"] = stat.st_mtime_ns
+        with open(os.path.join(self.cache_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        return True
+
+    def build(self, **read_csv_kwargs):
+        """Parse the csv export and write the binary columns."""
+        start_time = time.time()
+        stat = os.stat(self.csv_path)
+        df = pd.read_csv(self.csv_path, header=0, **read_csv_kwargs)
+        tmp_path = f"{self.cache_path}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(tmp_path)
+        columns = []
+        for i, col in enumerate(df.columns):
+            series = df[col]
+            file_prefix = os.path.join(tmp_path, f"{i:03d}")
+            if pd.api.types.is_bool_dtype(series):
+                kind = "bool"
+                np.save(f"{file_prefix}.npy", series.to_numpy(dtype=bool))
+            elif pd.api.types.is_datetime64_any_dtype(series):
+                kind = "datetime"
+                np.save(f"{file_prefix}.npy",
+                        series.to_numpy(dtype='datetime64[ns]').view('int64'))
+            elif pd.api.types.is_numeric_dtype(series):
+                kind = "numeric"
+                np.save(f"{file_prefix}.npy", series.to_numpy())
+            else:
+                kind = "string"
+                codes, categories = pd.factorize(
+                    series.astype(object).where(series.notna(), None).map(
+                        lambda v: v if v is None else str(v)))
+                np.save(f"{file_prefix}.npy", codes.astype(np.int32))
+                np.save(f"{file_prefix}.cat.npy",
+                        np.asarray(categories, dtype=str) if len(categories) > 0 else np.array([], dtype='<U1'))
+            columns.append({"name": str(col), "kind": kind})
+        meta = {
+            "format_version": WI_CACHE_FORMAT_VERSION,
+            "source_path": os.path.abspath(self.csv_path),
+            "source_sha256": hash_file(self.csv_path),
+            "source_size": stat.st_size,
+            "source_mtime_ns": stat.st_mtime_ns,
+            "n_rows": len(df),
+            "columns": columns,
+        }
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        if os.path.exists(self.cache_path):
+            shutil.rmtree(self.cache_path, ignore_errors=True)
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        try:
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            # another process built the cache meanwhile
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        logging.info(
+            f"WI dataset cache built for {self.csv_path} --- {(time.time() - start_time):.4f} seconds ---")
+
+    def load_columns(self) -> dict:
+        """
+        Memory-map the cached columns (building the cache first if it is missing or stale)
+
+        Returns:
+            dict: {column name: {'kind', 'values', 'categories'}}, values and categories are read-only memmaps
+        """
+        if not self.is_valid():
+            self.build()
+        meta = self._load_meta()
+        columns = {}
+        for i, column in enumerate(meta["columns"]):
+            file_prefix = os.path.join(self.cache_path, f"{i:03d}")
+            columns[column["name"]] = {
+                "kind": column["kind"],
+                "values": np.load(f"{file_prefix}.npy", mmap_mode='r'),
+                "categories": np.load(f"{file_prefix}.cat.npy", mmap_mode='r') if column["kind"] == "string" else None,
+            }
+        return columns
+
+
+def columns_to_dataframe(columns: dict) -> pd.DataFrame:
+    """Build a dataframe over the cached columns, the string columns become categoricals."""
+    data = {}
+    for name, column in columns.items():
+        if column["kind"] == "string":
+            data[name] = pd.Categorical.from_codes(
+                column["values"], categories=pd.Index(column["categories"], dtype=object))
+        elif column["kind"] == "datetime":
+            data[name] = column["values"].view('datetime64[ns]')
+        else:
+            data[name] = column["values"]
+    return pd.DataFrame(data, copy=False)
+
+
+def load_wi_dataframe(csv_path: str, cache_dir: str = None, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Load a WI csv export, through the memory-mapped binary cache by default
+
+    Args:
+        csv_path (str): WI csv export (ex: data/SPARCSN4_WI_clean_13Dec24.csv)
+        cache_dir (str, optional): cache directory. Defaults to a cache folder next to the csv.
+        use_cache (bool, optional): parse the csv directly when False. Defaults to True.
+
+    Returns:
+        pd.DataFrame: WI dataset, string columns as categoricals when loaded from the cache
+    """
+    if not use_cache:
+        return pd.read_csv(csv_path, header=0)
+    start_time = time.time()
+    df = columns_to_dataframe(WIDatasetCache(
+        csv_path, cache_dir).load_columns())
+    logging.info(
+        f"WI dataset loaded from cache: {len(df)} rows --- {(time.time() - start_time):.4f} seconds ---")
+    return df
@@ -0,0 +1,133 @@
+import logging
+import time
+from lib.connect_db import DataBase
+from lib.wi_shared import CONTAINER_FIELDS
+from components.ec.wi import WI
+from components.inventory.container import Container
+
+# fields of the WI export kept for the simulation (lower case names of the WI attributes, upper case in the collection)
+WI_FIELDS = ('ufv_gkey', 'gkey', 'id', 'line_op', 'category', 'freight_kind', 'move_kind', 'pow', 'carrier_visit',
+             'fm_block', 'fm_bay', 'fm_row', 'fm_tier', 'to_block', 'to_bay', 'to_row', 'to_tier')
+
+
+def _wi_match(move_kind_list: list, pow_list: list = None, carrier_visit: str = None) -> dict:
+    match = {"MOVE_KIND": {"$in": list(move_kind_list)}}
+    if pow_list is not None:
+        match["POW"] = {"$in": list(pow_list)}
+    if carrier_visit is not None:
+        match["CARRIER_VISIT"] = carrier_visit
+    return match
+
+
+def build_wi_pipeline(count: list = [10, 10], move_kind_list: list = ["DSCH", "LOAD"], pow_list: list = None,
+                      carrier_visit: str = None, sort_field: str = 'GKEY') -> list:
+    """
+    Aggregation pipeline of the WI selection of generate_pow, run by the server:
+    the first count[i] WIs of each move kind for every POW (in sort_field order), without duplicated container id
+    in a POW, projected on WI_FIELDS and sorted by POW, move kind (in move_kind_list order) and sort_field
+
+    Args:
+        count (list, optional): number of WIs of each move kind. Defaults to [10, 10].
+        move_kind_list (list, optional): move kinds. Defaults to ["DSCH", "LOAD"].
+        pow_list (list, optional): POWs to select. Defaults to None (all).
+        carrier_visit (str, optional): carrier visit to select. Defaults to None (all).
+        sort_field (str, optional): field giving the order of the WIs in a POW. Defaults to 'GKEY'.
+
+    Returns:
+        list: aggregation pipeline
+    """
+    kind_limits = [{"MOVE_KIND": move_kind, "kind_rank": {"$lte": n}}
+                   for move_kind, n in zip(move_kind_list, count)]
+    return [
+        {"$match": _wi_match(move_kind_list, pow_list, carrier_visit)},
+        # first WI of each container id in the POW
+        {"$setWindowFields": {"partitionBy": {"pow": "$POW", "id": "$ID"}, "sortBy": {sort_field: 1},
+                              "output": {"id_rank": {"$documentNumber": {}}}}},
+        {"$match": {"id_rank": 1}},
+        # per (POW, move kind) limit
+        {"$setWindowFields": {"partitionBy": {"pow": "$POW", "move_kind": "$MOVE_KIND"}, "sortBy": {sort_field: 1},
+                              "output": {"kind_rank": {"$documentNumber": {}}}}},
+        {"$match": {"$or": kind_limits}},
+        {"$set": {"kind_order": {"$indexOfArray": [list(move_kind_list), "$MOVE_KIND"]}}},
+        {"$sort": {"POW": 1, "kind_order": 1, sort_field: 1}},
+        {"$project": dict({"_id": 0}, **{field: f"${field.upper()}" for field in WI_FIELDS})},
+    ]
+
+
+def doc_to_wi(doc: dict) -> WI:
+    """Convert a projected WI document to a work instruction object (missing fields are set to None)."""
+    dict_container = {field: doc.get(field) for field in CONTAINER_FIELDS}
+    dict_wi = {field: doc.get(field)
+               for field in WI_FIELDS if field not in CONTAINER_FIELDS}
+    dict_wi['container_obj'] = Container(**dict_container)
+    return WI(**dict_wi)
+
+
+class MongoWISource(DataBase):
+    """
+    WI source reading the WI collection of MongoDB: the selection (see build_wi_pipeline) is done by the server,
+    the documents are streamed by batches of batch_size straight into WI objects, over the pooled connection of
+    getMongoConnection
+
+    Args:
+        db_name (str): database of the WIs
+        conn_str_name (str): environment variable of the MongoDB connection string
+        collection_name (str, optional): WI collection. Defaults to 'work_instructions'.
+        batch_size (int, optional): number of documents of a cursor batch. Defaults to 1000.
+    """
+
+    def __init__(self, db_name: str, conn_str_name: str, collection_name: str = 'work_instructions',
+                 batch_size: int = 1000):
+        self.db_name = db_name
+        self.conn_str_name = conn_str_name
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+
+    @property
+    def collection(self):
+        return self.getMongoConnection(self.db_name, self.conn_str_name)[self.collection_name]
+
+    def iter_wis(self, count: list = [10, 10], move_kind_list: list = ["DSCH", "LOAD"], pow_list: list = None,
+                 carrier_visit: str = None):
+        """WIs of the selection, in POW order (see build_wi_pipeline), created as the cursor batches arrive."""
+        start_time = time.time()
+        pipeline = build_wi_pipeline(
+            count, move_kind_list, pow_list, carrier_visit)
+        n_wis = 0
+        with self.collection.aggregate(pipeline, allowDiskUse=True, batchSize=self.batch_size) as cursor:
+            for doc in cursor:
+                n_wis += 1
+                yield doc_to_wi(doc)
+        logging.info(
+            f"{n_wis} WIs read from {self.collection_name} --- {(time.time() - start_time):.4f} seconds ---")
+
+    def pow_carriers(self, move_kind_list: list = ["DSCH", "LOAD"], pow_list: list = None,
+                     carrier_visit: str = None) -> dict:
+        """Carrier visit of each POW of the selection ({pow: carrier_visit}, grouped by the server)."""
+        pipeline = [{"$match": _wi_match(move_kind_list, pow_list, carrier_visit)},
+                    {"$group": {"_id": "$POW", "carrier_visit": {"$first": "$CARRIER_VISIT"}}},
+                    {"$sort": {"_id": 1}}]
+        return {doc["_id"]: doc["carrier_visit"] for doc in self.collection.aggregate(pipeline)}
+
+    def load_activity(self, count: list = [10, 10], move_kind_list: list = ["DSCH", "LOAD"], pow_list: list = None,
+                      carrier_visit: str = None) -> dict:
+        """
+        Activity dict ({'carrier_id': {'pow_id': [list of WIs]}}) of the selection, read with a single aggregation
+        """
+        activity_dict = {}
+        for wi in self.iter_wis(count, move_kind_list, pow_list, carrier_visit):
+            activity_dict.setdefault(wi.carrier_visit, {}).setdefault(
+                wi.pow, []).append(wi)
+        return activity_dict
+
+    def stream_activity(self, count: list = [10, 10], move_kind_list: list = ["DSCH", "LOAD"], pow_list: list = None,
+                        carrier_visit: str = None) -> dict:
+        """
+        Activity dict with a WI generator per POW: the aggregation of a POW only runs when its work queue
+        first reads it (see WIQueue), and its WIs are created batch by batch during the run
+        """
+        activity_dict = {}
+        for pow_name, pow_carrier in self.pow_carriers(move_kind_list, pow_list, carrier_visit).items():
+            activity_dict.setdefault(pow_carrier, {})[pow_name] = self.iter_wis(
+                count, move_kind_list, [pow_name], pow_carrier)
+        return activity_dict
@@ -0,0 +1,212 @@
+import math
+import numpy as np
+from multiprocessing import shared_memory
+from components.ec.wi import WI
+# columns of the WI export that belong to the container (see df_row_to_wi)
+from components.inventory.container import CONTAINER_FIELDS
+
+_ALIGNMENT = 64
+# shared tables attached in this process, by shared memory name
+_attached_tables = {}
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Attach an existing block, its lifetime stays with the owner process."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # python < 3.13: the pool workers share the resource tracker of the owner,
+        # the block is unregistered once, when the owner unlinks it
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedWITable:
+    """
+    WI dataset columns (as loaded by WIDatasetCache.load_columns) placed once in a shared memory block
+
+    The owner process creates the table and keeps it alive for the duration of the pool,
+    the workers attach to it from its picklable descriptor and get read-only numpy views, nothing is copied.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, layout: dict, owner: bool):
+        self.shm = shm
+        self.layout = layout
+        self.owner = owner
+        self.columns = {}
+        for name, column in layout["columns"].items():
+            self.columns[name] = {
+                "kind": column["kind"],
+                "values": self._view(column["values"]),
+                "categories": self._view(column["categories"]) if column["categories"] is not None else None,
+            }
+        self.n_rows = layout["n_rows"]
+
+    def _view(self, array_layout: dict) -> np.ndarray:
+        array = np.ndarray(tuple(array_layout["shape"]), dtype=np.dtype(array_layout["dtype"]),
+                           buffer=self.shm.buf, offset=array_layout["offset"])
+        array.flags.writeable = False
+        return array
+
+    @classmethod
+    def create(cls, columns: dict) -> "SharedWITable":
+        """Copy the columns ({name: {'kind', 'values', 'categories'}}) into a new shared memory block."""
+        arrays = []
+        layout = {"columns": {}, "n_rows": 0}
+        offset = 0
+        for name, column in columns.items():
+            column_layout = {"kind": column["kind"], "categories": None}
+            for part in ("values", "categories"):
+                if column[part] is None:
+                    continue
+                array = np.ascontiguousarray(column[part])
+                column_layout[part] = {"dtype": array.dtype.str,
+                                       "shape": list(array.shape), "offset": offset}
+                arrays.append((offset, array))
+                offset += math.ceil(max(array.nbytes, 1) /
+                                    _ALIGNMENT) * _ALIGNMENT
+            layout["columns"][name.lower()] = column_layout
+            layout["n_rows"] = len(column["values"])
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for array_offset, array in arrays:
+            shm.buf[array_offset:array_offset + array.nbytes] = array.view(np.uint8).reshape(-1)
+        layout["shm_name"] = shm.name
+        return cls(shm, layout, owner=True)
+
+    @property
+    def descriptor(self) -> dict:
+        """Picklable description of the table, used by the workers to attach."""
+        return self.layout
+
+    @classmethod
+    def attach(cls, descriptor: dict) -> "SharedWITable":
+        """Attach to a shared table (once per process)."""
+        table = _attached_tables.get(descriptor["shm_name"])
+        if table is None:
+            table = cls(_attach_shared_memory(
+                descriptor["shm_name"]), descriptor, owner=False)
+            _attached_tables[descriptor["shm_name"]] = table
+        return table
+
+    def get_value(self, column_name: str, row: int):
+        """Python value of a cell, missing strings are returned as nan like a pandas row."""
+        column = self.columns[column_name]
+        value = column["values"][row]
+        if column["kind"] == "string":
+            return str(column["categories"][value]) if value >= 0 else float('nan')
+        return value.item()
+
+    def find_codes(self, column_name: str, labels: list) -> np.ndarray:
+        """Codes of the labels of a string column (unknown labels are left out)."""
+        categories = self.columns[column_name]["categories"]
+        return np.flatnonzero(np.isin(categories, np.asarray(labels, dtype=str)))
+
+    def close(self):
+        """
+        Detach the views, the owner also frees the block (and detaches the runs of its own process).
+        A later attach maps the block again.
+        """
+        attached_table = _attached_tables.get(self.layout["shm_name"])
+        if attached_table is self:
+            del _attached_tables[self.layout["shm_name"]]
+        elif attached_table is not None and self.owner:
+            attached_table.close()
+        self.columns = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedContainerView():
+    """Container fields read from a row of a shared WI table."""
+
+    def __init__(self, table: SharedWITable, row: int):
+        self._table = table
+        self._row = row
+
+    def __getattr__(self, name: str):
+        if name.startswith('_') or name not in CONTAINER_FIELDS:
+            raise AttributeError(name)
+        return self._table.get_value(name, self._row)
+
+
+class SharedWIView(WI):
+    """
+    Lightweight WI over a row of a shared WI table: the run state (id, stage, ...) lives on the view,
+    the WI fields are read from the shared columns on access
+    """
+
+    def __init__(self, table: SharedWITable, row: int):
+        self._table = table
+        self._row = int(row)
+        self.container_obj = SharedContainerView(table, self._row)
+        super().__init__()
+
+    def __getattr__(self, name: str):
+        if name.startswith('_') or name in CONTAINER_FIELDS or name not in self._table.columns:
+            raise AttributeError(name)
+        return self._table.get_value(name, self._row)
+
+
+class SharedActivity:
+    """
+    Picklable activity (carrier -> pow -> WI rows) over a shared WI table,
+    build() turns it into the usual activity dict of WI views inside the worker
+    """
+
+    def __init__(self, descriptor: dict, pow_rows: dict):
+        self.descriptor = descriptor
+        self.pow_rows = pow_rows
+
+    @classmethod
+    def from_selection(cls, table: SharedWITable, count: list = [10, 10], move_kind_list: list = ["DSCH", "LOAD"],
+                       pow_list: list = None) -> "SharedActivity":
+        """
+        Select the first count[i] WIs (unique container id) of each move kind for every POW, like generate_pow
+        """
+        pow_codes = table.columns["pow"]["values"]
+        kind_codes = table.columns["move_kind"]["values"]
+        id_codes = table.columns["id"]["values"]
+        carrier_codes = table.columns["carrier_visit"]["values"]
+        pow_categories = table.columns["pow"]["categories"]
+        if pow_list is None:
+            selected_pow_codes = np.unique(pow_codes[pow_codes >= 0])
+        else:
+            selected_pow_codes = table.find_codes("pow", pow_list)
+        pow_rows = {}
+        for pow_code in selected_pow_codes:
+            pow_rows_all = np.flatnonzero(pow_codes == pow_code)
+            # drop the duplicated container ids of the POW, keeping the first one
+            _, first_idx = np.unique(
+                id_codes[pow_rows_all], return_index=True)
+            pow_rows_all = np.sort(pow_rows_all[first_idx])
+            rows = []
+            for kind, n in zip(move_kind_list, count):
+                kind_code = table.find_codes("move_kind", [kind])
+                if len(kind_code) == 0:
+                    continue
+                kind_rows = pow_rows_all[kind_codes[pow_rows_all] == kind_code[0]]
+                rows.extend(kind_rows[:n].tolist())
+            if not rows:
+                continue
+            carrier_code = carrier_codes[rows[0]]
+            carrier_id = table.columns["carrier_visit"]["categories"][carrier_code] if carrier_code >= 0 else None
+            pow_rows.setdefault(str(carrier_id), {})[
+                str(pow_categories[pow_code])] = rows
+        return cls(table.descriptor, pow_rows)
+
+    def build(self) -> dict:
+        """Attach to the shared table and build the activity dict of WI views."""
+        table = SharedWITable.attach(self.descriptor)
+        return {carrier_id: {pow_name: [SharedWIView(table, row) for row in rows]
+                             for pow_name, rows in pow_dict.items()}
+                for carrier_id, pow_dict in self.pow_rows.items()}
+
+    def stream(self) -> dict:
+        """
+        Attach to the shared table and build the activity dict with a WI view generator per POW:
+        the views are only created when the POW work queue reads them (see WIQueue)
+        """
+        table = SharedWITable.attach(self.descriptor)
+        return {carrier_id: {pow_name: (SharedWIView(table, row) for row in rows)
+                             for pow_name, rows in pow_dict.items()}
+                for carrier_id, pow_dict in self.pow_rows.items()}
@@ -2,6 +2,8 @@ from components.terminal import Terminal
 from components.ec.wi import WI
 from components.quay.vessel import Vessel
 from components.inventory.container import Container
+from lib.runner import run_terminal_activity
+from lib.wi_loader import load_wi_dataframe
 import pandas as pd
 import simpy
 import random
@@ -31,7 +33,7 @@ def generate_pow(count=[10, 10, 10, 10, 10, 10, 10, 10, 10],
     if move_kind_list is None:
         move_kind_list = ["DSCH", "LOAD", "SHOB", "YARD",
                           "SHFT", "DLVR", "RECV", "RLOD", "RDSC"]
-    df_wi = pd.read_csv("data/SPARCSN4_WI_clean_13Dec24.csv", header=0)
+    df_wi = load_wi_dataframe("data/SPARCSN4_WI_clean_13Dec24.csv")
     cols = ['UFV_GKEY', 'GKEY', 'ID', 'LINE_OP', 'CATEGORY', 'FREIGHT_KIND', 'MOVE_KIND', 'POW', 'CARRIER_VISIT', 'FM_BLOCK', 'FM_BAY', 'FM_ROW', 'FM_TIER',
             'TO_BLOCK', 'TO_BAY', 'TO_ROW', 'TO_TIER']
     vf_cols = [c for c in df_wi.columns if c in cols]
@@ -53,7 +55,7 @@ def generate_pow(count=[10, 10, 10, 10, 10, 10, 10, 10, 10],
             pow_dict[pow_name].append(df_row_to_wi(row))
         pow_dict[pow_name].sort(key=lambda wi: wi.id, reverse=False)
         df_pow = pd.concat([df_pow, df_tmp_f], ignore_index=True)
-    df_pow_report = df_pow.groupby(['pow', 'move_kind']).size().reset_index(
+    df_pow_report = df_pow.groupby(['pow', 'move_kind'], observed=True).size().reset_index(
         name='count').sort_values(by=['pow', 'move_kind'])
     print("- "*50)
     print(df_pow_report)
@@ -102,27 +104,6 @@ def generate_block_dict(df_pow, move_kind_list=["DSCH", "LOAD"]):
     return bloc_dict
 
 
-def run_terminal_activity(env: simpy.Environment, terminal: Terminal, activity_dict: dict):
-    """
-    Generate the arrialve of ships and notifies the terminal it has
-    has arrived and waiting for a birth
-    """
-    # print("Starting run_terminal_activity")
-    i = 0
-    while i < len(activity_dict):
-        # Get carrier information from the dictionary
-        carrier_id = list(activity_dict.keys())[i]
-        pow_dict = activity_dict[carrier_id]
-
-        # Process the vessel arrival
-        env.process(terminal.initialize_vessel(Vessel, carrier_id, pow_dict))
-
-        # Wait for the next arrival (e.g., after a random interval if desired)
-        # Adjust timeout duration as needed
-        yield env.timeout(random.expovariate(1.0/(5*60*60)))
-        i += 1
-
-
 def sim():
     """
     init and run the simulation
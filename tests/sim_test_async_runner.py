@@ -0,0 +1,63 @@
+from lib.async_runner import AsyncSimulator
+from sim_test_fast_engine import generate_synthetic_pow
+import asyncio
+import time
+import sys
+sys.path.append('../')
+
+YC_BLOCK_DICT = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+
+
+async def ticker(stop_event, gaps):
+    """Largest gap between two ticks of the loop: the loop must stay responsive during the runs"""
+    last_time = time.time()
+    while not stop_event.is_set():
+        await asyncio.sleep(0.01)
+        gaps.append(time.time() - last_time)
+        last_time = time.time()
+
+
+async def what_if_requests(executor, n_runs=4, until=7*24*60*60):
+    """
+    Concurrent runs from one loop: the progress of the first one is followed, the last one is cancelled once it
+    passed 2 simulated hours, all the results are awaited
+    """
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=400)}
+    stop_event, gaps = asyncio.Event(), []
+    ticker_task = asyncio.create_task(ticker(stop_event, gaps))
+    async with AsyncSimulator(executor=executor, max_workers=n_runs) as simulator:
+        handles = [simulator.submit(activity_dict, n_itv=6, yc_block_dict=YC_BLOCK_DICT, until=until, seed=seed,
+                                    engine="fast" if seed % 2 else "simpy")
+                   for seed in range(n_runs)]
+        async for snapshot in handles[-1].progress():
+            if snapshot["sim_time"] > 2*60*60:
+                handles[-1].cancel()
+        n_snapshots = 0
+        async for snapshot in handles[0].progress():
+            n_snapshots += 1
+        results = await asyncio.gather(*handles)
+    stop_event.set()
+    await ticker_task
+    return results, n_snapshots, max(gaps)
+
+
+def async_runner_test(executors=["thread", "process"], n_runs=4, until=7*24*60*60):
+    for executor in executors:
+        start_time = time.time()
+        results, n_snapshots, max_gap = asyncio.run(
+            what_if_requests(executor, n_runs, until))
+        print("- "*50)
+        print(f"{executor}: {n_runs} runs in {time.time() - start_time:.2f}s, {n_snapshots} progress snapshots, "
+              f"largest loop gap {max_gap:.3f}s")
+        for result in results:
+            print(f"  cancelled: {result['cancelled']}, sim time: {result['sim_time']:.0f}, "
+                  f"moves: {result['n_moves']}, completed moves: {result['kpis']['completed_moves']:.0f}")
+        print("- "*50)
+        assert all(not result["cancelled"] for result in results[:-1])
+        assert all(result["sim_time"] == until for result in results[:-1])
+        assert results[-1]["cancelled"] and results[-1]["sim_time"] < until
+        assert n_snapshots > 0
+
+
+if __name__ == "__main__":
+    async_runner_test()
@@ -0,0 +1,79 @@
+from components.quay.berth import IntervalIndex, BerthAllocator
+from components.quay.schedule import VesselCall
+import sys
+sys.path.append('../')
+
+HOUR = 60*60
+
+
+def interval_index_test():
+    """Reservations never overlap (touching is fine), gaps are found from a time, releases only shorten"""
+    index = IntervalIndex()
+    index.reserve(10, 20)
+    index.reserve(30, 40)
+    index.reserve(20, 25)
+    for start, end in [(15, 18), (5, 11), (39, 50), (0, 100)]:
+        try:
+            index.reserve(start, end)
+            raise AssertionError(f"[{start}, {end}) overlaps")
+        except ValueError:
+            pass
+    assert index.starts == [10, 20, 30] and index.ends == [20, 25, 40]
+    assert index.earliest_start(0, 10) == 0
+    assert index.earliest_start(0, 11) == 40
+    assert index.earliest_start(22, 5) == 25
+    assert index.earliest_start(22, 6) == 40
+    # freed early: shortened, never extended, removed when released before its start
+    index.release(30, 35)
+    index.release(10, 50)
+    index.release(12, 13)  # not a reservation start
+    assert index.ends == [20, 25, 35]
+    index.release(20, 20)
+    assert index.starts == [10, 30] and index.earliest_start(18, 10) == 20
+    index.prune(20)
+    assert index.starts == [30] and len(index) == 1
+
+
+def allocate_test():
+    """A call waits for its berth and for its cranes, POWs that are not cranes get the cranes free the earliest"""
+    allocator = BerthAllocator(["B1", "B2"], ["QC01", "QC02", "QC03"])
+    a = allocator.allocate(VesselCall("A", 0, {"QC01": [], "QC02": []}, etd=10*HOUR), now=0)
+    assert (a.berth_id, a.start, a.end, a.qc_ids) == ("B1", 0, 10*HOUR, ["QC01", "QC02"])
+    # berth B2 is free but QC01 is not
+    b = allocator.allocate(VesselCall("B", HOUR, {"QC01": []}, etd=5*HOUR), now=HOUR)
+    assert b.start == 10*HOUR and b.end == 14*HOUR
+    # any crane: QC03 is free now, on berth B2
+    c = allocator.allocate(VesselCall("C", 2*HOUR, {"P1": []}), now=2*HOUR)
+    assert (c.berth_id, c.start, c.qc_ids) == ("B2", 2*HOUR, ["QC03"])
+    assert c.end == 2*HOUR + allocator.default_duration
+    try:
+        allocator.allocate(VesselCall("D", 2*HOUR, {"P1": [], "P2": [], "P3": [], "P4": []}), now=2*HOUR)
+        raise AssertionError("ValueError expected")
+    except ValueError:
+        pass
+    # A leaves early: B is planned again from then
+    allocator.release("A", 6*HOUR)
+    b = allocator.replan("B", 6*HOUR)
+    assert (b.berth_id, b.start, b.end) == ("B1", 6*HOUR, 10*HOUR)
+    assert allocator.assignments["B"] is b and "A" not in allocator.assignments
+    assert allocator.qcs["QC01"].starts == [6*HOUR]
+
+
+def season_test(n_calls=5000):
+    """A long schedule only keeps the plan ahead in the indexes (past reservations are pruned)"""
+    allocator = BerthAllocator(["B1", "B2", "B3"], [f"QC{i:02d}" for i in range(1, 7)])
+    max_reservations = 0
+    for i in range(n_calls):
+        eta = i * 4*HOUR
+        assignment = allocator.allocate(VesselCall(f"V{i:05d}", eta, {"P1": [], "P2": []}, etd=eta + 10*HOUR), eta)
+        assert assignment.start == eta
+        if i >= 3:
+            allocator.release(f"V{i - 3:05d}", eta)
+        max_reservations = max(max_reservations, sum(len(index) for index in allocator.qcs.values()))
+    assert max_reservations <= 8
+
+
+if __name__ == "__main__":
+    interval_index_test()
+    allocate_test()
+    season_test()
@@ -0,0 +1,37 @@
+from lib.bson_encoder import encode_bson_batches
+import datetime
+import numpy as np
+import sys
+sys.path.append('../')
+
+
+def drop_duplicates_test():
+    """Records with list fields (CHE configs) are deduplicated on all their fields or on their natural key"""
+    che_configs = [{"che_id": "RTG01", "che_type": "RTG", "che_yard_zone": ["B1", "B2"], "equipment_pool_id": None},
+                   {"che_id": "RTG01", "che_type": "RTG", "che_yard_zone": ["B1", "B2"],
+                    "equipment_pool_id": float('nan')},
+                   {"che_id": "RTG01", "che_type": "RTG", "che_yard_zone": ["B3"], "equipment_pool_id": None},
+                   {"che_id": "RTG02", "che_type": "RTG", "che_yard_zone": ["B3"], "equipment_pool_id": None}]
+    documents = [document for batch in encode_bson_batches(che_configs, drop_duplicates=True, batch_size=2)
+                 for document in batch]
+    assert [(d["che_id"], list(d["che_yard_zone"])) for d in documents] == [
+        ("RTG01", ["B1", "B2"]), ("RTG01", ["B3"]), ("RTG02", ["B3"])]
+    documents = [document for batch in encode_bson_batches(che_configs, drop_duplicates=True, key_fields=("che_id",))
+                 for document in batch]
+    assert [d["che_id"] for d in documents] == ["RTG01", "RTG02"]
+
+
+def native_types_test():
+    """numpy scalars become python values, nan and NaT become None"""
+    created_at = datetime.datetime(2024, 12, 13, 8, 30)
+    record = {"move_end_time": np.float64(12.5), "n_moves": np.int64(3), "duration": float('nan'),
+              "event_time": created_at}
+    document = next(encode_bson_batches([record], extra_fields={"simulation_id": "S1"}))[0]
+    assert document["move_end_time"] == 12.5 and document["n_moves"] == 3
+    assert document["duration"] is None and document["event_time"] == created_at
+    assert document["simulation_id"] == "S1"
+
+
+if __name__ == "__main__":
+    drop_duplicates_test()
+    native_types_test()
@@ -0,0 +1,68 @@
+from lib.che_timeline import CHEStatusTimeline, load_timeline
+import os
+import tempfile
+import sys
+sys.path.append('../')
+
+
+def merge_test():
+    """Consecutive events with the same status and WI extend the open interval, a change closes it"""
+    timeline = CHEStatusTimeline()
+    timeline.add_event("QC01", "IDLE", 0)
+    timeline.add_event("QC01", "BUSY", 10, wi_id=1)
+    timeline.add_event("QC01", "BUSY", 20, wi_id=1)  # FETCH_START after FETCH_DISPATCH: merged
+    timeline.add_event("QC01", "BUSY", 50, wi_id=2)  # next WI: new interval
+    timeline.add_event("QC01", "WAITING", 50, wi_id=2)  # same time: the zero-length BUSY interval is dropped
+    timeline.add_event("QC01", "IDLE", 80)
+    assert len(timeline) == 3
+    assert [(r["che_status"], r["start_time"], r["end_time"], r["wi_id"]) for r in timeline.to_records()] == [
+        ("IDLE", 0, 10, None), ("BUSY", 10, 50, 1), ("WAITING", 50, 80, 2)]
+    # the strings are interned once
+    assert timeline.strings == ["QC01", "IDLE", "BUSY", "WAITING"]
+
+
+def close_test():
+    """The open intervals end at until (default: the last event time), they are not stored until closed"""
+    timeline = CHEStatusTimeline()
+    timeline.add_event("QC01", "IDLE", 0)
+    timeline.add_event("TT001", "IDLE", 0)
+    timeline.add_event("TT001", "MOVING", 30, wi_id=7)
+    timeline.add_event("QC01", "BUSY", 40, wi_id=7)
+    assert len(timeline) == 2
+    # the closed intervals then the open ones, the QC01 interval opened at the last event time is empty
+    records = timeline.to_records()
+    assert [(r["che_id"], r["che_status"], r["start_time"], r["end_time"]) for r in records] == [
+        ("TT001", "IDLE", 0, 30), ("QC01", "IDLE", 0, 40), ("TT001", "MOVING", 30, 40)]
+    records = timeline.to_records(until=100)
+    assert [(r["che_id"], r["che_status"], r["end_time"], r["duration"]) for r in records[2:]] == [
+        ("QC01", "BUSY", 100, 60), ("TT001", "MOVING", 100, 70)]
+    # from the number of closed intervals already read: only the open ones
+    assert [r["che_status"] for r in timeline.to_records(start=2, until=100)] == ["BUSY", "MOVING"]
+    # closing an open interval stores it, its duration is kept
+    timeline.add_event("TT001", "IDLE", 90)
+    assert len(timeline) == 3
+    assert [(r["che_status"], r["end_time"]) for r in timeline.to_records(start=2, until=100)] == [
+        ("MOVING", 90), ("BUSY", 100), ("IDLE", 100)]
+
+
+def columns_test():
+    """The numpy columns (saved / loaded) hold the closed and the open intervals"""
+    timeline = CHEStatusTimeline()
+    timeline.add_event("QC01", "IDLE", 0)
+    timeline.add_event("QC01", "BUSY", 10, wi_id=1)
+    columns = timeline.columns(until=25)
+    assert columns["start_time"].tolist() == [0, 10] and columns["end_time"].tolist() == [10, 25]
+    assert columns["wi_id"].tolist() == [-1, 1]
+    assert [columns["strings"][code] for code in columns["status_code"]] == ["IDLE", "BUSY"]
+    with tempfile.TemporaryDirectory() as data_dir:
+        file_path = os.path.join(data_dir, "timeline.npz")
+        timeline.save(file_path, until=25)
+        loaded = load_timeline(file_path)
+        assert loaded["end_time"].tolist() == [10, 25]
+        assert loaded["strings"].tolist() == ["QC01", "IDLE", "BUSY"]
+
+
+if __name__ == "__main__":
+    merge_test()
+    close_test()
+    columns_test()
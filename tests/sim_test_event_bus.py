@@ -0,0 +1,69 @@
+from lib.event_bus import EventBus, AsyncEventStream, MOVE_EVENT, CHE_EVENT
+from lib.runner import run_simulation
+from sim_test_fast_engine import generate_synthetic_pow
+import asyncio
+import sys
+sys.path.append('../')
+
+YC_BLOCK_DICT = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+
+
+def live_kpi_test(engines=["simpy", "fast"]):
+    """
+    Subscribers with filters counting the moves of a POW and the truck events during the run: same counts as
+    the records of the loggers at the end
+    """
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=30)}
+    for engine in engines:
+        bus = EventBus()
+        counts = {"QC01 moves": 0, "TT events": 0}
+
+        def count_move(event_type, record):
+            counts["QC01 moves"] += 1
+
+        def count_itv_event(event_type, record):
+            counts["TT events"] += 1
+        bus.subscribe(MOVE_EVENT, count_move, pow_ids=["QC01"])
+        bus.subscribe(CHE_EVENT, count_itv_event, che_types=["TT"])
+        terminal = run_simulation(activity_dict, 6, YC_BLOCK_DICT, until=7*24*60*60, seed=0, engine=engine,
+                                  event_bus=bus)
+        n_qc01_moves = sum(move["pow_id"] == "QC01"
+                           for move in terminal.move_logger.move_events)
+        n_itv_events = sum(che_event["che_id"].startswith("TT")
+                           for che_event in terminal.che_logger.che_event_list)
+        print(f"{engine}: {counts}")
+        assert counts["QC01 moves"] == n_qc01_moves
+        assert counts["TT events"] == n_itv_events
+
+
+async def consume_stream(engine):
+    """Run the simulation in a thread and consume its moves as they are logged"""
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=30)}
+    bus = EventBus()
+    stream = AsyncEventStream(bus, event_types=(MOVE_EVENT,))
+    loop = asyncio.get_running_loop()
+
+    def run():
+        try:
+            return run_simulation(activity_dict, 6, YC_BLOCK_DICT, until=7*24*60*60, seed=0, engine=engine,
+                                  event_bus=bus)
+        finally:
+            stream.close()
+    future = loop.run_in_executor(None, run)
+    n_moves = 0
+    async for event_type, record in stream:
+        n_moves += 1
+    terminal = await future
+    return n_moves, len(terminal.move_logger.move_events), stream.n_dropped
+
+
+def async_stream_test(engines=["simpy", "fast"]):
+    for engine in engines:
+        n_streamed, n_moves, n_dropped = asyncio.run(consume_stream(engine))
+        print(f"{engine}: {n_streamed} moves streamed, {n_moves} logged, {n_dropped} dropped")
+        assert n_dropped == 0 and n_streamed == n_moves
+
+
+if __name__ == "__main__":
+    live_kpi_test()
+    async_stream_test()
@@ -0,0 +1,50 @@
+from lib.runner import run_simulation
+from lib.event_journal import open_journal, journal_to_move_events, journal_to_che_events
+from sim_test_fast_engine import generate_synthetic_pow
+import os
+import tempfile
+import sys
+sys.path.append('../')
+
+YC_BLOCK_DICT = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+
+
+def _n_open_files() -> int:
+    return len(os.listdir(f"/proc/{os.getpid()}/fd"))
+
+
+def journal_close_test(engine="fast", n_runs=3):
+    """
+    The journals are closed at the end of the vessels (no file left open by the runs), the events logged after
+    (moves of the last containers) go to a new segment and the converted journals are the logged records
+    """
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=30)}
+    with tempfile.TemporaryDirectory() as journal_dir:
+        n_open_files = None
+        terminals = []  # kept alive: their files are not closed by the garbage collector
+        for seed in range(n_runs):
+            terminals.append(run_simulation(activity_dict, 6, YC_BLOCK_DICT, until=7*24*60*60, seed=seed,
+                                            engine=engine, journal_dir=journal_dir))
+            # the first terminal also opens the simulation log file (see components.terminal)
+            n_open_files = _n_open_files() if n_open_files is None else n_open_files
+            assert _n_open_files() == n_open_files
+        move_logger, che_logger = terminals[-1].move_logger, terminals[-1].che_logger
+        assert move_logger.journal._data_file is None and che_logger.journal._data_file is None
+        sim_id = move_logger.sim_id
+        move_path = os.path.join(journal_dir, f"sim_move_events_{sim_id}")
+        che_path = os.path.join(journal_dir, f"che_event_logs_{sim_id}")
+        segments = open_journal(move_path)
+        print(f"{engine}: {len(segments)} move segments of {[len(segment) for segment in segments]} records")
+        move_events = journal_to_move_events(move_path, sim_id)
+        assert [move["move_id"] for move in move_events] == [
+            move["move_id"] for move in move_logger.move_events]
+        assert [move["move_end_time"] for move in move_events] == [
+            move["move_end_time"] for move in move_logger.move_events]
+        che_events = journal_to_che_events(che_path, sim_id)
+        assert [(e["che_id"], e["event_time"]) for e in che_events] == [
+            (e["che_id"], e["event_time"]) for e in che_logger.che_event_list]
+
+
+if __name__ == "__main__":
+    journal_close_test("fast")
+    journal_close_test("simpy")
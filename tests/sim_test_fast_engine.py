@@ -0,0 +1,141 @@
+"""
+Fast engine (FastTerminal) against the SimPy engine (Terminal): KPI conformance and speed.
+
+The order-of-magnitude speedup target of the fast engine is not met. On 10 replications of 3 POWs x 100 WIs
+without outputs (null_output_options), the fast engine runs in about 0.8 s against 2.2 to 2.8 s for SimPy
+(about 3x), and 2.2x faster with the default csv outputs. Most of the remaining run time is the building of
+the move and CHE event records (lib.che_log, lib.move_trucker), shared by both engines. speedup_test guards a
+coarse 2x.
+"""
+from components.ec.wi import WI
+from components.ec.durations import DurationSampler
+from components.inventory.container import Container
+from components.quay.schedule import VesselCall
+from lib.runner import run_simulation, null_output_options
+from lib.kpi import compute_kpis
+from lib.replication import confidence_interval
+import random
+import time
+import sys
+sys.path.append('../')
+
+
+def generate_synthetic_pow(n_pow=3, n_wi=100, blocks=["B1", "B2", "B3"], carrier_visit="V001", seed=0, first_gkey=0):
+    """
+    Generate points of work with alternating DSCH / LOAD WIs over the yard blocks
+    (WI gkeys and container numbers from first_gkey + 1)
+    """
+    rnd = random.Random(seed)
+    pow_dict = {}
+    gkey = first_gkey
+    for p in range(n_pow):
+        pow_name = f"QC{p + 1:02d}"
+        pow_dict[pow_name] = []
+        for i in range(n_wi):
+            gkey += 1
+            move_kind = "DSCH" if i % 2 == 0 else "LOAD"
+            block = rnd.choice(blocks)
+            container = Container(id=f"TCNU{gkey:07d}", category="IMPRT" if move_kind == "DSCH" else "EXPRT",
+                                  freight_kind="FCL", line_op="MSC")
+            pow_dict[pow_name].append(WI(ufv_gkey=gkey, gkey=gkey, move_kind=move_kind, pow=pow_name,
+                                         carrier_visit=carrier_visit,
+                                         fm_block=block if move_kind == "LOAD" else None, fm_bay="01", fm_row="A", fm_tier="1",
+                                         to_block=block if move_kind == "DSCH" else None, to_bay="01", to_row="A", to_tier="1",
+                                         container_obj=container))
+    return pow_dict
+
+
+def run_engine(engine, activity_dict, yc_block_dict, n_replications, n_itv=8, until=7*24*60*60, **options):
+    """
+    Run the replications of an engine with common random numbers, return the KPIs and the run time
+    (options: more run_simulation keyword arguments, ex: null_output_options())
+    """
+    kpis_list = []
+    start_time = time.perf_counter()
+    for seed in range(n_replications):
+        terminal = run_simulation(activity_dict, n_itv, yc_block_dict, until=until, seed=seed,
+                                  duration_sampler=DurationSampler("crn", seed=seed), engine=engine, **options)
+        kpis_list.append(compute_kpis(
+            terminal.move_logger.move_events, vessel_log=terminal.vessel_log))
+    return kpis_list, time.perf_counter() - start_time
+
+
+def conformance_test(n_replications=10, kpi_names=["completed_moves", "qc_moves_per_hour", "vessel_makespan"]):
+    """
+    Check that the KPIs of the fast engine are statistically the same as the ones of the SimPy engine:
+    the confidence interval of the paired difference of every KPI must contain 0
+    """
+    activity_dict = {"V001": generate_synthetic_pow()}
+    yc_block_dict = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+    kpis_simpy, time_simpy = run_engine(
+        "simpy", activity_dict, yc_block_dict, n_replications)
+    kpis_fast, time_fast = run_engine(
+        "fast", activity_dict, yc_block_dict, n_replications)
+    print("- "*50)
+    print(
+        f"simpy: {time_simpy:.2f}s, fast: {time_fast:.2f}s, speedup: {time_simpy / time_fast:.1f}x")
+    for kpi_name in kpi_names:
+        diff = confidence_interval([f[kpi_name] - s[kpi_name]
+                                   for s, f in zip(kpis_simpy, kpis_fast)])
+        print(
+            f"{kpi_name}: diff {diff['mean']:.3f} [{diff['ci_low']:.3f}, {diff['ci_high']:.3f}]")
+        assert diff["ci_low"] <= 0 <= diff["ci_high"], \
+            f"{kpi_name} of the fast engine does not conform to the SimPy engine"
+    print("- "*50)
+
+
+def speedup_test(n_replications=10, min_speedup=2.0):
+    """
+    Without outputs (the file and MongoDB writes are the same for both engines), the fast engine must run at
+    least min_speedup times faster than the SimPy engine (best of 3 timings of each engine)
+    """
+    activity_dict = {"V001": generate_synthetic_pow()}
+    yc_block_dict = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+    times = {}
+    for engine in ("simpy", "fast"):
+        times[engine] = min(run_engine(engine, activity_dict, yc_block_dict, n_replications,
+                                       **null_output_options())[1] for _ in range(3))
+    speedup = times["simpy"] / times["fast"]
+    print(f"null outputs, simpy: {times['simpy']:.2f}s, fast: {times['fast']:.2f}s, speedup: {speedup:.1f}x")
+    assert speedup >= min_speedup, f"fast engine speedup {speedup:.1f}x below {min_speedup}x"
+
+
+def multi_vessel_test(n_replications=5, n_itv=8, second_eta=2*60*60, until=7*24*60*60):
+    """
+    Two vessels overlapping on the same quay cranes: the POWs of the second vessel wait for the cranes of the
+    first one in both engines, both vessels are completed and the completed moves and the end times conform
+    """
+    yc_block_dict = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+    qc_ids = ["QC01", "QC02", "QC03"]
+    kpi_names = ["completed_moves", "end_time_V001", "end_time_V002"]
+    results = {"simpy": [], "fast": []}
+    for seed in range(n_replications):
+        for engine in results.keys():
+            schedule = [VesselCall("V001", 0, generate_synthetic_pow(n_wi=40, carrier_visit="V001")),
+                        VesselCall("V002", second_eta, generate_synthetic_pow(
+                            n_wi=40, carrier_visit="V002", seed=1, first_gkey=1000))]
+            terminal = run_simulation({}, n_itv, yc_block_dict, until=until, seed=seed,
+                                      duration_sampler=DurationSampler("crn", seed=seed), engine=engine,
+                                      schedule=schedule, qc_ids=qc_ids)
+            assert all(log["end_time"] is not None for log in terminal.vessel_log.values()), \
+                f"{engine} did not complete the vessels: {terminal.vessel_log}"
+            kpis = compute_kpis(terminal.move_logger.move_events,
+                                vessel_log=terminal.vessel_log)
+            for carrier_id, log in terminal.vessel_log.items():
+                kpis[f"end_time_{carrier_id}"] = log["end_time"]
+            results[engine].append(kpis)
+    print("- "*50)
+    for kpi_name in kpi_names:
+        diff = confidence_interval([f[kpi_name] - s[kpi_name]
+                                   for s, f in zip(results["simpy"], results["fast"])])
+        print(f"{kpi_name}: simpy {sum(s[kpi_name] for s in results['simpy']) / n_replications:.1f}, "
+              f"diff {diff['mean']:.3f} [{diff['ci_low']:.3f}, {diff['ci_high']:.3f}]")
+        assert diff["ci_low"] <= 0 <= diff["ci_high"], \
+            f"{kpi_name} of the fast engine does not conform to the SimPy engine"
+    print("- "*50)
+
+
+if __name__ == "__main__":
+    conformance_test()
+    speedup_test()
+    multi_vessel_test()
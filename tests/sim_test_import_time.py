@@ -0,0 +1,47 @@
+import subprocess
+import sys
+import json
+import os
+sys.path.append('../')
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that must not be loaded by importing the simulation core
+HEAVY_MODULES = ["scipy", "pandas", "numpy", "pymongo", "dotenv"]
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {root_dir!r})
+start_time = time.perf_counter()
+import {module}
+print(json.dumps({{"seconds": time.perf_counter() - start_time, "modules": sorted(sys.modules)}}))
+"""
+
+
+def measure_import(module="components.terminal"):
+    """
+    Import a module in a fresh interpreter, return the import time and the loaded modules
+    """
+    output = subprocess.run([sys.executable, "-c", _IMPORT_SCRIPT.format(module=module, root_dir=ROOT_DIR)],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_time_test(module="components.terminal", budget_seconds=0.5, n_runs=5):
+    """
+    Check that importing the simulation core stays under the time budget (best of n_runs)
+    and does not load the heavy optional dependencies
+    """
+    results = [measure_import(module) for _ in range(n_runs)]
+    best = min(result["seconds"] for result in results)
+    print("- "*50)
+    print(f"import {module}: {best * 1000:.1f} ms (budget {budget_seconds * 1000:.0f} ms)")
+    loaded = [name for name in HEAVY_MODULES if name in results[0]["modules"]]
+    assert not loaded, f"import {module} loads {loaded}"
+    assert best <= budget_seconds, f"import {module} took {best:.3f}s"
+    print("- "*50)
+
+
+if __name__ == "__main__":
+    import_time_test()
+    import_time_test("lib.runner")
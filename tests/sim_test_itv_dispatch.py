@@ -0,0 +1,73 @@
+from components.ec.itv_dispatch import IdleITVIndex, NearestIdle, DedicatedGangs
+from lib.runner import run_simulation
+from sim_test_fast_engine import generate_synthetic_pow
+import time
+import sys
+sys.path.append('../')
+
+
+def pow_trucks(terminal):
+    """ITVs that worked for each POW: {pow: set of ITV ids}"""
+    trucks = {}
+    for che_event in terminal.che_logger.che_event_list:
+        if che_event["che_id"].startswith("TT") and che_event.get("pow_id") is not None:
+            trucks.setdefault(che_event["pow_id"], set()).add(
+                che_event["che_id"])
+    return trucks
+
+
+def dispatch_rules_test(n_itv=9):
+    """
+    Run every dispatch rule on both engines: all the WIs are completed and the trucks of a gang only work for
+    their POW
+    """
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=60)}
+    yc_block_dict = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+    gangs = {"QC01": ["TT001", "TT002", "TT003"],
+             "QC02": ["TT004", "TT005", "TT006"]}
+    rules = {"first_idle": None, "nearest_idle": NearestIdle(), "dedicated_gangs": DedicatedGangs(gangs),
+             "dedicated_nearest": DedicatedGangs(gangs, NearestIdle())}
+    for engine in ["simpy", "fast"]:
+        for rule_name, rule in rules.items():
+            terminal = run_simulation(activity_dict, n_itv, yc_block_dict, until=7*24*60*60, seed=0,
+                                      engine=engine, dispatch_rule=rule)
+            n_moves = len(terminal.move_logger.move_events)
+            makespan = max(log["end_time"]
+                           for log in terminal.vessel_log.values())
+            print(f"{engine:6s} {rule_name:18s} moves: {n_moves}, makespan: {makespan:.0f}")
+            assert n_moves == 3 * 3 * 60
+            if isinstance(rule, DedicatedGangs):
+                trucks = pow_trucks(terminal)
+                for pow_name, itv_ids in gangs.items():
+                    assert trucks[pow_name] <= set(itv_ids)
+                assert trucks["QC03"].isdisjoint(
+                    set().union(*gangs.values()))
+
+
+def selection_cost_test(fleet_sizes=[50, 200, 1000], n_requests=100000):
+    """Time of a take / add cycle of the index: flat with the fleet size"""
+    class Truck():
+        def __init__(self, id):
+            self.id = id
+    wi_list = generate_synthetic_pow(n_pow=1, n_wi=1000)["QC01"]
+    positions = {}
+
+    def locate(wi, event_description):
+        return positions.setdefault((wi.id, event_description),
+                                    f"Y-DMSLOG-{wi.fm_block or wi.to_block}{wi.id % 40:02d}A1")
+    for n_itv in fleet_sizes:
+        index = IdleITVIndex(NearestIdle(), locate)
+        for i in range(n_itv):
+            index.add(Truck(f"TT{i:04d}"), wi_list[i % len(wi_list)])
+        start_time = time.time()
+        for i in range(n_requests):
+            wi = wi_list[i % len(wi_list)]
+            index.add(index.take(wi), wi)
+        elapsed = time.time() - start_time
+        print(f"fleet {n_itv}: {1e6 * elapsed / n_requests:.2f} us per request")
+        assert len(index) == n_itv
+
+
+if __name__ == "__main__":
+    dispatch_rules_test()
+    selection_cost_test()
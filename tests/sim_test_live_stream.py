@@ -0,0 +1,65 @@
+from lib.live_stream import LivePublisher
+from lib.runner import run_simulation
+from sim_test_fast_engine import generate_synthetic_pow
+import json
+import socket
+import threading
+import time
+import sys
+sys.path.append('../')
+
+
+def read_lines(address, lines):
+    """Subscriber reading the json lines of the publisher until it closes the connection"""
+    with socket.create_connection(address) as conn:
+        with conn.makefile("r") as stream:
+            for line in stream:
+                lines.append(json.loads(line))
+
+
+def paced_run_test(speed=5000, until=12000, engines=["simpy", "fast"]):
+    """
+    Paced runs (until seconds at speed simulated seconds per second) streamed to a reading subscriber, which gets every event, and to a subscriber that never reads,
+    which is dropped without slowing down the run
+    """
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=20)}
+    yc_block_dict = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+    for engine in engines:
+        with LivePublisher(max_queue=50) as publisher:
+            lines = []
+            reader = threading.Thread(target=read_lines, args=(
+                publisher.address, lines), daemon=True)
+            reader.start()
+            slow_conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            slow_conn.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+            slow_conn.connect(publisher.address)
+            while len(publisher.subscribers) < 2:
+                time.sleep(0.01)
+            # burst larger than the socket buffers: the queue of the slow subscriber fills up
+            for i in range(200):
+                publisher.publish("burst", {"seq": i, "payload": "x" * 65536})
+                # the reading subscriber keeps up
+                while len(lines) < i + 1 - 40:
+                    time.sleep(0.001)
+            start_time = time.time()
+            terminal = run_simulation(activity_dict, 6, yc_block_dict, until=until, seed=0, engine=engine,
+                                      speed=speed, live_publisher=publisher)
+            elapsed = time.time() - start_time
+            makespan = max(log["end_time"]
+                           for log in terminal.vessel_log.values())
+            n_published = publisher.n_published
+            n_subscribers = len(publisher.subscribers)
+        reader.join(5)
+        slow_conn.close()
+        n_moves = sum(line["type"] == "move" for line in lines)
+        assert sum(line["type"] == "burst" for line in lines) == 200
+        print(f"{engine}: {elapsed:.2f}s for {makespan:.0f} simulated seconds, {len(lines)} / {n_published} events "
+              f"received ({n_moves} moves), subscribers left: {n_subscribers}")
+        assert elapsed >= until / speed
+        assert len(lines) == n_published
+        assert n_moves >= len(terminal.move_logger.move_events)
+        assert n_subscribers == 1
+
+
+if __name__ == "__main__":
+    paced_run_test()
@@ -0,0 +1,76 @@
+from lib.mongo_setup import provision_database, is_timeseries_collection, CHE_EVENT_META_FIELD
+from lib.runner import run_simulation
+from tests.sim_test_fast_engine import generate_synthetic_pow
+import os
+import sys
+sys.path.append('../')
+
+# local mongod used by the test, a throwaway database is created and dropped
+os.environ.setdefault("MONGO_TEST_CONN", "mongodb://localhost:27017")
+TEST_DB_NAME = "terminal_simulator_test"
+
+
+def mongo_available(timeout_ms: int = 2000) -> bool:
+    """Ping the test mongod, with a short server selection timeout instead of the 30 s default"""
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+    client = MongoClient(os.environ["MONGO_TEST_CONN"], serverSelectionTimeoutMS=timeout_ms)
+    try:
+        client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        client.close()
+
+
+def mongo_setup_test():
+    """
+    Provision a throwaway database on the local mongod, run a small simulation writing to it
+    and check the collections, the indexes and that pushing the logs again does not duplicate them
+    (skipped without a mongod at MONGO_TEST_CONN)
+    """
+    if not mongo_available():
+        print(f"mongo_setup_test skipped: no MongoDB server at {os.environ['MONGO_TEST_CONN']}")
+        return
+    from pymongo import MongoClient
+    client = MongoClient(os.environ["MONGO_TEST_CONN"])
+    client.drop_database(TEST_DB_NAME)
+    db = client[TEST_DB_NAME]
+    try:
+        provision_database(db)
+        # provisioning twice is a no-op
+        indexes = provision_database(db)
+        print("- "*50)
+        print(indexes)
+        assert is_timeseries_collection(db["che_event_logs"])
+        assert db["che_event_logs"].options()["timeseries"]["timeField"] == "event_datetime"
+        assert "simulation_id_pow_id_move_end_time" in indexes["sim_move_events"]
+
+        activity_dict = {"V001": generate_synthetic_pow(n_pow=2, n_wi=20)}
+        yc_block_dict = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+        terminal = run_simulation(activity_dict, 6, yc_block_dict, until=7*24*60*60, seed=0,
+                                  output_to_csv_file=False, engine="fast", db_name=TEST_DB_NAME,
+                                  conn_str_name="MONGO_TEST_CONN")
+        sim_id = terminal.move_logger.sim_id
+        n_moves = db["sim_move_events"].count_documents({"simulation_id": sim_id})
+        n_che_events = db["che_event_logs"].count_documents(
+            {f"{CHE_EVENT_META_FIELD}.simulation_id": sim_id})
+        assert n_moves == len(terminal.move_logger.move_events)
+        assert n_che_events == len(terminal.che_logger.che_event_list)
+        # flushing again writes nothing new
+        terminal.move_logger.push_to_mongo()
+        terminal.che_logger._push_che_event(sim_id=sim_id)
+        assert db["sim_move_events"].count_documents({"simulation_id": sim_id}) == n_moves
+        assert db["che_event_logs"].count_documents(
+            {f"{CHE_EVENT_META_FIELD}.simulation_id": sim_id}) == n_che_events
+        plan = db["sim_move_events"].find({"simulation_id": sim_id, "pow_id": "QC01"}).explain()
+        print(f"moves: {n_moves}, CHE events: {n_che_events}")
+        print(plan["queryPlanner"]["winningPlan"])
+        print("- "*50)
+    finally:
+        client.drop_database(TEST_DB_NAME)
+
+
+if __name__ == "__main__":
+    mongo_setup_test()
@@ -0,0 +1,92 @@
+from lib.wi_mongo import MongoWISource, WI_FIELDS
+from lib.runner import run_simulation
+from sim_test_mongo_setup import mongo_available
+import os
+import random
+import sys
+sys.path.append('../')
+
+# local mongod used by the test, a throwaway database is created and dropped
+os.environ.setdefault("MONGO_TEST_CONN", "mongodb://localhost:27017")
+TEST_DB_NAME = "terminal_simulator_test"
+
+
+def generate_wi_documents(n_pow=3, n_wi=60, blocks=["B1", "B2", "B3"], carrier_visit="V001", seed=0):
+    """
+    WI documents like the WI export (upper case fields), with DSCH / LOAD WIs and a few duplicated container ids
+    """
+    rnd = random.Random(seed)
+    docs = []
+    gkey = 0
+    for p in range(n_pow):
+        for i in range(n_wi):
+            gkey += 1
+            move_kind = "DSCH" if i % 2 == 0 else "LOAD"
+            block = rnd.choice(blocks)
+            # every tenth WI moves the container of the previous one
+            container_gkey = gkey - 1 if i % 10 == 9 else gkey
+            docs.append({"UFV_GKEY": container_gkey, "GKEY": gkey, "ID": f"TCNU{container_gkey:07d}", "LINE_OP": "MSC",
+                         "CATEGORY": "IMPRT" if move_kind == "DSCH" else "EXPRT", "FREIGHT_KIND": "FCL",
+                         "MOVE_KIND": move_kind, "POW": f"QC{p + 1:02d}", "CARRIER_VISIT": carrier_visit,
+                         "FM_BLOCK": block if move_kind == "LOAD" else None, "FM_BAY": "01", "FM_ROW": "A", "FM_TIER": "1",
+                         "TO_BLOCK": block if move_kind == "DSCH" else None, "TO_BAY": "01", "TO_ROW": "A", "TO_TIER": "1"})
+    rnd.shuffle(docs)
+    return docs
+
+
+def expected_selection(docs, count, move_kind_list):
+    """Same selection as build_wi_pipeline, done locally: {pow: [gkeys]}"""
+    selection = {}
+    for pow_name in sorted({doc["POW"] for doc in docs}):
+        pow_docs = sorted([doc for doc in docs if doc["POW"] == pow_name and doc["MOVE_KIND"] in move_kind_list],
+                          key=lambda doc: doc["GKEY"])
+        seen_ids = set()
+        unique_docs = []
+        for doc in pow_docs:
+            if doc["ID"] not in seen_ids:
+                seen_ids.add(doc["ID"])
+                unique_docs.append(doc)
+        selection[pow_name] = [doc["GKEY"] for move_kind, n in zip(move_kind_list, count)
+                               for doc in [d for d in unique_docs if d["MOVE_KIND"] == move_kind][:n]]
+    return selection
+
+
+def mongo_wi_source_test(count=[12, 8], move_kind_list=["DSCH", "LOAD"]):
+    """
+    Load WI documents in a throwaway database on the local mongod, check that the server-side selection matches
+    the local one, and run a simulation fed from the streamed POWs (skipped without a mongod at MONGO_TEST_CONN)
+    """
+    if not mongo_available():
+        print(f"mongo_wi_source_test skipped: no MongoDB server at {os.environ['MONGO_TEST_CONN']}")
+        return
+    from pymongo import MongoClient
+    client = MongoClient(os.environ["MONGO_TEST_CONN"])
+    client.drop_database(TEST_DB_NAME)
+    try:
+        docs = generate_wi_documents()
+        client[TEST_DB_NAME]["work_instructions"].insert_many(
+            [dict(doc) for doc in docs])
+        source = MongoWISource(TEST_DB_NAME, "MONGO_TEST_CONN", batch_size=7)
+        activity_dict = source.load_activity(count, move_kind_list)
+        selection = {pow_name: [wi.gkey for wi in wi_list]
+                     for pow_name, wi_list in activity_dict["V001"].items()}
+        assert selection == expected_selection(docs, count, move_kind_list)
+        wi = activity_dict["V001"]["QC01"][0]
+        assert all(hasattr(wi, field) or hasattr(wi.container_obj, field) for field in WI_FIELDS)
+
+        streamed_activity = source.stream_activity(count, move_kind_list)
+        yc_block_dict = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+        terminal = run_simulation(streamed_activity, 6, yc_block_dict, until=7*24*60*60, seed=0, engine="fast",
+                                  wi_chunk_size=5)
+        n_wis = sum(len(gkeys) for gkeys in selection.values())
+        n_moves = len(terminal.move_logger.move_events)
+        print("- "*50)
+        print(f"WIs: {n_wis}, moves: {n_moves}")
+        print("- "*50)
+        assert n_moves == 3 * n_wis
+    finally:
+        client.drop_database(TEST_DB_NAME)
+
+
+if __name__ == "__main__":
+    mongo_wi_source_test()
@@ -0,0 +1,47 @@
+from lib.move_trucker import MovementTracker
+from lib.sinks import InMemorySink
+from lib.runner import run_simulation
+from sim_test_fast_engine import generate_synthetic_pow
+from types import SimpleNamespace
+import os
+import sys
+sys.path.append('../')
+
+YC_BLOCK_DICT = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+
+
+def simulation_id_test(n_runs=3):
+    """Runs started in the same second get their own simulation id and their own csv files"""
+    sim_ids = []
+    for seed in range(n_runs):
+        terminal = run_simulation({"V001": generate_synthetic_pow(n_wi=10)}, 6, YC_BLOCK_DICT,
+                                  until=7*24*60*60, seed=seed, engine="fast")
+        sim_ids.append(terminal.move_logger.sim_id)
+        assert os.path.exists(
+            os.path.join("data", f"sim_move_events_{terminal.move_logger.sim_id}.csv"))
+        assert all(move["simulation_id"] == terminal.move_logger.sim_id
+                   for move in terminal.move_logger.move_events)
+    print(f"simulation ids: {sim_ids}")
+    assert len(set(sim_ids)) == n_runs
+
+
+def relog_test():
+    """A move logged again replaces its record and is counted once"""
+    logger = MovementTracker(sink=InMemorySink())
+    wi = generate_synthetic_pow(n_pow=1, n_wi=1)["QC01"][0]
+    vessel = SimpleNamespace(carrier_id="V001")
+    qc_res = SimpleNamespace(id="QC01", fetch_dispatch_time=10.0, fetch_time=100.0)
+    logger.log_move(vessel, "QC01", wi, "FETCH", qc_res=qc_res)
+    qc_res.fetch_time = 120.0
+    logger.log_move(vessel, "QC01", wi, "FETCH", qc_res=qc_res)
+    assert len(logger.move_events) == 1
+    assert logger.move_events[0]["move_end_time"] == 120.0
+    counter = logger.move_counters[("QC01", "DSCH", "FETCH")]
+    assert counter["n_moves"] == 1
+    logger.push_to_mongo()
+    assert len(logger.sink.records) == 1
+
+
+if __name__ == "__main__":
+    simulation_id_test()
+    relog_test()
@@ -0,0 +1,123 @@
+from lib.replication import run_until_precision, compare_scenarios, confidence_interval, _is_precise
+from components.ec.durations import DurationSampler
+from lib.kpi import compute_kpis
+from sim_test_fast_engine import generate_synthetic_pow
+import math
+import os
+import sys
+import tempfile
+sys.path.append('../')
+
+SCENARIO = {"n_itv": 6, "yc_block_dict": {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]},
+            "until": 7*24*60*60, "engine": "fast"}
+
+
+def stopping_rule_test():
+    """Relative half-width rule: a zero or nan mean never converges, unless an absolute precision is given"""
+    assert _is_precise(confidence_interval([100, 101, 99, 100]), 0.05)
+    assert not _is_precise(confidence_interval([100, 150, 50, 100]), 0.05)
+    assert not _is_precise(confidence_interval([0.0, 0.0, 0.0]), 0.05)
+    assert _is_precise(confidence_interval([0.0, 0.0, 0.0]), 0.05, absolute_precision=0.1)
+    assert not _is_precise(confidence_interval([]), 0.05)
+    assert not _is_precise(confidence_interval([100]), 0.05)
+
+
+def unfinished_vessel_test():
+    """A vessel not finished before the end of the run has no makespan, it is counted apart"""
+    vessel_log = {"V001": {"arrival_time": 0, "berth_time": 0, "start_time": 5, "end_time": None}}
+    kpis = compute_kpis([], vessel_log=vessel_log)
+    assert math.isnan(kpis["vessel_makespan"])
+    assert kpis["unfinished_vessels"] == 1
+    vessel_log["V002"] = {"arrival_time": 0, "berth_time": 100, "start_time": 105, "end_time": 1100}
+    kpis = compute_kpis([], vessel_log=vessel_log)
+    assert kpis["vessel_makespan"] == 1000
+    assert kpis["unfinished_vessels"] == 1
+
+
+def run_until_precision_test():
+    """
+    The replications run in a scratch directory and write no file. A vessel not finished before until is left
+    out of the makespan interval instead of counting as a 0 makespan
+    """
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=30)}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as run_dir:
+        os.makedirs(os.path.join(run_dir, "logs"))
+        os.chdir(run_dir)
+        try:
+            # the run ends mid-vessel (about 4 hours of work)
+            result = run_until_precision(activity_dict, dict(SCENARIO, until=60*60), min_replications=6,
+                                         max_replications=6, relative_precision=1e-6, max_workers=3)
+            makespan = result["kpis"]["vessel_makespan"]
+            assert not result["converged"] and result["n_replications"] == 6
+            assert result["n_unfinished"] == 6
+            assert makespan["n"] == 0 and makespan["n_excluded"] == 6 and math.isnan(makespan["mean"])
+            assert result["kpis"]["qc_moves_per_hour"]["n"] == 6
+            # stops once both KPIs are within 5%
+            result = run_until_precision(activity_dict, SCENARIO, relative_precision=0.05, min_replications=5,
+                                         max_replications=40, max_workers=4)
+            makespan = result["kpis"]["vessel_makespan"]
+            print(f"5%: converged {result['converged']} after {result['n_replications']} replications, makespan "
+                  f"{makespan['mean']:.1f} +/- {makespan['half_width']:.1f} (n={makespan['n']})")
+            assert result["converged"] and result["n_replications"] < 40
+            assert makespan["n"] + makespan["n_excluded"] == result["n_replications"]
+            assert makespan["ci_low"] > 15000
+            for ci in result["kpis"].values():
+                assert ci["half_width"] <= 0.05 * abs(ci["mean"])
+            assert os.listdir(run_dir) == ["logs"]
+        finally:
+            os.chdir(cwd)
+
+
+def crn_uniform_test():
+    """With crn, the short ready / release delays of a WI do not depend on the draw order"""
+    wi_a, wi_b = generate_synthetic_pow(n_pow=1, n_wi=2)["QC01"]
+    sampler = DurationSampler(mode="crn", seed=3)
+    first = [sampler.uniform("ITV_FETCH_READY", wi_a, 1, 10), sampler.uniform("ITV_FETCH_READY", wi_b, 1, 10)]
+    second = [sampler.uniform("ITV_FETCH_READY", wi_b, 1, 10), sampler.uniform("ITV_FETCH_READY", wi_a, 1, 10)]
+    assert first == second[::-1]
+    assert 1 <= first[0] <= 10 and first[0] != sampler.uniform("ITV_PUT_READY", wi_a, 1, 10)
+    twin = DurationSampler(mode="crn", seed=3, antithetic=True)
+    assert abs((first[0] - 1) + (twin.uniform("ITV_FETCH_READY", wi_a, 1, 10) - 1) - 9) < 1e-9
+
+
+def crn_variance_test(n_replications=20):
+    """
+    Common random numbers reduce the variance of the paired differences: the same scenario run twice has
+    exactly the same KPIs, and one more truck is measured with a narrower makespan interval than with
+    independent draws
+    """
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=40)}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as run_dir:
+        os.makedirs(os.path.join(run_dir, "logs"))
+        os.chdir(run_dir)
+        try:
+            diffs = _crn_diffs(activity_dict, n_replications)
+            assert os.listdir(run_dir) == ["logs"]
+        finally:
+            os.chdir(cwd)
+    assert diffs[True]["n"] == diffs[False]["n"] == n_replications
+    assert diffs[True]["half_width"] < diffs[False]["half_width"]
+
+
+def _crn_diffs(activity_dict, n_replications):
+    """Makespan difference of one more truck, with and without crn (the same scenario twice differs by 0)"""
+    same = compare_scenarios(activity_dict, SCENARIO, SCENARIO, n_replications=5,
+                             kpi_names=("vessel_makespan",), crn=True)["vessel_makespan"]["diff"]
+    assert same["mean"] == 0 and same["half_width"] == 0
+    scenario_a, scenario_b = dict(SCENARIO, n_itv=8), dict(SCENARIO, n_itv=9)
+    diffs = {}
+    for crn in (True, False):
+        diffs[crn] = compare_scenarios(activity_dict, scenario_a, scenario_b, n_replications=n_replications,
+                                       kpi_names=("vessel_makespan",), crn=crn)["vessel_makespan"]["diff"]
+        print(f"crn={crn}: makespan diff {diffs[crn]['mean']:.1f} +/- {diffs[crn]['half_width']:.1f}")
+    return diffs
+
+
+if __name__ == "__main__":
+    stopping_rule_test()
+    unfinished_vessel_test()
+    run_until_precision_test()
+    crn_uniform_test()
+    crn_variance_test()
@@ -0,0 +1,100 @@
+from lib.result_cache import ResultCache, cached_run_simulation, fingerprint_activity, compute_model_version, \
+    MODEL_SOURCE_PATHS
+from lib.wi_shared import SharedWITable, SharedActivity
+from lib.tracing import TracingPolicy
+from lib.sinks import NullSink
+from components.ec.durations import DurationSampler
+from components.ec.itv_dispatch import NearestIdle
+from components.yard.inventory import YardInventory
+from sim_test_fast_engine import generate_synthetic_pow
+import numpy as np
+import os
+import tempfile
+import sys
+sys.path.append('../')
+
+YC_BLOCK_DICT = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+
+
+def hit_miss_test():
+    """Same run: hit, any run option changed: miss, run with side effects: never cached"""
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=10)}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ResultCache(cache_dir)
+
+        def run(**options):
+            return cached_run_simulation(cache, activity_dict, 6, YC_BLOCK_DICT, until=7*24*60*60, **options)
+        first = run(seed=1)
+        assert not first["cache_hit"]
+        second = run(seed=1, with_events=True)
+        assert second["cache_hit"] and second["kpis"] == first["kpis"]
+        assert len(second["move_events"]) == 90
+        for options in [{"seed": 2}, {"seed": 1, "engine": "fast"},
+                        {"seed": 1, "duration_sampler": DurationSampler("crn", seed=1)},
+                        {"seed": 1, "duration_sampler": DurationSampler("crn", seed=1, antithetic=True)},
+                        {"seed": 1, "tracing": TracingPolicy(0.5)},
+                        {"seed": 1, "dispatch_rule": NearestIdle()},
+                        {"seed": 1, "berth_ids": ["BERTH1"]}]:
+            assert not run(**options)["cache_hit"], f"hit for {options}"
+            # equal option objects give the same key
+            assert run(**options)["cache_hit"], f"miss for {options}"
+        n_entries = len(cache._list_entries())
+        assert not run(seed=1, move_sink=NullSink())["cache_hit"]
+        assert not run(seed=1, move_sink=NullSink())["cache_hit"]
+        assert len(cache._list_entries()) == n_entries
+
+
+def fingerprint_test():
+    """The fingerprint only depends on the WI data: not on the run state, nor on the shared memory views"""
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=10)}
+    fingerprint = fingerprint_activity(activity_dict)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # the YC puts and fetches change the location and transit state of the containers
+        cached_run_simulation(ResultCache(cache_dir), activity_dict, 6, YC_BLOCK_DICT, until=7*24*60*60, seed=1,
+                              yard_inventory=YardInventory({block: (10, 6, 5) for block in ["B1", "B2", "B3"]}))
+    assert fingerprint_activity(activity_dict) == fingerprint
+    wi_list = activity_dict["V001"]["QC01"]
+    columns = {
+        "gkey": {"kind": "numeric", "values": np.array([wi.gkey for wi in wi_list]), "categories": None},
+        "move_kind": {"kind": "string", "values": np.array([0 if wi.move_kind == "DSCH" else 1 for wi in wi_list]),
+                      "categories": np.array(["DSCH", "LOAD"])},
+        "id": {"kind": "string", "values": np.arange(len(wi_list)),
+               "categories": np.array([wi.container_obj.id for wi in wi_list])},
+    }
+    for name in ["category", "freight_kind", "line_op"]:
+        categories = sorted({getattr(wi.container_obj, name) for wi in wi_list})
+        columns[name] = {"kind": "string", "categories": np.array(categories),
+                         "values": np.array([categories.index(getattr(wi.container_obj, name)) for wi in wi_list])}
+    table = SharedWITable.create(columns)
+    try:
+        shared_activity = SharedActivity(table.descriptor, {"V001": {"QC01": list(range(len(wi_list)))}})
+        fingerprints = {fingerprint_activity(shared_activity.build()) for _ in range(3)}
+        assert len(fingerprints) == 1
+    finally:
+        table.close()
+
+
+def invalidation_test():
+    """An entry of another model version is a miss and is removed by invalidate, a source change makes a new version"""
+    assert any(path.endswith(os.path.join("lib", "kpi.py")) for path in MODEL_SOURCE_PATHS)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache_v1 = ResultCache(cache_dir, model_version="v1")
+        cache_v1.put("key", {"completed_moves": 1.0})
+        assert cache_v1.get("key") == {"kpis": {"completed_moves": 1.0}}
+        cache_v2 = ResultCache(cache_dir, model_version="v2")
+        assert cache_v2.get("key") is None
+        assert cache_v2.invalidate() == 1
+        assert cache_v1.get("key") is None
+        source_path = os.path.join(cache_dir, "model.py")
+        with open(source_path, 'w') as f:
+            f.write("DURATION = 1\n")
+        version = compute_model_version((source_path,))
+        with open(source_path, 'w') as f:
+            f.write("DURATION = 2\n")
+        assert compute_model_version((source_path,)) != version
+
+
+if __name__ == "__main__":
+    hit_miss_test()
+    fingerprint_test()
+    invalidation_test()
@@ -0,0 +1,69 @@
+from lib.rollups import RollupLog, che_status_durations
+from lib.sinks import InMemorySink
+from lib.runner import run_simulation
+from lib.tracing import TracingPolicy
+from sim_test_fast_engine import generate_synthetic_pow
+from collections import defaultdict
+import sys
+sys.path.append('../')
+
+YC_BLOCK_DICT = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+
+
+def che_status_durations_test():
+    """The intervals are clipped to the segment and split over the buckets they overlap"""
+    records = che_status_durations(["QC01", "QC01", "TT001"], ["BUSY", "IDLE", "BUSY"],
+                                   [0, 1800, 500], [1800, 5400, 7000], segment_start=600, segment_end=6000, bucket=3600)
+    durations = {(r["che_id"], r["che_status"], r["bucket_start"]): r["duration"] for r in records}
+    assert durations == {("QC01", "BUSY", 0.0): 1200, ("QC01", "IDLE", 0.0): 1800, ("QC01", "IDLE", 3600.0): 1800,
+                         ("TT001", "BUSY", 0.0): 3000, ("TT001", "BUSY", 3600.0): 2400}
+    assert che_status_durations([], [], [], [], 0, 3600) == []
+
+
+def rollup_totals_test(engine="fast", push_interval=2*60*60, tracing=None):
+    """
+    Rollups pushed during the run (one segment per push): the status durations of every CHE add up to the
+    timeline durations and the move counts to the completed moves, also when only a sample of the WIs is traced
+    """
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=40)}
+    rollup_log = RollupLog(db_name=None, string_conncetion=None, output_to_csv_file=True,
+                           sinks={"che_status_rollups": InMemorySink(), "pow_move_rollups": InMemorySink()})
+
+    def push_rollups(terminal):
+        rollup_log.push_rollups(terminal.move_logger.sim_id, terminal.che_logger.status_timeline,
+                                terminal.move_logger.move_ends, terminal.env.now)
+
+    until = 7*24*60*60
+    terminal = run_simulation(activity_dict, 8, YC_BLOCK_DICT, until=until, seed=0, engine=engine,
+                              progress_callback=push_rollups, check_interval=push_interval, tracing=tracing)
+    assert rollup_log.segment > 10
+    timeline_durations = defaultdict(float)
+    for interval in terminal.che_logger.status_timeline.to_records(0, until):
+        timeline_durations[(interval["che_id"], interval["che_status"])] += \
+            interval["end_time"] - interval["start_time"]
+    rollup_durations = defaultdict(float)
+    for record in rollup_log.sinks["che_status_rollups"].records:
+        rollup_durations[(record["che_id"], record["che_status"])] += record["duration"]
+    assert set(rollup_durations) == set(timeline_durations)
+    for key, duration in timeline_durations.items():
+        assert abs(rollup_durations[key] - duration) < 1e-6, key
+    che_ids = {che_id for che_id, _ in timeline_durations}
+    for che_id in che_ids:
+        assert abs(sum(d for (c, _), d in rollup_durations.items() if c == che_id) - until) < 1e-6
+    n_moves = sum(record["n_moves"] for record in rollup_log.sinks["pow_move_rollups"].records)
+    assert n_moves == sum(counter["n_moves"] for counter in terminal.move_logger.move_counters.values())
+    n_records = sum(1 for move in terminal.move_logger.move_events if move["move_end_time"] is not None)
+    if tracing is None:
+        assert n_moves == n_records
+    else:
+        assert n_records < n_moves
+    print(f"{engine}: {rollup_log.segment} segments, {len(che_ids)} CHEs, {n_moves} moves rolled up "
+          f"({n_records} move records)")
+
+
+if __name__ == "__main__":
+    che_status_durations_test()
+    rollup_totals_test("fast")
+    rollup_totals_test("simpy")
+    rollup_totals_test("fast", tracing=TracingPolicy(0.1))
+    rollup_totals_test("simpy", tracing=TracingPolicy(0.1))
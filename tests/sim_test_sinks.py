@@ -0,0 +1,101 @@
+from lib.sinks import CSVSink, InMemorySink, NullSink, FanOutSink
+from lib.runner import run_simulation
+from lib import connect_db
+from sim_test_fast_engine import generate_synthetic_pow
+import csv
+import os
+import tempfile
+import sys
+sys.path.append('../')
+
+
+def csv_heterogeneous_test():
+    """Records with different fields go to the same csv: the header is extended, missing fields are empty"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        file_path = os.path.join(data_dir, "che_config.csv")
+        sink = CSVSink(file_path, batch_size=2)
+        sink.write([{"che_id": "QC01", "che_type": "QC"},
+                    {"che_id": "TT001", "che_type": "TT", "equipment_pool_id": "P1"}])
+        sink.write([{"che_id": "RTG01", "che_type": "RTG", "che_yard_zone": ["B1", "B2"]}])
+        sink.flush()
+        sink.write([{"che_id": "QC02", "che_type": "QC"}])
+        sink.close()
+        with open(file_path, newline='') as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+        assert reader.fieldnames == ["che_id", "che_type", "equipment_pool_id", "che_yard_zone", "created_at"]
+        assert [row["che_id"] for row in rows] == ["QC01", "TT001", "RTG01", "QC02"]
+        assert [row["equipment_pool_id"] for row in rows] == ["", "P1", "", ""]
+        assert [row["che_yard_zone"] for row in rows] == ["", "", "['B1', 'B2']", ""]
+        assert all(row["created_at"] for row in rows)
+        assert sink.n_written == 4 and not os.path.exists(f"{file_path}.tmp")
+
+
+def fan_out_test():
+    """Each sink of a fan-out writes the same records with its own batch size"""
+    by_two, by_flush = InMemorySink(batch_size=2), InMemorySink()
+    sink = FanOutSink([by_two, by_flush, NullSink()])
+    sink.write([{"n": 1}, {"n": 2}, {"n": 3}])
+    assert len(by_two.records) == 2 and len(by_flush.records) == 0
+    sink.flush()
+    assert by_two.records == by_flush.records == [{"n": 1}, {"n": 2}, {"n": 3}]
+    assert sink.n_written == 3
+
+
+def null_outputs_test(engine="fast"):
+    """With null sinks, a run writes no file (csv output) and opens no MongoDB connection (MongoDB output)"""
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=20)}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as run_dir:
+        os.makedirs(os.path.join(run_dir, "logs"))
+        os.chdir(run_dir)
+        try:
+            for output_to_csv_file in (True, False):
+                n_clients = len(connect_db._mongo_clients)
+                timeline_sink = InMemorySink()
+                terminal = run_simulation(
+                    activity_dict, 6, {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}, until=7*24*60*60,
+                    seed=0, engine=engine, output_to_csv_file=output_to_csv_file, move_sink=NullSink(),
+                    che_event_sink=NullSink(), che_config_sink=NullSink(), timeline_sink=timeline_sink,
+                    rollup_sinks={"che_status_rollups": NullSink(), "pow_move_rollups": NullSink()})
+                assert len(connect_db._mongo_clients) == n_clients
+                # a timeline sink gets the interval records instead of the .npz file
+                assert timeline_sink.records and "che_status" in timeline_sink.records[0]
+                terminal = run_simulation(
+                    activity_dict, 6, {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}, until=7*24*60*60,
+                    seed=0, engine=engine, output_to_csv_file=output_to_csv_file, move_sink=NullSink(),
+                    che_event_sink=NullSink(), che_config_sink=NullSink(), timeline_sink=NullSink(),
+                    rollup_sinks={"che_status_rollups": NullSink(), "pow_move_rollups": NullSink()})
+                assert terminal.rollup_logger.sinks["pow_move_rollups"].n_written == 0
+            assert os.listdir(run_dir) == ["logs"] and not os.path.exists(os.path.join(run_dir, "data"))
+        finally:
+            os.chdir(cwd)
+
+
+def run_end_flush_test(engine="fast"):
+    """The moves and CHE events logged after the end of the last vessel (last DSCH carries and puts) reach the sinks"""
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=40)}
+    move_sink, che_event_sink = InMemorySink(), InMemorySink()
+    rollup_sinks = {"che_status_rollups": InMemorySink(), "pow_move_rollups": InMemorySink()}
+    terminal = run_simulation(activity_dict, 6, {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]},
+                              until=7*24*60*60, seed=0, engine=engine, move_sink=move_sink,
+                              che_event_sink=che_event_sink, che_config_sink=NullSink(), timeline_sink=NullSink(),
+                              rollup_sinks=rollup_sinks)
+    move_logger, che_logger = terminal.move_logger, terminal.che_logger
+    end_time = terminal.vessel_log["V001"]["end_time"]
+    n_tail = sum(1 for move in move_logger.move_events if move["move_end_time"] > end_time)
+    assert n_tail > 0
+    assert len(move_sink.records) == len(move_logger.move_events)
+    assert len(che_event_sink.records) == len(che_logger.che_event_list)
+    n_rolled_up = sum(record["n_moves"] for record in rollup_sinks["pow_move_rollups"].records)
+    assert n_rolled_up == sum(counter["n_moves"] for counter in move_logger.move_counters.values())
+    print(f"{engine}: {n_tail} moves after the end of the vessel, {len(move_sink.records)} moves pushed")
+
+
+if __name__ == "__main__":
+    csv_heterogeneous_test()
+    fan_out_test()
+    null_outputs_test("fast")
+    null_outputs_test("simpy")
+    run_end_flush_test("fast")
+    run_end_flush_test("simpy")
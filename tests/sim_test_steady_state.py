@@ -0,0 +1,60 @@
+from lib.steady_state import mser_truncation, batch_means_ci, run_steady_state, SteadyStateMonitor
+from lib.replication import confidence_interval
+from lib.tracing import TracingPolicy
+from sim_test_fast_engine import generate_synthetic_pow
+import sys
+sys.path.append('../')
+
+YC_BLOCK_DICT = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+
+
+def mser_truncation_test():
+    """The warm-up ramp is cut at its end, a series still trending (or too short) has no truncation point"""
+    ramp = [100 - 2*i for i in range(40)]
+    steady = [20 + i % 2 for i in range(160)]
+    assert mser_truncation(ramp + steady, batch_size=5) == 40
+    assert mser_truncation(steady, batch_size=5) == 0
+    assert mser_truncation(list(range(200)), batch_size=5) is None
+    assert mser_truncation([1, 2, 3], batch_size=5) is None
+
+
+def batch_means_ci_test():
+    """The leading observations that do not fill a batch are dropped, the CI is the one of the batch means"""
+    values = [99] + [1]*11 + [2]*11 + [3]*11 + [4]*11
+    ci = batch_means_ci(values, n_batches=4)
+    expected = confidence_interval([1, 2, 3, 4])
+    assert ci["batch_size"] == 11 and ci["n"] == 4
+    assert ci["mean"] == 2.5
+    assert abs(ci["half_width"] - expected["half_width"]) < 1e-12
+    assert abs(ci["half_width"] - 2.054) < 1e-3
+    assert batch_means_ci([1, 2, 3], n_batches=4)["n"] == 0
+
+
+def monitor_test(engine="fast"):
+    """The monitor is called by run_simulation every bucket and stops the long run once the estimates are precise"""
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=1000)}
+    scenario = {"n_itv": 8, "yc_block_dict": YC_BLOCK_DICT, "until": 30*24*60*60, "engine": engine,
+                "seed": 1, "tracing": TracingPolicy(0.0)}
+    monitor = SteadyStateMonitor(bucket=30*60, relative_precision=0.05)
+    result = run_steady_state(activity_dict, scenario, monitor)
+    print(f"{engine}: converged {result['converged']} at {result['sim_time']:.0f} s after {result['n_buckets']} buckets")
+    assert result["converged"] and result["sim_time"] < scenario["until"]
+    assert result["n_buckets"] == result["sim_time"] // monitor.bucket
+    terminal = result["terminal"]
+    n_completed_moves = sum(counter["n_moves"] for (_, _, move_stage), counter
+                            in terminal.move_logger.move_counters.items() if move_stage == "PUT")
+    assert n_completed_moves < 3000  # stopped before the end of the vessel
+    for name, ci in result["estimates"].items():
+        print(f"  {name}: {ci['mean']:.3f} +/- {ci['half_width']:.3f} (warm-up {ci['truncation']} buckets)")
+        assert ci["truncation"] is not None
+        assert ci["half_width"] <= 0.05 * abs(ci["mean"])
+    # all the completed moves of the closed buckets are observed
+    throughput = monitor.observations["throughput"]
+    assert abs(sum(throughput) * monitor.bucket / 3600 - n_completed_moves) < 1e-6
+
+
+if __name__ == "__main__":
+    mser_truncation_test()
+    batch_means_ci_test()
+    monitor_test("fast")
+    monitor_test("simpy")
@@ -0,0 +1,41 @@
+from lib.tracing import TracingPolicy
+from lib.kpi import compute_terminal_kpis
+from lib.replication import run_replication
+from lib.async_runner import run_scenario
+from lib.runner import run_simulation
+from sim_test_fast_engine import generate_synthetic_pow
+import sys
+sys.path.append('../')
+
+YC_BLOCK_DICT = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+SCENARIO = {"n_itv": 6, "yc_block_dict": YC_BLOCK_DICT,
+            "until": 7*24*60*60, "engine": "fast"}
+
+
+def sampled_kpis_test(sample_rate=0.1, seed=0):
+    """The KPIs of a run tracing a sample of the WIs are the ones of the full run (same seed)"""
+    activity_dict = {"V001": generate_synthetic_pow(n_wi=60)}
+    full = run_simulation(activity_dict, seed=seed, **SCENARIO)
+    sampled = run_simulation(activity_dict, seed=seed, tracing=TracingPolicy(sample_rate), **SCENARIO)
+    assert len(sampled.move_logger.move_events) < len(
+        full.move_logger.move_events)
+    kpis_full = compute_terminal_kpis(full, with_che_events=True)
+    kpis_sampled = compute_terminal_kpis(sampled, with_che_events=True)
+    print(f"full: {kpis_full}")
+    print(f"sampled: {kpis_sampled}")
+    for kpi_name in ["completed_moves", "qc_moves", "vessel_makespan", "che_events"]:
+        assert kpis_sampled[kpi_name] == kpis_full[kpi_name], kpi_name
+    assert abs(kpis_sampled["qc_moves_per_hour"] -
+               kpis_full["qc_moves_per_hour"]) < 1e-9
+    # replication and async runner results
+    kpis_replication = run_replication(
+        activity_dict, dict(SCENARIO, tracing=TracingPolicy(sample_rate)), seed)
+    assert kpis_replication["completed_moves"] == kpis_full["completed_moves"]
+    result = run_scenario(activity_dict, dict(
+        SCENARIO, seed=seed, tracing=TracingPolicy(sample_rate)))
+    assert result["n_moves"] == len(full.move_logger.move_events)
+    assert result["kpis"]["completed_moves"] == kpis_full["completed_moves"]
+
+
+if __name__ == "__main__":
+    sampled_kpis_test()
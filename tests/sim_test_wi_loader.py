@@ -0,0 +1,77 @@
+from lib.wi_loader import WIDatasetCache, load_wi_dataframe
+import numpy as np
+import pandas as pd
+import os
+import tempfile
+import time
+import sys
+sys.path.append('../')
+
+WI_CSV = """gkey,pow,move_kind,fm_block,to_block,is_twin,weight
+1,QC01,DSCH,,B1,True,12.5
+2,QC01,LOAD,B2,,False,
+3,QC02,DSCH,,B3,False,20.0
+4,QC02,LOAD,B1,,True,8.25
+"""
+
+
+def _write_csv(path: str, content: str):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def round_trip_test():
+    """The cached columns give back the csv values, string columns as categoricals, missing values as nan"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        csv_path = os.path.join(data_dir, "wi.csv")
+        _write_csv(csv_path, WI_CSV)
+        expected = pd.read_csv(csv_path, header=0)
+        df = load_wi_dataframe(csv_path)
+        assert os.path.exists(os.path.join(data_dir, "cache", "wi.wi", "meta.json"))
+        assert list(df.columns) == list(expected.columns) and len(df) == len(expected)
+        assert isinstance(df["pow"].dtype, pd.CategoricalDtype)
+        for col in expected.columns:
+            assert [None if pd.isna(v) else v for v in df[col].tolist()] == \
+                [None if pd.isna(v) else v for v in expected[col].tolist()], col
+        # the columns of a valid cache are memory-mapped, not parsed again
+        columns = WIDatasetCache(csv_path).load_columns()
+        assert isinstance(columns["gkey"]["values"], np.memmap)
+        assert columns["fm_block"]["values"].tolist() == [-1, 0, -1, 1]
+        assert columns["fm_block"]["categories"].tolist() == ["B2", "B1"]
+
+
+def invalidation_test():
+    """The cache follows the content of the csv: a touched file is still valid, a modified one is rebuilt"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        csv_path = os.path.join(data_dir, "wi.csv")
+        _write_csv(csv_path, WI_CSV)
+        cache = WIDatasetCache(csv_path)
+        assert not cache.is_valid()
+        cache.load_columns()
+        assert cache.is_valid()
+        meta_path = os.path.join(cache.cache_path, "meta.json")
+        data_mtime = os.stat(os.path.join(cache.cache_path, "000.npy")).st_mtime_ns
+        # same content, new modification time: rehashed once, not rebuilt
+        time.sleep(0.01)
+        os.utime(csv_path)
+        assert cache.is_valid()
+        assert os.stat(os.path.join(cache.cache_path, "000.npy")).st_mtime_ns == data_mtime
+        with open(meta_path) as f:
+            assert str(os.stat(csv_path).st_mtime_ns) in f.read()
+        # same size, new content
+        _write_csv(csv_path, WI_CSV.replace("QC02", "QC03"))
+        assert not cache.is_valid()
+        df = load_wi_dataframe(csv_path)
+        assert sorted(df["pow"].unique().tolist()) == ["QC01", "QC03"]
+        assert cache.is_valid()
+        # a cache of another format version is rebuilt
+        with open(meta_path) as f:
+            meta = f.read()
+        with open(meta_path, 'w') as f:
+            f.write(meta.replace('"format_version": 1', '"format_version": 0'))
+        assert not cache.is_valid()
+
+
+if __name__ == "__main__":
+    round_trip_test()
+    invalidation_test()
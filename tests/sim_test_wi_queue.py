@@ -0,0 +1,147 @@
+from components.ec.wi_queue import WIQueue
+from components.ec.durations import DurationSampler
+from components.quay.schedule import VesselCall
+from lib.runner import run_simulation
+from sim_test_fast_engine import generate_synthetic_pow
+from types import SimpleNamespace
+import sys
+sys.path.append('../')
+
+
+def _make_wis(n: int) -> list:
+    return [SimpleNamespace(id=i, move_kind="DSCH" if i % 2 == 0 else "LOAD") for i in range(1, n + 1)]
+
+
+def _drain(queue: WIQueue) -> list:
+    ids = []
+    while queue:
+        ids.append(queue.pop().id)
+    return ids
+
+
+def order_test():
+    """WIs served by sequence, or DSCH first, the source list is left untouched"""
+    wis = _make_wis(6)
+    source = list(reversed(wis))
+    assert _drain(WIQueue(source)) == [1, 2, 3, 4, 5, 6]
+    assert [wi.id for wi in source] == [6, 5, 4, 3, 2, 1]
+    assert _drain(WIQueue(wis, interleave_move_kinds=False)) == [2, 4, 6, 1, 3, 5]
+    assert _drain(WIQueue(wis, sequence_key=lambda wi: -wi.id)) == [6, 5, 4, 3, 2, 1]
+
+
+def remove_reprioritise_test():
+    """WIs added, reprioritised and removed while the QC works: the order follows (priority, sequence)"""
+    wis = _make_wis(8)
+    queue = WIQueue(wis[:6])
+    assert queue.pop().id == 1
+    queue.reprioritise(wis[4], -1)  # WI 5 goes first
+    queue.remove(wis[2])  # WI 3 is cancelled
+    queue.push(wis[7], -1)  # WI 8 added mid-run, urgent
+    queue.push(wis[6])  # WI 7 added mid-run, in sequence
+    assert wis[2] not in queue and wis[4] in queue and len(queue) == 6
+    assert queue.peek().id == 5
+    assert _drain(queue) == [5, 8, 2, 4, 6, 7]
+    assert queue.n_popped == 7
+    for call in (lambda: queue.remove(wis[0]), lambda: queue.reprioritise(wis[0], 0)):
+        try:
+            call()
+            raise AssertionError("KeyError expected")
+        except KeyError:
+            pass
+    try:
+        queue.pop()
+        raise AssertionError("IndexError expected")
+    except IndexError:
+        pass
+    assert queue.peek() is None
+
+
+def mass_remove_test(n=1000):
+    """Removing most of the WIs rebuilds the heap without the removed entries"""
+    wis = _make_wis(n)
+    queue = WIQueue(wis)
+    for wi in wis[:-10]:
+        queue.remove(wi)
+    assert len(queue._heap) < n // 2
+    queue.reprioritise(wis[-1], -5)
+    assert _drain(queue) == [n] + list(range(n - 9, n))
+
+
+def streamed_source_test(chunk_size=4):
+    """A generator source is read chunk_size WIs at a time, when the heap runs empty"""
+    n_read = []
+
+    def source():
+        for wi in _make_wis(10):
+            n_read.append(wi.id)
+            yield wi
+
+    queue = WIQueue(source(), chunk_size=chunk_size)
+    assert len(n_read) == 0
+    assert queue.pop().id == 1 and len(n_read) == chunk_size
+    queue.push(SimpleNamespace(id=0, move_kind="DSCH"), priority=-1)
+    assert [queue.pop().id for _ in range(4)] == [0, 2, 3, 4]
+    assert len(n_read) == chunk_size
+    assert _drain(queue) == [5, 6, 7, 8, 9, 10]
+    assert queue._source is None
+    # a WI pushed after the WIs read so far: the source is read up to it
+    n_read.clear()
+    queue = WIQueue(source(), chunk_size=chunk_size)
+    assert queue.pop().id == 1
+    queue.push(SimpleNamespace(id=7.5, move_kind="DSCH"))
+    assert [queue.pop().id for _ in range(3)] == [2, 3, 4] and len(n_read) == chunk_size
+    assert [queue.pop().id for _ in range(4)] == [5, 6, 7, 7.5] and len(n_read) == 2 * chunk_size
+    assert _drain(queue) == [8, 9, 10]
+
+
+def terminal_queue_test(engine="fast", n_itv=8, second_eta=60*60, until=7*24*60*60):
+    """
+    WIs added and reprioritised through the work queues of the terminal during a run of two vessels on the same
+    cranes: the queues of the second vessel are its own while the first one works, and stay after it leaves
+    """
+    v001 = generate_synthetic_pow(n_wi=60, carrier_visit="V001")
+    v002 = generate_synthetic_pow(n_wi=40, carrier_visit="V002", seed=1, first_gkey=1000)
+    schedule = [VesselCall("V001", 0, v001), VesselCall("V002", second_eta, v002)]
+    added_wi = generate_synthetic_pow(n_pow=1, n_wi=1, carrier_visit="V002", first_gkey=5000)["QC01"][0]
+    urgent_wi = v002["QC01"][-2]  # DSCH
+    state = {"pushed": False, "checks_after_v001": 0}
+
+    def update_queues(terminal):
+        vessel_log = terminal.vessel_log
+        if not state["pushed"] and ("V001", "QC01") in terminal.pow_queues and \
+                ("V002", "QC01") in terminal.pow_queues:
+            queue = terminal.pow_queues[("V002", "QC01")]
+            assert terminal.pow_queues[("V001", "QC01")] is not queue and queue.n_popped == 0
+            queue.push(added_wi, priority=-1)
+            queue.reprioritise(urgent_wi, -1)
+            state["pushed"] = True
+        if "V002" in vessel_log and vessel_log["V001"]["end_time"] is not None and \
+                vessel_log["V002"]["end_time"] is None:
+            # the second vessel still works: its queues are still registered
+            assert terminal.pow_queues and all(carrier_id == "V002" for carrier_id, _ in terminal.pow_queues)
+            state["checks_after_v001"] += 1
+
+    terminal = run_simulation({}, n_itv, {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}, until=until,
+                              seed=0, duration_sampler=DurationSampler("crn", seed=0), engine=engine,
+                              schedule=schedule, qc_ids=["QC01", "QC02", "QC03"], progress_callback=update_queues,
+                              check_interval=5*60)
+    assert state["pushed"] and state["checks_after_v001"] > 0
+    assert all(log["end_time"] is not None for log in terminal.vessel_log.values())
+    assert terminal.pow_queues == {}
+    moves = terminal.move_logger.move_events
+    assert {move["carrier_id"] for move in moves if move["wi_id"] == added_wi.id} == {"V002"}
+    # the first QC fetches of the POW of the second vessel are the urgent WIs
+    fetches = sorted((move for move in moves if move["carrier_id"] == "V002" and move["pow_id"] == "QC01"
+                      and move["move_kind_description"] == "FETCH" and move["move_kind"] == "DSCH"),
+                     key=lambda move: move["move_dispatch_time"])
+    assert [move["wi_id"] for move in fetches[:2]] == [urgent_wi.id, added_wi.id]
+    print(f"{engine}: V002 QC01 starts with WIs {[move['wi_id'] for move in fetches[:3]]}")
+
+
+if __name__ == "__main__":
+    order_test()
+    remove_reprioritise_test()
+    mass_remove_test()
+    streamed_source_test()
+    terminal_queue_test("fast")
+    terminal_queue_test("simpy")
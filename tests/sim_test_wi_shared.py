@@ -0,0 +1,100 @@
+from lib.wi_shared import SharedWITable, SharedActivity, _attached_tables
+from sim_test_fast_engine import generate_synthetic_pow
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pickle
+import tracemalloc
+import sys
+sys.path.append('../')
+
+
+def wi_columns(wi_list: list) -> dict:
+    """Shared table columns of synthetic WIs (gkey, POW, move kind, blocks and container fields)."""
+    columns = {"gkey": {"kind": "numeric", "values": np.array([wi.gkey for wi in wi_list]), "categories": None}}
+    values = {"pow": [wi.pow for wi in wi_list], "carrier_visit": [wi.carrier_visit for wi in wi_list],
+              "move_kind": [wi.move_kind for wi in wi_list], "fm_block": [wi.fm_block for wi in wi_list],
+              "to_block": [wi.to_block for wi in wi_list], "id": [wi.container_obj.id for wi in wi_list]}
+    for name in ["category", "freight_kind", "line_op"]:
+        values[name] = [getattr(wi.container_obj, name) for wi in wi_list]
+    for name, column_values in values.items():
+        categories = sorted({v for v in column_values if v is not None})
+        index = {v: i for i, v in enumerate(categories)}
+        columns[name] = {"kind": "string", "categories": np.array(categories),
+                         "values": np.array([index.get(v, -1) for v in column_values])}
+    return columns
+
+
+def _attach_and_close(descriptor: dict) -> tuple:
+    table = SharedWITable.attach(descriptor)
+    gkey = table.get_value("gkey", 0)
+    registered = descriptor["shm_name"] in _attached_tables
+    table.close()
+    attached_after_close = descriptor["shm_name"] in _attached_tables
+    # attached again after the close: a new mapping of the block
+    table_again = SharedWITable.attach(descriptor)
+    gkey_again = table_again.get_value("gkey", 0)
+    table_again.close()
+    return gkey, registered, attached_after_close, gkey_again, table_again is not table
+
+
+def close_test():
+    """A closed table leaves the attached tables of its process, the owner also closes the ones of its process"""
+    table = SharedWITable.create(wi_columns(generate_synthetic_pow(n_pow=1, n_wi=10)["QC01"]))
+    shm_name = table.descriptor["shm_name"]
+    try:
+        # the runs of the owner process attach once
+        attached_table = SharedWITable.attach(table.descriptor)
+        assert SharedWITable.attach(table.descriptor) is attached_table
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            gkey, registered, attached_after_close, gkey_again, new_table = executor.submit(
+                _attach_and_close, table.descriptor).result()
+        assert gkey == gkey_again == 1
+        assert registered and not attached_after_close and new_table
+    finally:
+        table.close()
+    assert shm_name not in _attached_tables
+
+
+def _activity_memory(build) -> int:
+    """Memory allocated (bytes) by the activity of a worker and kept during its run."""
+    tracemalloc.start()
+    activity_dict = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del activity_dict
+    return current
+
+
+def memory_test(n_wi=20000, n_selected=500):
+    """
+    Memory of the activity of a worker: the WI objects unpickled from the owner scale with the dataset,
+    the views over the shared table with the selected WIs only
+    """
+    pow_dict = generate_synthetic_pow(n_pow=1, n_wi=n_wi)
+    wi_list = pow_dict["QC01"]
+    table = SharedWITable.create(wi_columns(wi_list))
+    small_table = SharedWITable.create(wi_columns(wi_list[:n_selected]))
+    try:
+        rows = list(range(n_selected))
+        payload = pickle.dumps(SharedActivity(table.descriptor, {"V001": {"QC01": rows}}))
+        small_payload = pickle.dumps(SharedActivity(small_table.descriptor, {"V001": {"QC01": rows}}))
+        # WI objects sent to the worker (the whole POW, as the workers rebuilt it before the shared table)
+        objects_payload = pickle.dumps({"V001": pow_dict})
+        memory_objects = _activity_memory(lambda: pickle.loads(objects_payload))
+        memory_shared = _activity_memory(lambda: pickle.loads(payload).build())
+        memory_small = _activity_memory(lambda: pickle.loads(small_payload).build())
+        print(f"{n_wi} WIs: objects {memory_objects / 1e6:.1f} MB, "
+              f"{n_selected} shared views {memory_shared / 1e6:.2f} MB "
+              f"(over a {n_selected}-WI table: {memory_small / 1e6:.2f} MB), "
+              f"shared block {table.shm.size / 1e6:.2f} MB")
+        assert memory_shared < memory_objects / 20
+        # the dataset size does not change the memory of the worker
+        assert abs(memory_shared - memory_small) < 0.1 * memory_small
+    finally:
+        table.close()
+        small_table.close()
+
+
+if __name__ == "__main__":
+    close_test()
+    memory_test()
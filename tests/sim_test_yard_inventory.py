@@ -0,0 +1,84 @@
+from components.yard.inventory import YardInventory
+from lib.runner import run_simulation
+from sim_test_fast_engine import generate_synthetic_pow
+import random
+import sys
+sys.path.append('../')
+
+
+def stack_test():
+    """Put / fetch on a single stack: positions, heights and rehandles"""
+    inventory = YardInventory({"B1": (2, 3, 4)})
+    for tier, container_id in enumerate(["C1", "C2", "C3"]):
+        inventory.place(container_id, "B1", "01", "A", tier + 1)
+    assert inventory.locate("C2") == ("B1", 0, 0, 1)
+    assert inventory.stack_height("B1", 0, 0) == 3
+    assert inventory.n_above("C1") == 2
+    # slot taken: on the top of the stack
+    assert inventory.place("C4", "B1", "01", "A", "2") == ("B1", 0, 0, 3)
+    assert inventory.conflicts["OCCUPIED"] == 1
+    assert inventory.place("C5", "B1", "01", "A", "1") is None
+    assert inventory.conflicts["FULL"] == 1
+    # C1 under 3 containers: 3 rehandles, the stack goes down one tier
+    assert inventory.remove("C1") == 3
+    assert inventory.locate("C4") == ("B1", 0, 0, 2)
+    assert inventory.container_at("B1", 0, 0, 0) == "C2"
+    assert inventory.stack_height("B1", 0, 0) == 3
+    assert inventory.place("C6", "B9", "01", "A", "1") is None
+    assert inventory.conflicts["UNKNOWN_BLOCK"] == 1
+
+
+def full_yard_test(n_blocks=40, shape=(40, 10, 6), fill_ratio=0.9, seed=0):
+    """A ~100k TEU yard filled at fill_ratio: footprint of the arrays and random fetches"""
+    rnd = random.Random(seed)
+    inventory = YardInventory(
+        {f"B{b + 1:02d}": shape for b in range(n_blocks)})
+    n_bays, n_rows, n_tiers = shape
+    n_containers = int(fill_ratio * len(inventory.occupancy))
+    for i in range(n_containers):
+        while inventory.place(f"C{i:07d}", f"B{rnd.randrange(n_blocks) + 1:02d}", rnd.randrange(n_bays) + 1,
+                              rnd.randrange(n_rows) + 1, None) is None:
+            pass
+    array_bytes = inventory.occupancy.nbytes + inventory.stack_heights.nbytes
+    n_rehandles = sum(inventory.remove(f"C{i:07d}")
+                      for i in rnd.sample(range(n_containers), 1000))
+    print("- "*50)
+    print(f"slots: {len(inventory.occupancy)}, containers: {n_containers}, arrays: {array_bytes / 1e6:.2f} MB, "
+          f"rehandles of 1000 fetches: {n_rehandles}")
+    print("- "*50)
+    assert len(inventory) == n_containers - 1000
+    assert int(inventory.stack_heights.sum()) == len(inventory)
+
+
+def simulation_test(n_itv=6):
+    """The YC puts and fetches of both engines keep the inventory: DSCH containers in, LOAD containers out"""
+    yc_block_dict = {"RTG01": ["B1"], "RTG02": ["B2"], "RTG03": ["B3"]}
+    for engine in ["simpy", "fast"]:
+        pow_dict = generate_synthetic_pow(n_wi=40)
+        wi_list = [wi for wi_list in pow_dict.values() for wi in wi_list]
+        # spread the containers over the bays and rows of the blocks
+        for i, wi in enumerate(wi_list):
+            wi.fm_bay = wi.to_bay = f"{i % 10 + 1:02d}"
+            wi.fm_row = wi.to_row = "ABCDEF"[i // 10 % 6]
+        inventory = YardInventory(
+            {block: (10, 6, 5) for block in ["B1", "B2", "B3"]})
+        inventory.load_wis(wi_list)
+        n_load = sum(wi.move_kind == "LOAD" for wi in wi_list)
+        n_dsch = len(wi_list) - n_load
+        assert len(inventory) == n_load
+        run_simulation({"V001": pow_dict}, n_itv, yc_block_dict, until=7*24*60*60, seed=0, engine=engine,
+                       yard_inventory=inventory)
+        print(f"{engine}: {len(inventory)} containers, {inventory.n_rehandles} rehandles, {inventory.conflicts}")
+        assert len(inventory) == n_dsch
+        for wi in wi_list:
+            if wi.move_kind == "DSCH":
+                assert wi.container_obj._get_transit_state() == "YARD"
+                assert inventory.locate(wi.container_obj.id)[0] == wi.to_block
+            else:
+                assert wi.container_obj._get_transit_state() == "EC/OUT"
+
+
+if __name__ == "__main__":
+    stack_test()
+    full_yard_test()
+    simulation_test()